@@ -3,7 +3,9 @@ from typing import Optional
 from rest_framework.permissions import BasePermission
 
 from workspaces.models import RoleAssignment, RoleChoices, Workspace
+from workspaces.roles import get_role
 from datastores.models import Database, Table, Field, Record, View
+from jobs.models import Job
 
 
 def get_workspace_from_obj(obj) -> Optional[Workspace]:
@@ -21,6 +23,34 @@ def get_workspace_from_obj(obj) -> Optional[Workspace]:
         return obj.table.database.workspace
     if isinstance(obj, View):
         return obj.table.database.workspace
+    if isinstance(obj, Job):
+        return obj.workspace
+    return None
+
+
+def _table_workspace_id(table_id: int, table: Optional[Table] = None) -> Optional[int]:
+    if table is not None and Table.database.is_cached(table):
+        return table.database.workspace_id
+    return Table.objects.filter(pk=table_id).values_list("database__workspace_id", flat=True).first()
+
+
+def get_workspace_id_from_obj(obj) -> Optional[int]:
+    """Like ``get_workspace_from_obj`` but follows foreign key ids.
+
+    Uses relations that are already loaded and otherwise issues at most one
+    query, instead of fetching every object up the chain.
+    """
+    if isinstance(obj, Workspace):
+        return obj.pk
+    if isinstance(obj, (RoleAssignment, Database, Job)):
+        return obj.workspace_id
+    if isinstance(obj, Table):
+        if Table.database.is_cached(obj):
+            return obj.database.workspace_id
+        return Database.objects.filter(pk=obj.database_id).values_list("workspace_id", flat=True).first()
+    if isinstance(obj, (Field, Record, View)):
+        table = obj.table if type(obj).table.is_cached(obj) else None
+        return _table_workspace_id(obj.table_id, table)
     return None
 
 
@@ -29,29 +59,23 @@ class WorkspaceRolePermission(BasePermission):
 
     write_methods = {"POST", "PUT", "PATCH", "DELETE"}
 
+    def has_role(self, request, workspace_id: int) -> bool:
+        # Roles are memoised per request and cached per process (see
+        # ``workspaces.roles``), so the view and object checks share one lookup.
+        role = get_role(request, workspace_id)
+        if request.method in self.write_methods:
+            return role in {RoleChoices.ADMIN, RoleChoices.MEMBER}
+        return role is not None
+
     def has_permission(self, request, view):
         workspace = getattr(view, "workspace", None)
         if workspace is None:
             return True
-        role = (
-            RoleAssignment.objects.filter(workspace=workspace, user=request.user)
-            .values_list("role", flat=True)
-            .first()
-        )
-        if request.method in self.write_methods:
-            return role in {RoleChoices.ADMIN, RoleChoices.MEMBER}
-        return role is not None
+        return self.has_role(request, workspace.pk)
 
     def has_object_permission(self, request, view, obj):
-        workspace = get_workspace_from_obj(obj)
-        if workspace is None:
+        workspace_id = get_workspace_id_from_obj(obj)
+        if workspace_id is None:
             return False
-        role = (
-            RoleAssignment.objects.filter(workspace=workspace, user=request.user)
-            .values_list("role", flat=True)
-            .first()
-        )
-        if request.method in self.write_methods:
-            return role in {RoleChoices.ADMIN, RoleChoices.MEMBER}
-        return role is not None
+        return self.has_role(request, workspace_id)
         # Extension point: swap to row-level permissions or integrate with an audit trail.
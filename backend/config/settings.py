@@ -20,6 +20,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "django_filters",
     "rest_framework",
     "rest_framework_simplejwt",
@@ -28,9 +29,11 @@ INSTALLED_APPS = [
     "core",
     "workspaces",
     "datastores",
+    "jobs",
 ]
 
 MIDDLEWARE = [
+    "core.middleware.RequestMetricsMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -39,6 +42,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "core.middleware.ProfilingMiddleware",
 ]
 
 ROOT_URLCONF = "config.urls"
@@ -70,6 +74,14 @@ DATABASES = {
         "PASSWORD": os.getenv("POSTGRES_PASSWORD", "baserow"),
         "HOST": os.getenv("POSTGRES_HOST", "localhost"),
         "PORT": os.getenv("POSTGRES_PORT", "5432"),
+        # Seconds a connection is reused across requests; 0 closes it after
+        # each request. Keep 0 under the ASGI server, which runs each
+        # request's database work on its own thread, and pool with PgBouncer
+        # instead (see docker-compose.yml). Long-lived processes such as
+        # ``run_worker`` benefit from reuse.
+        "CONN_MAX_AGE": int(os.getenv("POSTGRES_CONN_MAX_AGE", "0")),
+        # Reused connections are checked before a request uses them.
+        "CONN_HEALTH_CHECKS": True,
     }
 }
 
@@ -122,5 +134,61 @@ CORS_ALLOWED_ORIGINS = [
 ]
 CORS_ALLOW_CREDENTIALS = True
 
-# Attachments are stored inline as base64 strings for now. To swap to S3 later,
-# replace the serializer/storage implementation in datastores.attachments module.
+# Seconds a resolved workspace role is cached per process. Changes made in this
+# process take effect immediately; other workers pick them up within the TTL.
+WORKSPACE_ROLE_CACHE_TTL = int(os.getenv("WORKSPACE_ROLE_CACHE_TTL", "30"))
+
+# Create/drop per-field expression indexes on records as fields and saved views change.
+DATASTORES_MANAGE_INDEXES = os.getenv("DATASTORES_MANAGE_INDEXES", "1") == "1"
+
+# Optional ``CACHES`` alias shared by all workers for table schemas; each
+# process keeps its own LRU in front of it either way.
+DATASTORES_SCHEMA_CACHE = os.getenv("DATASTORES_SCHEMA_CACHE") or None
+
+# ``CACHES`` alias holding the ordered record id-lists of executed saved views.
+DATASTORES_VIEW_CACHE = os.getenv("DATASTORES_VIEW_CACHE", "default")
+
+# Attachment content is stored once per SHA-256 under this directory (see
+# datastores.attachments); records only hold references. To swap to S3 later,
+# provide another blob store with the same interface.
+DATASTORES_ATTACHMENT_ROOT = Path(os.getenv("DATASTORES_ATTACHMENT_ROOT", BASE_DIR / "attachments"))
+DATASTORES_ATTACHMENT_MAX_SIZE = int(os.getenv("DATASTORES_ATTACHMENT_MAX_SIZE", str(100 * 1024 * 1024)))
+
+# Records converted per transaction by background field type conversions.
+DATASTORES_CONVERSION_BATCH_SIZE = int(os.getenv("DATASTORES_CONVERSION_BATCH_SIZE", "1000"))
+
+# Background job queue (see the ``jobs`` app and ``manage.py run_worker``).
+JOBS_POLL_INTERVAL = float(os.getenv("JOBS_POLL_INTERVAL", "1"))
+# A running job whose heartbeat is older than this many seconds is taken over
+# by another worker.
+JOBS_STALE_AFTER = int(os.getenv("JOBS_STALE_AFTER", "300"))
+# Soft-deleted tables are hard-deleted by the worker after this many days.
+DATASTORES_TABLE_RETENTION_DAYS = int(os.getenv("DATASTORES_TABLE_RETENTION_DAYS", "30"))
+# Records deleted per transaction when a table is hard-deleted.
+DATASTORES_DELETE_BATCH_SIZE = int(os.getenv("DATASTORES_DELETE_BATCH_SIZE", "5000"))
+# Record change journal entries older than this many days are removed; delta
+# clients that last synced before them have to pull the table again.
+DATASTORES_JOURNAL_RETENTION_DAYS = int(os.getenv("DATASTORES_JOURNAL_RETENTION_DAYS", "7"))
+
+# Delivers record change events to /api/tables/<id>/changes streams. The
+# in-memory backend only reaches clients of the same process; use
+# "datastores.realtime.PostgresBroadcast" (LISTEN/NOTIFY) with several
+# server processes.
+DATASTORES_BROADCAST = os.getenv("DATASTORES_BROADCAST", "datastores.realtime.InMemoryBroadcast")
+
+# Send per-request SQL and phase timings as ``Server-Timing`` headers (see
+# core/metrics.py); browsers show them in the network panel. Every client
+# gets them, so keep this for development and trusted networks.
+METRICS_SERVER_TIMING = os.getenv("METRICS_SERVER_TIMING", "0") == "1"
+# Scrapers send ``Authorization: Bearer <token>`` to read /metrics; while
+# unset, only staff users (session or JWT) can.
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+# Staff users can profile a live request with ``X-Profile: 1`` or
+# ``?_profile=1`` (see core/profiling.py); this many profiles a minute are
+# allowed, 0 turns profiling off. Profiles are browsable in the admin.
+PROFILING_RATE_LIMIT = int(os.getenv("PROFILING_RATE_LIMIT", "6"))
+# Only the newest profiles are kept.
+PROFILING_KEEP = int(os.getenv("PROFILING_KEEP", "500"))
+# Seconds each EXPLAIN ANALYZE of a profiled request may run.
+PROFILING_EXPLAIN_TIMEOUT = float(os.getenv("PROFILING_EXPLAIN_TIMEOUT", "30"))
@@ -8,12 +8,15 @@ from rest_framework_simplejwt.views import (
     TokenVerifyView,
 )
 
-from core.views import MeView
+from core.views import MeView, metrics_view
+from jobs.views import JobViewSet
 from workspaces.views import WorkspaceViewSet, RoleAssignmentViewSet
+from datastores.async_views import async_reads, field_list, record_detail, record_list
 from datastores.views import (
     DatabaseViewSet,
     TableViewSet,
     FieldViewSet,
+    AttachmentViewSet,
     RecordViewSet,
     ViewViewSet,
 )
@@ -25,32 +28,78 @@ router.register(r"databases", DatabaseViewSet, basename="database")
 router.register(r"tables", TableViewSet, basename="table")
 router.register(r"fields", FieldViewSet, basename="field")
 router.register(r"views", ViewViewSet, basename="view")
+router.register(r"jobs", JobViewSet, basename="job")
 
 urlpatterns = [
     path("admin/", admin.site.urls),
+    path("metrics", metrics_view, name="metrics"),
     path("api/schema/", SpectacularAPIView.as_view(), name="schema"),
     path("api/docs/", SpectacularSwaggerView.as_view(url_name="schema"), name="docs"),
     path("api/auth/jwt/create", TokenObtainPairView.as_view(), name="jwt-create"),
     path("api/auth/jwt/refresh", TokenRefreshView.as_view(), name="jwt-refresh"),
     path("api/auth/jwt/verify", TokenVerifyView.as_view(), name="jwt-verify"),
     path("api/auth/me", MeView.as_view(), name="auth-me"),
+    path(
+        "api/fields/",
+        async_reads(field_list, FieldViewSet.as_view({"get": "list", "post": "create"})),
+        name="field-list",
+    ),
     path("api/", include(router.urls)),
     path(
         "api/tables/<int:table_id>/records",
-        RecordViewSet.as_view({
+        async_reads(record_list, RecordViewSet.as_view({
             "get": "list",
             "post": "create",
-        }),
+        })),
         name="record-list",
     ),
     path(
-        "api/tables/<int:table_id>/records/<int:pk>",
+        "api/tables/<int:table_id>/records/batch",
         RecordViewSet.as_view({
+            "post": "batch_create",
+            "patch": "batch_update",
+            "delete": "batch_destroy",
+        }),
+        name="record-batch",
+    ),
+    path(
+        "api/tables/<int:table_id>/records/aggregate",
+        RecordViewSet.as_view({"get": "aggregate"}),
+        name="record-aggregate",
+    ),
+    path(
+        "api/tables/<int:table_id>/records/export",
+        RecordViewSet.as_view({"get": "export"}),
+        name="record-export",
+    ),
+    path(
+        "api/tables/<int:table_id>/records/delta",
+        RecordViewSet.as_view({"get": "delta"}),
+        name="record-delta",
+    ),
+    path(
+        "api/tables/<int:table_id>/changes",
+        RecordViewSet.as_view({"get": "changes"}),
+        name="record-changes",
+    ),
+    path(
+        "api/tables/<int:table_id>/records/<int:pk>",
+        async_reads(record_detail, RecordViewSet.as_view({
             "get": "retrieve",
             "put": "update",
             "patch": "partial_update",
             "delete": "destroy",
-        }),
+        })),
         name="record-detail",
     ),
+    path(
+        "api/tables/<int:table_id>/attachments",
+        AttachmentViewSet.as_view({"post": "create"}),
+        name="attachment-list",
+    ),
+    path(
+        "api/tables/<int:table_id>/attachments/<int:pk>",
+        AttachmentViewSet.as_view({"get": "retrieve"}),
+        name="attachment-detail",
+    ),
 ]
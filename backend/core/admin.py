@@ -0,0 +1,78 @@
+from django.contrib import admin
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils.html import format_html, format_html_join
+
+from .models import RequestProfile
+
+
+@admin.register(RequestProfile)
+class RequestProfileAdmin(admin.ModelAdmin):
+    list_display = ("id", "created_at", "method", "path", "status_code", "duration_ms", "query_count", "user")
+    list_filter = ("method", "status_code")
+    search_fields = ("path", "route")
+    fields = (
+        "created_at",
+        "user",
+        "method",
+        "path",
+        "route",
+        "status_code",
+        "duration_ms",
+        "sample_count",
+        "stacks_download",
+        "top_stacks",
+        "sql",
+        "explain_plans",
+    )
+    readonly_fields = fields
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        stacks = path(
+            "<int:pk>/stacks/",
+            self.admin_site.admin_view(self.stacks_view),
+            name="core_requestprofile_stacks",
+        )
+        return [stacks, *super().get_urls()]
+
+    def stacks_view(self, request, pk):
+        profile = get_object_or_404(RequestProfile, pk=pk)
+        response = HttpResponse(profile.stacks, content_type="text/plain; charset=utf-8")
+        response["Content-Disposition"] = f'attachment; filename="profile-{profile.pk}.folded"'
+        return response
+
+    @admin.display(description="Queries")
+    def query_count(self, obj):
+        return len(obj.queries)
+
+    @admin.display(description="Collapsed stacks")
+    def stacks_download(self, obj):
+        url = reverse("admin:core_requestprofile_stacks", args=[obj.pk])
+        return format_html('<a href="{}">profile-{}.folded</a> (for flamegraph.pl or speedscope)', url, obj.pk)
+
+    @admin.display(description="Hottest stacks")
+    def top_stacks(self, obj):
+        return format_html("<pre>{}</pre>", "\n".join(obj.stacks.splitlines()[:20]))
+
+    @admin.display(description="SQL")
+    def sql(self, obj):
+        return format_html_join(
+            "",
+            "<pre>{} ms: {}\n{}</pre>",
+            ((query["duration_ms"], query["sql"], query["params"]) for query in obj.queries),
+        )
+
+    @admin.display(description="EXPLAIN ANALYZE")
+    def explain_plans(self, obj):
+        return format_html_join(
+            "",
+            "<h4>{}</h4><pre>{}</pre><pre>{}</pre>",
+            ((plan["label"], plan["sql"], plan["plan"]) for plan in obj.plans),
+        )
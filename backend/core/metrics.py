@@ -0,0 +1,191 @@
+"""Per-request timings and Prometheus metrics.
+
+``RequestMetricsMiddleware`` opens a ``RequestStats`` for every request.
+SQL is counted and timed by an execute wrapper installed on each database
+connection, and code paths mark their phases with ``timer("schema")`` and
+similar. Both find the stats through a context variable, which ``asgiref``
+carries into ``sync_to_async`` threads, so queries issued for async views
+count as well. Finished requests are folded into histograms per route that
+``/metrics`` serves in the Prometheus text format.
+
+The histograms live in process memory: with several server processes each
+reports its own requests, like the other per-process caches.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Sequence, Tuple
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+SIZE_BUCKETS = (1024, 10 * 1024, 100 * 1024, 1024 * 1024, 10 * 1024 * 1024)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class RequestStats:
+    __slots__ = ("started", "queries", "sql_seconds", "phases")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.phases: Dict[str, float] = {}
+
+    def add(self, phase: str, seconds: float) -> None:
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+
+current_stats: ContextVar[Optional[RequestStats]] = ContextVar("current_stats", default=None)
+
+
+class timer:
+    """Add the time spent in the block to a phase of the current request.
+
+    Costs one context variable lookup outside of requests (e.g. in the job
+    worker). Nested phases overlap: ``serialize`` includes the schema
+    lookups made while serializing.
+    """
+
+    __slots__ = ("phase", "stats", "started")
+
+    def __init__(self, phase: str):
+        self.phase = phase
+
+    def __enter__(self):
+        self.stats = current_stats.get()
+        if self.stats is not None:
+            self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.stats is not None:
+            self.stats.add(self.phase, time.perf_counter() - self.started)
+        return False
+
+
+def count_queries(execute, sql, params, many, context):
+    """Execute wrapper (see ``connection.execute_wrapper``) timing SQL of the current request."""
+    stats = current_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries += 1
+        stats.sql_seconds += time.perf_counter() - started
+
+
+def install_query_counter(sender, connection, **kwargs):
+    """``connection_created`` receiver; wrappers stay on the connection object across reconnects."""
+    if count_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, count_queries)
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, buckets: Sequence[float]):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        # Per label set: a count per bucket (not cumulative), then sum and count.
+        self.series: Dict[Labels, List[float]] = {}
+
+    def observe(self, labels: Labels, value: float) -> None:
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [0] * len(self.buckets) + [0.0, 0]
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[index] += 1
+                break
+        series[-2] += value
+        series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labels, series in sorted(self.series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{format_labels(labels + (('le', format_value(bound)),))} {cumulative}")
+            lines.append(f"{self.name}_bucket{format_labels(labels + (('le', '+Inf'),))} {series[-1]}")
+            lines.append(f"{self.name}_sum{format_labels(labels)} {format_value(series[-2])}")
+            lines.append(f"{self.name}_count{format_labels(labels)} {series[-1]}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self.series: Dict[Labels, int] = {}
+
+    def inc(self, labels: Labels) -> None:
+        self.series[labels] = self.series.get(labels, 0) + 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        lines.extend(f"{self.name}{format_labels(labels)} {value}" for labels, value in sorted(self.series.items()))
+        return lines
+
+
+def escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_labels(labels: Labels) -> str:
+    return "{" + ",".join(f'{key}="{escape_label(value)}"' for key, value in labels) + "}"
+
+
+def format_value(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class RequestMetrics:
+    """Histograms of finished requests, labelled by method and route pattern."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = Counter("http_requests_total", "Requests by method, route and status code.")
+        self.duration = Histogram("http_request_duration_seconds", "Time until the response was returned.", DURATION_BUCKETS)
+        self.queries = Histogram("http_request_sql_queries", "SQL queries per request.", QUERY_BUCKETS)
+        self.sql = Histogram("http_request_sql_duration_seconds", "Time spent executing SQL per request.", DURATION_BUCKETS)
+        self.phases = Histogram(
+            "http_request_phase_duration_seconds",
+            "Time per request spent in auth, permissions, schema and serialize.",
+            DURATION_BUCKETS,
+        )
+        self.size = Histogram("http_response_size_bytes", "Response body size (not streamed responses).", SIZE_BUCKETS)
+
+    def observe(self, method: str, route: str, status: int, stats: RequestStats, duration: float, size: Optional[int]):
+        labels = (("method", method), ("route", route))
+        with self._lock:
+            self.requests.inc(labels + (("status", str(status)),))
+            self.duration.observe(labels, duration)
+            self.queries.observe(labels, stats.queries)
+            self.sql.observe(labels, stats.sql_seconds)
+            for phase, seconds in stats.phases.items():
+                self.phases.observe(labels + (("phase", phase),), seconds)
+            if size is not None:
+                self.size.observe(labels, size)
+
+    def render(self) -> str:
+        with self._lock:
+            lines = []
+            for metric in (self.requests, self.duration, self.queries, self.sql, self.phases, self.size):
+                lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+request_metrics = RequestMetrics()
+
+
+def server_timing(stats: RequestStats, duration: float) -> str:
+    entries = [f'db;dur={stats.sql_seconds * 1000:.1f};desc="{stats.queries} queries"']
+    entries.extend(f"{phase};dur={seconds * 1000:.1f}" for phase, seconds in stats.phases.items())
+    entries.append(f"total;dur={duration * 1000:.1f}")
+    return ", ".join(entries)
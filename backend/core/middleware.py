@@ -0,0 +1,88 @@
+import threading
+import time
+
+from asgiref.sync import async_to_sync, iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+
+from .metrics import RequestStats, current_stats, request_metrics, server_timing
+from .profiling import is_requested, run_profiled
+
+
+class RequestMetricsMiddleware:
+    """Time every request and add it to ``/metrics``, optionally with a ``Server-Timing`` header.
+
+    Works in both sync and async chains, so async views stay on the event
+    loop. Streaming responses are measured until their headers are returned.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        stats = RequestStats()
+        token = current_stats.set(stats)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_stats.reset(token)
+        return self.finish(request, response, stats)
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        token = current_stats.set(stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_stats.reset(token)
+        return self.finish(request, response, stats)
+
+    def finish(self, request, response, stats: RequestStats):
+        duration = time.perf_counter() - stats.started
+        match = request.resolver_match
+        # Route patterns keep the label set bounded; unknown paths share one.
+        route = match.route if match is not None else "unmatched"
+        size = None if response.streaming else len(response.content)
+        request_metrics.observe(request.method, route, response.status_code, stats, duration, size)
+        if settings.METRICS_SERVER_TIMING:
+            response["Server-Timing"] = server_timing(stats, duration)
+        return response
+
+
+class ProfilingMiddleware:
+    """Run requests that ask for it under the profiler (see ``core.profiling``).
+
+    Other requests pass straight through. In an async chain a profiled
+    request moves to a worker thread and re-enters the chain with
+    ``async_to_sync``, so the sync views and ORM calls below it run on that
+    one thread; the profiler samples it and the event loop thread.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not (settings.PROFILING_RATE_LIMIT and is_requested(request)):
+            return self.get_response(request)
+        return run_profiled(request, self.get_response)
+
+    async def __acall__(self, request):
+        if not (settings.PROFILING_RATE_LIMIT and is_requested(request)):
+            return await self.get_response(request)
+        loop_thread = threading.get_ident()
+        return await sync_to_async(run_profiled)(request, async_to_sync(self.get_response), [loop_thread])
@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.db import models
+
+
+class RequestProfile(models.Model):
+    """A live request run under the sampling profiler (see ``core.profiling``).
+
+    ``stacks`` holds collapsed stacks (``outer;inner;leaf <samples>`` per line)
+    for flame graph tools, ``queries`` the executed SQL and ``plans`` the
+    ``EXPLAIN ANALYZE`` output of the record queries the request built.
+    """
+
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, related_name="+", on_delete=models.SET_NULL, null=True, blank=True)
+    method = models.CharField(max_length=10)
+    path = models.TextField()
+    route = models.CharField(max_length=255, blank=True)
+    status_code = models.PositiveSmallIntegerField()
+    duration_ms = models.FloatField()
+    sample_count = models.PositiveIntegerField(default=0)
+    stacks = models.TextField(blank=True)
+    queries = models.JSONField(default=list, blank=True)
+    plans = models.JSONField(default=list, blank=True)
+
+    class Meta:
+        ordering = ("-created_at",)
+
+    def __str__(self) -> str:
+        return f"{self.method} {self.path} ({self.duration_ms:.0f} ms)"
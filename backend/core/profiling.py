@@ -0,0 +1,208 @@
+"""Opt-in profiling of live requests.
+
+Staff users add ``X-Profile: 1`` (or ``?_profile=1``) to a request, and
+``ProfilingMiddleware`` runs it under a sampling profiler, at most
+``PROFILING_RATE_LIMIT`` times a minute. A background thread samples the
+handling thread's stack every ``SAMPLE_INTERVAL`` seconds into collapsed
+stacks. Under the ASGI server the event loop thread is sampled as well, so
+async views show up; async work of other requests on the same process can
+too. Executed SQL is recorded, and querysets that code paths pass to
+``note_queryset`` (the record list and saved view queries) are run again
+under ``EXPLAIN ANALYZE``. The result is stored as a ``RequestProfile``
+and browsable in the Django admin.
+"""
+
+from __future__ import annotations
+
+import sys
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Sequence
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, connection, transaction
+from rest_framework import exceptions
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from .models import RequestProfile
+
+PROFILE_HEADER = "X-Profile"
+PROFILE_QUERY_PARAM = "_profile"
+SAMPLE_INTERVAL = 0.002
+MAX_QUERIES = 2000
+MAX_PARAMS_LENGTH = 500
+
+
+class Profile:
+    """State of one profiled request, shared with the code it runs."""
+
+    def __init__(self):
+        self.queries: List[Dict[str, Any]] = []
+        self.querysets: Dict[str, Any] = {}
+
+    def record_query(self, execute, sql, params, many, context):
+        """Execute wrapper recording the request's SQL."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            if len(self.queries) < MAX_QUERIES:
+                self.queries.append({
+                    "sql": sql,
+                    "params": repr(params)[:MAX_PARAMS_LENGTH],
+                    "many": many,
+                    "duration_ms": round((time.perf_counter() - started) * 1000, 3),
+                })
+
+
+current_profile: ContextVar[Optional[Profile]] = ContextVar("current_profile", default=None)
+
+
+def note_queryset(label: str, queryset) -> None:
+    """Have the profiler explain ``queryset`` if the current request is profiled.
+
+    Pass the queryset as it is evaluated (sliced to the page) so the plan
+    matches what ran; a later note under the same label replaces it.
+    """
+    profile = current_profile.get()
+    if profile is not None:
+        profile.querysets[label] = queryset
+
+
+class SamplingProfiler:
+    """Samples the Python stacks of some threads from a background thread.
+
+    Samples of a thread idle in a selector (an event loop waiting for I/O)
+    are skipped.
+    """
+
+    def __init__(self, thread_ids: Sequence[int], interval: float = SAMPLE_INTERVAL):
+        self.thread_ids = tuple(thread_ids)
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self.run, name="request-profiler", daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        return False
+
+    def run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            for thread_id in self.thread_ids:
+                frame = frames.get(thread_id)
+                if frame is not None and frame.f_globals.get("__name__") != "selectors":
+                    self.samples[collapse(frame)] += 1
+
+    def collapsed(self) -> str:
+        return "\n".join(f"{stack} {count}" for stack, count in self.samples.most_common())
+
+
+def collapse(frame) -> str:
+    labels = []
+    while frame is not None:
+        code = frame.f_code
+        labels.append(f"{frame.f_globals.get('__name__', '?')}:{code.co_qualname}")
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+def is_requested(request) -> bool:
+    return request.headers.get(PROFILE_HEADER) == "1" or request.GET.get(PROFILE_QUERY_PARAM) == "1"
+
+
+def get_staff_user(request):
+    """The staff user behind a session or a JWT ``Authorization`` header, if any."""
+    user = getattr(request, "user", None)
+    if user is not None and user.is_authenticated:
+        return user if user.is_staff else None
+    try:
+        result = JWTAuthentication().authenticate(request)
+    except exceptions.AuthenticationFailed:
+        return None
+    if result is None or not result[0].is_staff:
+        return None
+    return result[0]
+
+
+def acquire_slot() -> bool:
+    """Count a profile against this minute's ``PROFILING_RATE_LIMIT``."""
+    key = f"profiling:{int(time.time() // 60)}"
+    cache.add(key, 0, 120)
+    try:
+        return cache.incr(key) <= settings.PROFILING_RATE_LIMIT
+    except ValueError:
+        # The key expired in between; skip rather than profile unlimited.
+        return False
+
+
+def explain(querysets: Dict[str, Any]) -> List[Dict[str, str]]:
+    """Run the noted querysets again under ``EXPLAIN (ANALYZE, BUFFERS)``."""
+    plans = []
+    for label, queryset in querysets.items():
+        try:
+            sql = str(queryset.query)
+        except Exception:
+            sql = ""
+        try:
+            with transaction.atomic():
+                with connection.cursor() as cursor:
+                    cursor.execute("SET LOCAL statement_timeout = %s", [int(settings.PROFILING_EXPLAIN_TIMEOUT * 1000)])
+                plan = queryset.explain(analyze=True, buffers=True)
+        except DatabaseError as exc:
+            plan = f"EXPLAIN failed: {exc}"
+        plans.append({"label": label, "sql": sql, "plan": plan})
+    return plans
+
+
+def save_profile(request, response, user, profile: Profile, sampler: SamplingProfiler, duration: float):
+    match = request.resolver_match
+    saved = RequestProfile.objects.create(
+        user=user,
+        method=request.method,
+        path=request.get_full_path(),
+        route=match.route if match is not None else "",
+        status_code=response.status_code,
+        duration_ms=round(duration * 1000, 3),
+        sample_count=sum(sampler.samples.values()),
+        stacks=sampler.collapsed(),
+        queries=profile.queries,
+        plans=explain(profile.querysets),
+    )
+    # Keep the store bounded.
+    cutoff = RequestProfile.objects.order_by("-id").values_list("id", flat=True)[settings.PROFILING_KEEP :].first()
+    if cutoff is not None:
+        RequestProfile.objects.filter(id__lte=cutoff).delete()
+    return saved
+
+
+def run_profiled(request, get_response, other_threads: Sequence[int] = ()):
+    """Answer ``request`` with ``get_response``, profiled when a staff user asks for it and the rate allows.
+
+    ``other_threads`` are sampled along with the current thread.
+    """
+    user = get_staff_user(request)
+    if user is None or not acquire_slot():
+        return get_response(request)
+    profile = Profile()
+    token = current_profile.set(profile)
+    started = time.perf_counter()
+    sampler = SamplingProfiler([threading.get_ident(), *other_threads])
+    try:
+        with sampler, connection.execute_wrapper(profile.record_query):
+            response = get_response(request)
+    finally:
+        current_profile.reset(token)
+    duration = time.perf_counter() - started
+    saved = save_profile(request, response, user, profile, sampler, duration)
+    response["X-Profile-Id"] = str(saved.pk)
+    return response
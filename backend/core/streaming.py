@@ -0,0 +1,59 @@
+"""Streaming responses that stream under both WSGI and ASGI.
+
+Under ASGI, Django reads a plain iterator given to ``StreamingHttpResponse``
+with ``sync_to_async(list)``, so the whole body is built in memory before the
+first byte is sent. ``streaming_response`` hands the ASGI server an async
+iterator instead, which pulls the sync iterator a chunk at a time in the
+request's sync thread (where its database connection and server-side
+cursor live).
+"""
+
+from __future__ import annotations
+
+from typing import AsyncIterator, Iterator, List, Union
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+Part = Union[str, bytes]
+
+
+def is_asgi(request) -> bool:
+    # DRF's ``Request`` wraps the Django request.
+    return isinstance(getattr(request, "_request", request), ASGIRequest)
+
+
+def next_parts(iterator: Iterator[Part], size: int) -> List[Part]:
+    """Take parts from ``iterator`` until they add up to ``size`` characters/bytes or it ends."""
+    parts = []
+    total = 0
+    for part in iterator:
+        parts.append(part)
+        total += len(part)
+        if total >= size:
+            break
+    return parts
+
+
+async def aiter_chunks(iterator: Iterator[Part], size: int = STREAM_CHUNK_SIZE) -> AsyncIterator[Part]:
+    take = sync_to_async(next_parts)
+    try:
+        while True:
+            parts = await take(iterator, size)
+            if not parts:
+                return
+            yield parts[0][:0].join(parts)
+    finally:
+        close = getattr(iterator, "close", None)
+        if close is not None:
+            await sync_to_async(close)()
+
+
+def streaming_response(request, content: Iterator[Part], **kwargs) -> StreamingHttpResponse:
+    """``StreamingHttpResponse`` over a sync iterator, streamed in chunks under ASGI too."""
+    if is_asgi(request):
+        return StreamingHttpResponse(aiter_chunks(content), **kwargs)
+    return StreamingHttpResponse(content, **kwargs)
@@ -1,8 +1,13 @@
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.crypto import constant_time_compare
 from rest_framework import permissions
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from workspaces.serializers import UserSerializer
+from .metrics import request_metrics
+from .profiling import get_staff_user
 
 
 class MeView(APIView):
@@ -11,3 +16,21 @@ class MeView(APIView):
     def get(self, request):
         serializer = UserSerializer(request.user)
         return Response(serializer.data)
+
+
+def metrics_view(request):
+    """Request metrics of this process in the Prometheus text format.
+
+    Scrapers send ``METRICS_TOKEN`` as a bearer token; without a configured
+    token only staff users can read the metrics.
+    """
+    token = settings.METRICS_TOKEN
+    if token:
+        allowed = constant_time_compare(request.headers.get("Authorization", ""), f"Bearer {token}")
+    else:
+        allowed = get_staff_user(request) is not None
+    if not allowed:
+        response = HttpResponse(status=401)
+        response["WWW-Authenticate"] = 'Bearer realm="metrics"'
+        return response
+    return HttpResponse(request_metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
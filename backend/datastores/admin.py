@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import Database, Table, Field, Record, View
+from .models import Attachment, Database, Table, Field, FieldConversion, Record, View
 
 
 @admin.register(Database)
@@ -30,3 +30,15 @@ class RecordAdmin(admin.ModelAdmin):
 @admin.register(View)
 class ViewAdmin(admin.ModelAdmin):
     list_display = ("id", "name", "table")
+
+
+@admin.register(Attachment)
+class AttachmentAdmin(admin.ModelAdmin):
+    list_display = ("id", "name", "table", "size", "content_type", "created_at")
+    search_fields = ("name", "sha256")
+
+
+@admin.register(FieldConversion)
+class FieldConversionAdmin(admin.ModelAdmin):
+    list_display = ("id", "field", "source_type", "target_type", "status", "processed", "total", "created_at")
+    list_filter = ("status",)
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+from typing import Any, Dict, List, Mapping, NamedTuple, Optional
+
+from django.contrib.postgres.aggregates import BoolAnd, BoolOr
+from django.db.models import Avg, Count, Max, Min, Sum
+from django.db.models.fields.json import KeyTextTransform
+from rest_framework import serializers
+
+from .expressions import field_expression, is_typed
+from .models import Field, FieldType, Table
+from .queries import get_field
+
+AGGREGATE_FUNCTIONS = ("count", "distinct_count", "sum", "avg", "min", "max")
+NUMERIC_TYPES = {FieldType.NUMBER, FieldType.DECIMAL}
+MAX_AGGREGATES = 20
+MAX_GROUP_BY = 3
+GROUP_LIMIT = 1000
+MAX_GROUP_LIMIT = 10000
+
+
+class AggregateSpec(NamedTuple):
+    key: str
+    function: str
+    field: Optional[Field]
+
+
+def parse_aggregates(table: Table, value: str) -> List[AggregateSpec]:
+    """Parse ``aggregate=Price:sum,Price:avg,count`` into specs.
+
+    ``count`` alone (or ``*:count``) counts records; every other function
+    needs a field. Unlike filters, unknown fields are reported rather than
+    ignored, since a missing column would silently change the result shape.
+    """
+    specs = []
+    for item in (value or "").split(","):
+        if not item:
+            continue
+        field_name, _, function = item.rpartition(":")
+        if function not in AGGREGATE_FUNCTIONS:
+            raise serializers.ValidationError({"aggregate": f"Unknown function in {item!r}; choose one of: {', '.join(AGGREGATE_FUNCTIONS)}."})
+        field = None
+        if field_name not in ("", "*"):
+            field = get_field(table, field_name)
+            if field is None:
+                raise serializers.ValidationError({"aggregate": f"Unknown field {field_name!r}."})
+        elif function != "count":
+            raise serializers.ValidationError({"aggregate": f"{function} requires a field."})
+        if function in ("sum", "avg") and field.type not in NUMERIC_TYPES:
+            raise serializers.ValidationError({"aggregate": f"{function} requires a number or decimal field."})
+        specs.append(AggregateSpec(item, function, field))
+    if not specs:
+        raise serializers.ValidationError({"aggregate": "Provide at least one aggregate, e.g. count or Price:sum."})
+    if len(specs) > MAX_AGGREGATES:
+        raise serializers.ValidationError({"aggregate": f"At most {MAX_AGGREGATES} aggregates are allowed."})
+    return specs
+
+
+def parse_group_by(table: Table, value: Optional[str]) -> List[Field]:
+    fields = []
+    for name in (value or "").split(","):
+        if not name:
+            continue
+        field = get_field(table, name)
+        if field is None:
+            raise serializers.ValidationError({"group_by": f"Unknown field {name!r}."})
+        fields.append(field)
+    if len(fields) > MAX_GROUP_BY:
+        raise serializers.ValidationError({"group_by": f"At most {MAX_GROUP_BY} group fields are allowed."})
+    return fields
+
+
+def parse_limit(value: Optional[str]) -> int:
+    if not value:
+        return GROUP_LIMIT
+    try:
+        limit = int(value)
+    except ValueError:
+        raise serializers.ValidationError({"limit": "Must be an integer."})
+    return max(1, min(limit, MAX_GROUP_LIMIT))
+
+
+def aggregate_expression(spec: AggregateSpec):
+    if spec.field is None:
+        return Count("id")
+    # Typed fields aggregate their cast value; the rest compare as text since
+    # Postgres has no min/max over jsonb.
+    if spec.function in ("min", "max") and not is_typed(spec.field):
+        expression = KeyTextTransform(spec.field.data_key, "data")
+    else:
+        expression = field_expression(spec.field)
+    if spec.function == "count":
+        return Count(expression)
+    if spec.function == "distinct_count":
+        return Count(expression, distinct=True)
+    if spec.field.type == FieldType.BOOLEAN:
+        # Postgres has no min/max over booleans either; false sorts first.
+        return {"min": BoolAnd, "max": BoolOr}[spec.function](expression)
+    return {"sum": Sum, "avg": Avg, "min": Min, "max": Max}[spec.function](expression)
+
+
+def aggregate_records(queryset, table: Table, params: Mapping[str, Any]) -> Dict[str, Any]:
+    """Run the requested aggregates over ``queryset`` as a single ``GROUP BY``.
+
+    Returns ``{"results": [{"group": {...}, "aggregates": {...}}], "truncated": bool}``;
+    without ``group_by`` there is exactly one result with an empty group.
+    """
+    specs = parse_aggregates(table, params.get("aggregate"))
+    group_fields = parse_group_by(table, params.get("group_by"))
+    # Field names are user data, so SQL aliases are generated and mapped back.
+    aggregates = {f"agg_{index}": aggregate_expression(spec) for index, spec in enumerate(specs)}
+    queryset = queryset.order_by()
+    if not group_fields:
+        row = queryset.aggregate(**aggregates)
+        return {
+            "results": [{"group": {}, "aggregates": {spec.key: row[f"agg_{index}"] for index, spec in enumerate(specs)}}],
+            "truncated": False,
+        }
+    groups = {f"grp_{index}": field_expression(field) for index, field in enumerate(group_fields)}
+    limit = parse_limit(params.get("limit"))
+    rows = list(
+        queryset.values(**groups).annotate(**aggregates).order_by(*groups)[: limit + 1]
+    )
+    results = [
+        {
+            "group": {field.name: row[f"grp_{index}"] for index, field in enumerate(group_fields)},
+            "aggregates": {spec.key: row[f"agg_{index}"] for index, spec in enumerate(specs)},
+        }
+        for row in rows[:limit]
+    ]
+    return {"results": results, "truncated": len(rows) > limit}
@@ -0,0 +1,155 @@
+"""Async handlers for the hottest read endpoints.
+
+Under the ASGI server these coroutines stand in for the DRF views' sync
+dispatch: authentication, checks, ETags and rendering run on the event loop
+without DRF's per-request machinery. Queries are still not async all the
+way down; Django 5.0's async ORM runs each of them through
+``sync_to_async`` on a thread. The handlers mirror the DRF views' responses
+(authentication, access, ETags, pagination, errors); other methods on the
+same URLs go to the DRF views.
+"""
+
+from __future__ import annotations
+
+from functools import wraps
+from typing import Any, Callable, Optional
+
+from asgiref.sync import markcoroutinefunction, sync_to_async
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse
+from rest_framework import exceptions, status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from core.metrics import timer
+from . import queries
+from .etags import not_modified_response, set_etag_headers, table_etag
+from .models import Record, Table
+from .rendering import arender_record_list
+from .schema import aget_table_schema
+from .serializers import FieldSerializer, RecordSerializer
+
+READ_METHODS = ("GET", "HEAD")
+
+
+def json_response(data: Any, status_code: int = status.HTTP_200_OK) -> HttpResponse:
+    return HttpResponse(JSONRenderer().render(data), status=status_code, content_type="application/json")
+
+
+def error_response(exc: exceptions.APIException) -> HttpResponse:
+    detail = exc.detail if isinstance(exc.detail, (dict, list)) else {"detail": exc.detail}
+    response = json_response(detail, exc.status_code)
+    if isinstance(exc, exceptions.NotAuthenticated):
+        response["WWW-Authenticate"] = 'Bearer realm="api"'
+    return response
+
+
+async def authenticate(request: Request):
+    with timer("auth"):
+        return await _authenticate(request)
+
+
+async def _authenticate(request: Request):
+    """Resolve the JWT user like ``JWTAuthentication`` but with an async user lookup."""
+    forced = getattr(request._request, "_force_auth_user", None)
+    if forced is not None:
+        # Set by DRF's test client (``force_authenticate``).
+        return forced
+    authentication = JWTAuthentication()
+    header = authentication.get_header(request)
+    raw_token = authentication.get_raw_token(header) if header is not None else None
+    if raw_token is None:
+        raise exceptions.NotAuthenticated()
+    # Raises ``InvalidToken``, an ``AuthenticationFailed``.
+    token = authentication.get_validated_token(raw_token)
+    user = await get_user_model().objects.filter(
+        **{jwt_settings.USER_ID_FIELD: token[jwt_settings.USER_ID_CLAIM]}
+    ).afirst()
+    if user is None or not user.is_active:
+        raise exceptions.AuthenticationFailed("User not found or inactive.")
+    return user
+
+
+async def get_table(user, table_id) -> Table:
+    with timer("permissions"):
+        table = await Table.objects.select_related("database").filter(
+            pk=table_id, database__workspace__role_assignments__user=user
+        ).afirst()
+    if table is None:
+        raise exceptions.NotFound()
+    # Memoizes the schema on ``table``, so building the query and serializing
+    # below (sync code, on the event loop) can't miss the cache and query.
+    await aget_table_schema(table)
+    return table
+
+
+async def record_list(request: Request, table_id: int) -> HttpResponse:
+    user = await authenticate(request)
+    table = await get_table(user, table_id)
+    etag = table_etag(table, request)
+    not_modified = not_modified_response(request, etag)
+    if not_modified is not None:
+        return not_modified
+    queryset = queries.build_record_queryset(table, request.query_params)
+    response = await arender_record_list(queryset, await aget_table_schema(table), request)
+    return set_etag_headers(response, etag)
+
+
+async def record_detail(request: Request, table_id: int, pk: int) -> HttpResponse:
+    user = await authenticate(request)
+    table = await get_table(user, table_id)
+    etag = table_etag(table, request)
+    not_modified = not_modified_response(request, etag)
+    if not_modified is not None:
+        return not_modified
+    record = await Record.objects.filter(table=table, pk=pk).afirst()
+    if record is None:
+        raise exceptions.NotFound()
+    data = RecordSerializer(record, context={"table": table, "request": request}).data
+    return set_etag_headers(json_response(data), etag)
+
+
+async def field_list(request: Request) -> Optional[HttpResponse]:
+    """``GET /api/fields/?table=<id>`` straight from the cached table schema.
+
+    Returns ``None`` for other queries, which the DRF view answers.
+    """
+    table_id = request.query_params.get("table")
+    if not table_id or not table_id.isdigit():
+        return None
+    user = await authenticate(request)
+    table = await Table.objects.filter(pk=table_id, database__workspace__role_assignments__user=user).afirst()
+    if table is None:
+        # Same as the DRF list filtered to a table the user can't see.
+        return json_response([])
+    etag = table_etag(table, request, include_data=False)
+    not_modified = not_modified_response(request, etag)
+    if not_modified is not None:
+        return not_modified
+    schema = await aget_table_schema(table)
+    return set_etag_headers(json_response(FieldSerializer(schema.fields, many=True).data), etag)
+
+
+def async_reads(read: Callable, fallback: Callable) -> Callable:
+    """Route ``GET``/``HEAD`` to the async ``read`` handler and other methods to the DRF ``fallback`` view.
+
+    ``read`` may return ``None`` to hand a request to ``fallback`` as well.
+    """
+    fallback_async = sync_to_async(fallback)
+
+    # Keeps the DRF view's attributes (``cls``, ``actions``, ``csrf_exempt``)
+    # so the OpenAPI schema still documents these endpoints.
+    @wraps(fallback)
+    async def view(request, *args, **kwargs):
+        if request.method in READ_METHODS:
+            try:
+                response = await read(Request(request), *args, **kwargs)
+            except exceptions.APIException as exc:
+                return error_response(exc)
+            if response is not None:
+                return response
+        return await fallback_async(request, *args, **kwargs)
+
+    return markcoroutinefunction(view)
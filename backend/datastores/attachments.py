@@ -0,0 +1,296 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+import tempfile
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Hashable, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, SkipFile
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import content_disposition_header
+
+from core.streaming import streaming_response
+from .models import Attachment, Field, Table
+
+BLOB_CHUNK_SIZE = 64 * 1024
+UNKNOWN_ATTACHMENT = "Unknown attachment."
+_SHA256_RE = re.compile(r"^[0-9a-f]{64}$")
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class LocalBlobStore:
+    """Content-addressed blobs on the local filesystem.
+
+    A blob lives at ``<root>/blobs/ab/cd/<sha256>``. Writes go to
+    ``<root>/tmp`` first and are renamed into place once the hash is known,
+    so readers never see partial files and identical content is stored once.
+    Extension point: an object-store backend (S3, MinIO) only needs the same
+    ``temp_file``/``commit``/``open``/``size`` methods.
+    """
+
+    def __init__(self, root):
+        self.root = Path(root)
+
+    def path(self, sha256: str) -> Path:
+        if not _SHA256_RE.match(sha256):
+            raise ValueError(f"Invalid blob key {sha256!r}.")
+        return self.root / "blobs" / sha256[:2] / sha256[2:4] / sha256
+
+    def temp_file(self) -> BinaryIO:
+        directory = self.root / "tmp"
+        directory.mkdir(parents=True, exist_ok=True)
+        return tempfile.NamedTemporaryFile(dir=directory, delete=False)
+
+    def commit(self, temp_path: str, sha256: str) -> bool:
+        """Move a finished temp file into place; returns ``False`` if the blob already existed."""
+        target = self.path(sha256)
+        try:
+            # A re-upload makes the blob new again, so ``purge_attachment_blobs``
+            # leaves it alone until the attachment row referencing it exists.
+            os.utime(target)
+        except FileNotFoundError:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(temp_path, target)
+            return True
+        os.unlink(temp_path)
+        return False
+
+    def save(self, chunks: Iterable[bytes]) -> Tuple[str, int]:
+        hasher = hashlib.sha256()
+        size = 0
+        with self.temp_file() as temp:
+            for chunk in chunks:
+                hasher.update(chunk)
+                temp.write(chunk)
+                size += len(chunk)
+        sha256 = hasher.hexdigest()
+        self.commit(temp.name, sha256)
+        return sha256, size
+
+    def open(self, sha256: str) -> BinaryIO:
+        return open(self.path(sha256), "rb")
+
+    def size(self, sha256: str) -> int:
+        return self.path(sha256).stat().st_size
+
+    def mtime(self, sha256: str) -> Optional[float]:
+        try:
+            return self.path(sha256).stat().st_mtime
+        except FileNotFoundError:
+            return None
+
+    def delete(self, sha256: str) -> None:
+        self.path(sha256).unlink(missing_ok=True)
+
+    def iter_blobs(self) -> Iterator[Tuple[str, float]]:
+        """Yield ``(sha256, mtime)`` for every stored blob."""
+        for path in (self.root / "blobs").glob("*/*/*"):
+            if _SHA256_RE.match(path.name):
+                yield path.name, path.stat().st_mtime
+
+
+@lru_cache(maxsize=None)
+def _blob_store(root: str) -> LocalBlobStore:
+    return LocalBlobStore(root)
+
+
+def get_blob_store() -> LocalBlobStore:
+    return _blob_store(str(settings.DATASTORES_ATTACHMENT_ROOT))
+
+
+class UploadedBlob(UploadedFile):
+    """An upload already hashed and written to the blob store's temp area."""
+
+    def __init__(self, temp_path: str, sha256: str, name: str, content_type: str, size: int):
+        super().__init__(file=None, name=name, content_type=content_type, size=size)
+        self.temp_path = temp_path
+        self.sha256 = sha256
+
+
+class BlobUploadHandler(FileUploadHandler):
+    """Stream multipart file parts straight into the blob store.
+
+    Each chunk is hashed and written as it arrives, so uploads of any size
+    use constant memory and need no second pass to compute the content
+    address. Files over ``max_size`` are dropped and flagged in ``too_large``.
+    """
+
+    chunk_size = BLOB_CHUNK_SIZE
+
+    def __init__(self, request=None, max_size: Optional[int] = None):
+        super().__init__(request)
+        self.max_size = max_size
+        self.too_large = False
+        self.temp = None
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.temp = get_blob_store().temp_file()
+        self.hasher = hashlib.sha256()
+        self.size = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.size += len(raw_data)
+        if self.max_size is not None and self.size > self.max_size:
+            self.too_large = True
+            self.discard()
+            raise SkipFile()
+        self.hasher.update(raw_data)
+        self.temp.write(raw_data)
+        return None
+
+    def file_complete(self, file_size):
+        self.temp.close()
+        name = os.path.basename(self.file_name or "")[:255] or "file"
+        blob = UploadedBlob(self.temp.name, self.hasher.hexdigest(), name, self.content_type or "application/octet-stream", self.size)
+        self.temp = None
+        return blob
+
+    def upload_interrupted(self):
+        self.discard()
+
+    def discard(self):
+        if self.temp is not None:
+            self.temp.close()
+            os.unlink(self.temp.name)
+            self.temp = None
+
+
+def discard_uploads(files, keep: Optional[UploadedBlob] = None) -> None:
+    """Remove the temp files of every uploaded part except ``keep``."""
+    for _, uploads in files.lists():
+        for upload in uploads:
+            if isinstance(upload, UploadedBlob) and upload is not keep:
+                Path(upload.temp_path).unlink(missing_ok=True)
+
+
+def store_upload(table: Table, upload: UploadedBlob, user) -> Attachment:
+    get_blob_store().commit(upload.temp_path, upload.sha256)
+    return Attachment.objects.create(
+        table=table,
+        sha256=upload.sha256,
+        size=upload.size,
+        name=upload.name,
+        content_type=upload.content_type,
+        created_by=user,
+    )
+
+
+def resolve_references(
+    table: Table,
+    fields: Sequence[Field],
+    rows: List[Tuple[Hashable, Dict[str, Any]]],
+) -> Dict[Hashable, Dict[str, str]]:
+    """Expand ``{"id": ...}`` attachment values in ``rows`` to full references.
+
+    ``rows`` holds ``(key, data)`` pairs whose values the validator already
+    normalised; ``data`` is updated in place. Attachments must belong to
+    ``table``. All ids are resolved with one query; unknown ones are
+    reported per key like unique conflicts.
+    """
+    errors: Dict[Hashable, Dict[str, str]] = {}
+    wanted = {
+        data[field.name]["id"]
+        for _, data in rows
+        for field in fields
+        if isinstance(data.get(field.name), dict)
+    }
+    if not wanted:
+        return errors
+    attachments = Attachment.objects.filter(table=table).in_bulk(wanted)
+    for key, data in rows:
+        for field in fields:
+            value = data.get(field.name)
+            if not isinstance(value, dict):
+                continue
+            attachment = attachments.get(value["id"])
+            if attachment is None:
+                errors.setdefault(key, {})[field.name] = UNKNOWN_ATTACHMENT
+            else:
+                data[field.name] = attachment.as_reference()
+    return errors
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Parse a single ``bytes=`` range into inclusive ``(start, end)``.
+
+    Returns ``None`` for absent or multi-range headers, which are answered
+    with the full body as RFC 9110 allows.
+    """
+    if not header:
+        return None
+    match = _RANGE_RE.match(header.strip())
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        raise RangeNotSatisfiable()
+    if not first:
+        length = int(last)
+        if length == 0:
+            raise RangeNotSatisfiable()
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        raise RangeNotSatisfiable()
+    return start, end
+
+
+def iter_blob(handle: BinaryIO, start: int, length: int) -> Iterator[bytes]:
+    try:
+        handle.seek(start)
+        while length > 0:
+            chunk = handle.read(min(BLOB_CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        handle.close()
+
+
+def blob_response(request, attachment: Attachment) -> HttpResponse:
+    """Stream an attachment, honouring ``If-None-Match`` and single ``Range`` requests."""
+    # Attachment rows never change and blobs are addressed by content, so
+    # the hash is a strong validator and the response can be cached for good.
+    etag = f'"{attachment.sha256}"'
+    if etag in request.headers.get("If-None-Match", ""):
+        response = HttpResponseNotModified()
+        response["ETag"] = etag
+        return response
+    store = get_blob_store()
+    size = store.size(attachment.sha256)
+    try:
+        byte_range = parse_range(request.headers.get("Range"), size)
+    except RangeNotSatisfiable:
+        response = HttpResponse(status=416)
+        response["Content-Range"] = f"bytes */{size}"
+        return response
+    start, end = byte_range or (0, size - 1)
+    length = end - start + 1 if size else 0
+    response = streaming_response(
+        request,
+        iter_blob(store.open(attachment.sha256), start, length),
+        status=206 if byte_range else 200,
+        content_type=attachment.content_type,
+    )
+    if byte_range:
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+    response["Content-Length"] = str(length)
+    response["Accept-Ranges"] = "bytes"
+    response["ETag"] = etag
+    response["Cache-Control"] = "private, max-age=31536000, immutable"
+    response["Content-Disposition"] = content_disposition_header(
+        request.GET.get("download") == "1", attachment.name
+    )
+    return response
@@ -0,0 +1,293 @@
+from __future__ import annotations
+
+import json
+import logging
+from typing import Any, Callable, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.db.models.fields.json import KeyTransform
+from django.utils import timezone
+
+from jobs.queue import JobGone, enqueue
+
+from .models import ConversionStatus, Field, FieldConversion, FieldType, Record, Table
+from .validation import InvalidValue, compile_field
+
+logger = logging.getLogger(__name__)
+
+CONVERSION_BATCH_SIZE = 1000
+UNCONVERTIBLE_TYPES = {FieldType.ATTACHMENT}
+TEXT_TYPES = {FieldType.TEXT, FieldType.LONG_TEXT}
+SELECT_TYPES = {FieldType.SINGLE_SELECT, FieldType.MULTI_SELECT}
+
+# Sets the converted value under the target key, but only where the source
+# value is still the one that was read; records written in the meantime are
+# picked up by the catch-up passes.
+WRITE_SQL = """
+UPDATE datastores_record AS r
+SET data = r.data || jsonb_build_object(%(target)s, v.new)
+FROM jsonb_to_recordset(%(rows)s::jsonb) AS v(id bigint, old jsonb, new jsonb)
+WHERE r.id = v.id AND r.data -> %(source)s = coalesce(v.old, 'null'::jsonb)
+"""
+
+STRIP_SQL = """
+UPDATE datastores_record SET data = data - %(source)s
+WHERE table_id = %(table)s AND id >= %(start)s AND id < %(end)s AND data ? %(source)s
+"""
+
+
+def _as_text(value: Any) -> str:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, list):
+        return ", ".join(_as_text(item) for item in value)
+    return str(value)
+
+
+def compile_conversion(target_type: str, target_options: dict) -> Callable[[Any], Any]:
+    """Return a callable turning a stored value into one valid for ``target_type``.
+
+    Builds on the record validator's coercers; values they reject raise
+    ``InvalidValue``. Empty values stay empty.
+    """
+    target = Field(type=target_type, options=target_options)
+    coerce = compile_field(target)
+
+    def convert(value):
+        if value is None or value == "" or value == []:
+            return None
+        if target_type in TEXT_TYPES:
+            return _as_text(value)
+        if target_type == FieldType.MULTI_SELECT and not isinstance(value, list):
+            value = [item.strip() for item in _as_text(value).split(",") if item.strip()]
+        elif target_type == FieldType.SINGLE_SELECT:
+            if isinstance(value, list) and len(value) == 1:
+                value = value[0]
+            value = _as_text(value)
+        return coerce(value) if coerce is not None else value
+
+    return convert
+
+
+def start_conversion(field: Field, target_type: str, target_options: dict, user) -> FieldConversion:
+    from .tasks import CONVERT_FIELD
+
+    conversion = FieldConversion.objects.create(
+        field=field,
+        source_type=field.type,
+        target_type=target_type,
+        target_options=target_options,
+        created_by=user,
+    )
+    enqueue(
+        CONVERT_FIELD,
+        {"conversion_id": conversion.pk},
+        workspace=field.table.database.workspace,
+        user=user,
+        max_attempts=5,
+    )
+    return conversion
+
+
+def _try_lock(conversion_id: int) -> bool:
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_try_advisory_lock(hashtext('datastores_field_conversion'), %s)", [conversion_id])
+        return cursor.fetchone()[0]
+
+
+def _unlock(conversion_id: int) -> None:
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_unlock(hashtext('datastores_field_conversion'), %s)", [conversion_id])
+
+
+def run_conversion(
+    conversion_id: int,
+    batch_size: Optional[int] = None,
+    progress: Optional[Callable[[int, Optional[int]], None]] = None,
+) -> None:
+    """Run (or resume) a conversion to completion.
+
+    Runs as a ``datastores.convert_field`` job. A session advisory lock makes
+    sure only one process works on a conversion; others return immediately.
+    ``progress(processed, total)`` is called after every chunk. The job is
+    retried on errors; once it runs out of attempts, the conversion is marked
+    failed.
+    """
+    if not _try_lock(conversion_id):
+        return
+    try:
+        conversion = FieldConversion.objects.select_related("field__table").filter(pk=conversion_id).first()
+        if conversion is None or conversion.status not in FieldConversion.ACTIVE_STATUSES:
+            return
+        batch_size = batch_size or getattr(settings, "DATASTORES_CONVERSION_BATCH_SIZE", CONVERSION_BATCH_SIZE)
+        try:
+            ConversionRun(conversion, batch_size, progress).run()
+        except JobGone:
+            raise
+        except Exception as exc:
+            logger.exception("Field conversion %s failed", conversion_id)
+            FieldConversion.objects.filter(pk=conversion_id).update(error=str(exc), updated_at=timezone.now())
+            raise
+    finally:
+        _unlock(conversion_id)
+
+
+def fail_conversion(conversion_id: int, error: str) -> None:
+    FieldConversion.objects.filter(pk=conversion_id, status__in=FieldConversion.ACTIVE_STATUSES).update(
+        status=ConversionStatus.FAILED, error=error, finished_at=timezone.now(), updated_at=timezone.now()
+    )
+
+
+class ConversionRun:
+    """The phases of one conversion; each is idempotent so a rerun resumes.
+
+    1. Copy: walk the table by record id in ``batch_size`` chunks (each its
+       own short transaction) and write converted values under the next key.
+    2. Swap: lock the table row, which record writes need for their
+       ``data_version`` bump, convert what was written since, and switch the
+       field's type and key. Writes only wait for this short transaction.
+    3. Clean up: convert stragglers written under the old key (e.g. by
+       writes the swap skipped) and remove it.
+
+    API writes validated against the old schema can't land after the swap:
+    they run under ``fenced_writes``, and the database rejects them once the
+    swap has bumped ``schema_version``.
+    """
+
+    def __init__(self, conversion: FieldConversion, batch_size: int, progress=None):
+        self.conversion = conversion
+        self.progress = progress
+        self.field = conversion.field
+        self.table_id = self.field.table_id
+        self.batch_size = batch_size
+        self.convert = compile_conversion(conversion.target_type, conversion.target_options)
+        version = self.field.key_version - 1 if conversion.swapped_at else self.field.key_version
+        self.source_key = self.field.versioned_key(version)
+        self.target_key = self.field.versioned_key(version + 1)
+
+    def run(self) -> None:
+        if self.conversion.swapped_at is None:
+            self.copy()
+            self.swap()
+        self.catch_up()
+        self.strip()
+        self.update(status=ConversionStatus.FINISHED, finished_at=timezone.now())
+
+    def update(self, **values) -> None:
+        if not FieldConversion.objects.filter(pk=self.conversion.pk).update(updated_at=timezone.now(), **values):
+            raise RuntimeError("The conversion was removed (was the field deleted?).")
+        for name, value in values.items():
+            if not hasattr(value, "resolve_expression"):
+                setattr(self.conversion, name, value)
+
+    def heartbeat(self) -> None:
+        if self.progress is not None:
+            self.conversion.refresh_from_db(fields=["processed", "total"])
+            self.progress(self.conversion.processed, self.conversion.total)
+
+    def records(self):
+        return Record.objects.filter(table_id=self.table_id, data__has_key=self.source_key)
+
+    def copy(self) -> None:
+        if self.conversion.status == ConversionStatus.PENDING:
+            self.update(status=ConversionStatus.RUNNING, total=self.records().count())
+        last_id = self.conversion.last_record_id
+        while True:
+            rows = list(
+                self.records()
+                .filter(id__gt=last_id)
+                .order_by("id")
+                .annotate(value=KeyTransform(self.source_key, "data"))
+                .values_list("id", "value")[: self.batch_size]
+            )
+            if not rows:
+                return
+            invalid = self.write(rows)
+            last_id = rows[-1][0]
+            self.update(
+                last_record_id=last_id,
+                processed=F("processed") + len(rows),
+                invalid=F("invalid") + invalid,
+                # Records created while converting extend the work.
+                total=Greatest(F("total"), F("processed") + len(rows)),
+            )
+            self.heartbeat()
+
+    def write(self, rows: List[Tuple[int, Any]]) -> int:
+        """Write converted values of ``(id, value)`` rows; returns how many were invalid."""
+        payload = []
+        invalid = 0
+        for record_id, value in rows:
+            try:
+                new = self.convert(value)
+            except InvalidValue:
+                new = None
+                invalid += 1
+            payload.append({"id": record_id, "old": value, "new": new})
+        with connection.cursor() as cursor:
+            cursor.execute(
+                WRITE_SQL, {"rows": json.dumps(payload), "source": self.source_key, "target": self.target_key}
+            )
+        return invalid
+
+    def pending_rows(self):
+        # Written (or rewritten) since their chunk was converted: the API
+        # replaces ``data`` as a whole, which drops the target key.
+        return (
+            self.records()
+            .exclude(data__has_key=self.target_key)
+            .order_by("id")
+            .annotate(value=KeyTransform(self.source_key, "data"))
+            .values_list("id", "value")
+        )
+
+    def catch_up(self, skip_locked: bool = False) -> None:
+        last_id = 0
+        while True:
+            queryset = self.pending_rows().filter(id__gt=last_id)
+            if skip_locked:
+                queryset = queryset.select_for_update(skip_locked=True)
+            rows = list(queryset[: self.batch_size])
+            if not rows:
+                return
+            self.write(rows)
+            last_id = rows[-1][0]
+            if not skip_locked:
+                self.heartbeat()
+
+    def swap(self) -> None:
+        # Converting outside the lock first keeps the locked section short.
+        self.catch_up()
+        with transaction.atomic():
+            Table.objects.select_for_update().filter(pk=self.table_id).first()
+            # Writers update their records before bumping the table, so some
+            # may now wait on us while holding record locks. Those rows are
+            # skipped here (waiting on them would deadlock); they commit with
+            # only the old key after the swap and the clean-up converts them.
+            self.catch_up(skip_locked=True)
+            field = Field.objects.select_for_update().select_related("table").get(pk=self.field.pk)
+            field.type = self.conversion.target_type
+            options = dict(self.conversion.target_options)
+            if "indexed" in field.options:
+                options.setdefault("indexed", field.options["indexed"])
+            field.options = options
+            field.key_version += 1
+            field.save()
+            self.update(swapped_at=timezone.now())
+        self.field = field
+
+    def strip(self) -> None:
+        bounds = Record.objects.filter(table_id=self.table_id).order_by("id").values_list("id", flat=True)
+        first, last = bounds.first(), bounds.last()
+        if first is None:
+            return
+        with connection.cursor() as cursor:
+            for start in range(first, last + 1, self.batch_size):
+                cursor.execute(
+                    STRIP_SQL,
+                    {"source": self.source_key, "table": self.table_id, "start": start, "end": start + self.batch_size},
+                )
+                self.heartbeat()
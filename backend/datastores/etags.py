@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+import hashlib
+from typing import Optional
+
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from rest_framework import exceptions, status
+
+from .models import Table
+
+
+class PreconditionFailed(exceptions.APIException):
+    status_code = status.HTTP_412_PRECONDITION_FAILED
+    default_detail = "The record was changed since you read it."
+    default_code = "precondition_failed"
+
+
+def parse_if_match(request) -> Optional[int]:
+    """Record version from ``If-Match: "<version>"``; ``None`` when absent or ``*``.
+
+    Tags that can't be a record version never match, so they fail the
+    precondition like a stale one.
+    """
+    header = request.headers.get("If-Match", "").strip()
+    if not header or header == "*":
+        return None
+    tag = header.split(",")[0].strip().removeprefix("W/").strip('"')
+    if not tag.isdigit():
+        raise PreconditionFailed()
+    return int(tag)
+
+
+def table_etag(table: Table, request, include_data: bool = True) -> str:
+    """Weak ETag of a table-scoped response.
+
+    Built from the table's version counters and the full request path, so
+    it changes whenever a field, view or (with ``include_data``) record of
+    the table is written, or when the query asks for something else.
+    """
+    digest = hashlib.sha1(request.get_full_path().encode()).hexdigest()[:16]
+    data_version = table.data_version if include_data else "-"
+    return f'W/"{table.pk}.{table.schema_version}.{data_version}.{digest}"'
+
+
+def not_modified_response(request, etag: Optional[str]):
+    """``304 Not Modified`` when ``If-None-Match`` matches ``etag``, else ``None``."""
+    if etag is None or request.method not in ("GET", "HEAD"):
+        return None
+    response = get_conditional_response(request, etag=etag)
+    if response is not None:
+        set_etag_headers(response, etag)
+    return response
+
+
+def set_etag_headers(response, etag: Optional[str]):
+    if etag is None or response.status_code != 200:
+        return response
+    response["ETag"] = etag
+    # Make browsers revalidate every time instead of serving a stale copy,
+    # and keep shared caches from mixing up users.
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ["Authorization"])
+    return response
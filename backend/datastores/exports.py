@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import csv
+import io
+import json
+from typing import Iterable, Iterator
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+from core.streaming import streaming_response
+from .schema import TableSchema
+
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_COLUMNS = ("id", "table_id", "data", "created_by_id", "updated_by_id", "created_at", "updated_at")
+
+
+class ExportFormat:
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+    content_types = {
+        NDJSON: "application/x-ndjson",
+        CSV: "text/csv; charset=utf-8",
+    }
+
+
+def iter_rows(queryset) -> Iterator[tuple]:
+    # ``values_list`` + ``iterator`` keeps a server-side cursor open and skips
+    # model instantiation, so memory stays flat regardless of table size.
+    return queryset.values_list(*EXPORT_COLUMNS).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+def iter_ndjson(rows: Iterable[tuple], schema: TableSchema) -> Iterator[str]:
+    encoder = DjangoJSONEncoder(separators=(",", ":"))
+    for record_id, table_id, data, created_by, updated_by, created_at, updated_at in rows:
+        yield encoder.encode({
+            "id": record_id,
+            "table": table_id,
+            "data": schema.to_api(data),
+            "created_by": created_by,
+            "updated_by": updated_by,
+            "created_at": created_at,
+            "updated_at": updated_at,
+        }) + "\n"
+
+
+def format_csv_value(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, (list, dict)):
+        return json.dumps(value)
+    return str(value)
+
+
+def iter_csv(rows: Iterable[tuple], schema: TableSchema) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush() -> str:
+        chunk = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+        return chunk
+
+    writer.writerow(["id", *(name for name, _ in schema.keys), "created_at", "updated_at"])
+    yield flush()
+    for record_id, _, data, _, _, created_at, updated_at in rows:
+        writer.writerow([
+            record_id,
+            *(format_csv_value(data.get(key)) for _, key in schema.keys),
+            created_at.isoformat(),
+            updated_at.isoformat(),
+        ])
+        yield flush()
+
+
+def stream_export(request, queryset, schema: TableSchema, export_format: str, filename: str) -> StreamingHttpResponse:
+    rows = iter_rows(queryset)
+    if export_format == ExportFormat.CSV:
+        content = iter_csv(rows, schema)
+    else:
+        export_format = ExportFormat.NDJSON
+        content = iter_ndjson(rows, schema)
+    response = streaming_response(request, content, content_type=ExportFormat.content_types[export_format])
+    response["Content-Disposition"] = f'attachment; filename="{filename}.{export_format}"'
+    return response
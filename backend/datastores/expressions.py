@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+from django.db.models import BooleanField, DateTimeField, FloatField, Func
+from django.db.models.fields.json import KeyTransform
+
+from .models import Field, FieldType
+
+
+class JSONNumber(Func):
+    """``data -> key`` as double precision; NULL unless the JSON value is a number."""
+
+    function = "datastores_json_number"
+    output_field = FloatField()
+
+
+class JSONTimestamp(Func):
+    """``data -> key`` parsed as an ISO timestamp (UTC when no offset); NULL if unparsable."""
+
+    function = "datastores_json_timestamp"
+    output_field = DateTimeField()
+
+
+class JSONBoolean(Func):
+    """``data -> key`` as boolean; NULL unless the JSON value is a boolean."""
+
+    function = "datastores_json_boolean"
+    output_field = BooleanField()
+
+
+# The SQL functions are created in migration 0004 and declared IMMUTABLE so
+# the same expressions can back the per-field indexes in ``indexes.py``.
+TYPED_EXPRESSIONS = {
+    FieldType.NUMBER: JSONNumber,
+    FieldType.DECIMAL: JSONNumber,
+    FieldType.DATE: JSONTimestamp,
+    FieldType.BOOLEAN: JSONBoolean,
+}
+
+
+def is_typed(field: Field) -> bool:
+    return field.type in TYPED_EXPRESSIONS
+
+
+def field_expression(field: Field):
+    """Expression to sort and compare ``field`` by, cast according to its type."""
+    expression = KeyTransform(field.data_key, "data")
+    typed = TYPED_EXPRESSIONS.get(field.type)
+    return typed(expression) if typed else expression
@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+from typing import Dict, Set
+
+from django.db import connection, models
+from django.db.models import F, Q
+
+from .expressions import field_expression
+from .models import DataLayout, Field, FieldType, Record, View
+
+INDEX_PREFIX = "datastores_rec_f"
+
+
+INDEX_KINDS = {
+    FieldType.NUMBER: "num",
+    FieldType.DECIMAL: "num",
+    FieldType.DATE: "ts",
+    FieldType.BOOLEAN: "bool",
+}
+
+
+def field_index_name(table_id: int, field: Field) -> str:
+    # The kind suffix changes with the indexed expression (cast, whether the
+    # value is keyed by id and which key version), so an index built for a
+    # different one is recognised as stale and replaced.
+    kind = INDEX_KINDS.get(field.type, "json")
+    if field.table.data_layout == DataLayout.IDS:
+        kind = f"k{kind}v{field.key_version}" if field.key_version else f"k{kind}"
+    return f"{INDEX_PREFIX}{field.pk}_t{table_id}_{kind}"
+
+
+def view_field_names(view: View) -> Set[str]:
+    config = view.config or {}
+    names = set()
+    for spec in [*config.get("sort", []), *config.get("filter", [])]:
+        if isinstance(spec, str) and ":" in spec:
+            names.add(spec.split(":", 1)[0])
+    return names
+
+
+def wanted_indexes(table_id: int) -> Dict[str, Field]:
+    """Fields that deserve an expression index: used by a saved view or flagged ``options.indexed``."""
+    used = set()
+    for view in View.objects.filter(table_id=table_id).only("config"):
+        used |= view_field_names(view)
+    return {
+        field_index_name(table_id, field): field
+        for field in Field.objects.filter(table_id=table_id).select_related("table")
+        if field.name in used or field.options.get("indexed")
+    }
+
+
+def existing_indexes(table_id: int) -> Dict[str, bool]:
+    """Managed index names of a table mapped to whether the build completed."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT c.relname, i.indisvalid
+            FROM pg_index i
+            JOIN pg_class c ON c.oid = i.indexrelid
+            WHERE i.indrelid = %s::regclass AND c.relname ~ %s
+            """,
+            [Record._meta.db_table, f"^{INDEX_PREFIX}\\d+_t{table_id}(_[a-z0-9]+)?$"],
+        )
+        return dict(cursor.fetchall())
+
+
+def create_index(table_id: int, name: str, field: Field) -> None:
+    # Built from the same expression the queries sort and filter by, so the
+    # planner can match it. The trailing id serves ``ORDER BY <field>, id`` in
+    # both directions.
+    index = models.Index(field_expression(field), F("id"), name=name, condition=Q(table_id=table_id))
+    with connection.schema_editor(atomic=False) as editor:
+        editor.add_index(Record, index, concurrently=True)
+
+
+def drop_index(name: str) -> None:
+    with connection.cursor() as cursor:
+        cursor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {connection.ops.quote_name(name)}")
+
+
+def sync_table_indexes(table_id: int) -> None:
+    """Create missing and drop stale per-field indexes of a table.
+
+    Uses ``CONCURRENTLY`` so writes keep flowing, which means it must run
+    outside a transaction block. Failed builds leave invalid indexes behind;
+    those are dropped and rebuilt.
+    """
+    wanted = wanted_indexes(table_id)
+    existing = existing_indexes(table_id)
+    for name, valid in existing.items():
+        if name not in wanted or not valid:
+            drop_index(name)
+    for name, field in wanted.items():
+        if not existing.get(name):
+            create_index(table_id, name, field)
+
@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, List, Mapping, Optional, Tuple
+
+from django.db import connection
+from rest_framework import serializers
+
+from .models import Record, Table
+
+DELTA_LIMIT = 1000
+MAX_DELTA_LIMIT = 5000
+EXPIRE_BATCH_SIZE = 10000
+
+# Latest change per record in (since, upper]. The page ends at the seq of its
+# ``limit``-th record but always covers that seq completely, so a page can
+# run over ``limit`` when one statement wrote many records.
+DELTA_SQL = """
+WITH latest AS (
+    SELECT record_id, max(seq) AS seq, bool_or(op = 'insert') AS inserted
+    FROM datastores_recordchange
+    WHERE table_id = %(table)s AND seq > %(since)s AND seq <= %(upper)s
+    GROUP BY record_id
+), cutoff AS (
+    SELECT coalesce(
+        (SELECT seq FROM latest ORDER BY seq, record_id OFFSET %(limit)s - 1 LIMIT 1),
+        %(upper)s
+    ) AS seq
+)
+SELECT record_id, latest.seq, inserted, cutoff.seq
+FROM latest, cutoff
+WHERE latest.seq <= cutoff.seq
+ORDER BY latest.seq, record_id
+"""
+
+HAS_MORE_SQL = """
+SELECT EXISTS (
+    SELECT 1 FROM datastores_recordchange WHERE table_id = %(table)s AND seq > %(cutoff)s AND seq <= %(upper)s
+)
+"""
+
+# Keeps only the newest entry per record. Deltas are compacted the same way,
+# so this never changes what a client receives.
+COMPACT_SQL = """
+DELETE FROM datastores_recordchange
+WHERE id IN (
+    SELECT id FROM (
+        SELECT id, row_number() OVER (PARTITION BY record_id ORDER BY seq DESC) AS position
+        FROM datastores_recordchange
+        WHERE table_id = %(table)s
+    ) ranked
+    WHERE position > 1
+)
+"""
+
+# Expired entries raise the table's floor, so clients that synced before
+# them are told to start over instead of silently missing changes.
+EXPIRE_SQL = """
+WITH removed AS (
+    DELETE FROM datastores_recordchange
+    WHERE id IN (
+        SELECT id FROM datastores_recordchange WHERE created_at < %(cutoff)s ORDER BY id LIMIT %(batch)s
+    )
+    RETURNING table_id, seq
+)
+UPDATE datastores_table AS t
+SET journal_floor = greatest(t.journal_floor, r.seq)
+FROM (SELECT table_id, max(seq) AS seq FROM removed GROUP BY table_id) AS r
+WHERE t.id = r.table_id
+"""
+
+
+class JournalExpired(Exception):
+    """The requested ``since`` predates the oldest change still journaled."""
+
+
+@dataclass
+class Delta:
+    since: int
+    seq: int
+    has_more: bool
+    records: List[Record] = field(default_factory=list)
+    deleted: List[int] = field(default_factory=list)
+
+
+def parse_delta_params(params: Mapping[str, Any]) -> Tuple[Optional[int], int]:
+    try:
+        since = int(params["since"]) if params.get("since") not in (None, "") else None
+        limit = int(params.get("limit") or DELTA_LIMIT)
+    except ValueError:
+        raise serializers.ValidationError({"detail": "since and limit must be integers."})
+    return since, max(1, min(limit, MAX_DELTA_LIMIT))
+
+
+def get_delta(table: Table, since: int, limit: int = DELTA_LIMIT) -> Delta:
+    """Compacted changes of ``table`` after ``since``: current records and deleted ids.
+
+    Each record appears once with its current state. Records created and
+    deleted within the window are left out unless compaction already dropped
+    their insert, so clients must ignore deleted ids they don't know.
+    Continue from the returned ``seq``; a record changing while a client
+    pages may be sent twice.
+    """
+    if since > table.data_version:
+        raise serializers.ValidationError({"since": "Ahead of the table's current seq."})
+    if since < table.journal_floor:
+        raise JournalExpired(f"Changes up to seq {table.journal_floor} have expired; pull the table again.")
+    upper = table.data_version
+    params = {"table": table.pk, "since": since, "upper": upper, "limit": limit}
+    with connection.cursor() as cursor:
+        cursor.execute(DELTA_SQL, params)
+        rows: List[Tuple[int, int, bool, int]] = cursor.fetchall()
+        cutoff = rows[-1][3] if rows else upper
+        has_more = False
+        if cutoff < upper:
+            cursor.execute(HAS_MORE_SQL, {**params, "cutoff": cutoff})
+            has_more = cursor.fetchone()[0]
+    seq = cutoff if has_more else upper
+    existing = Record.objects.filter(table=table, pk__in=[row[0] for row in rows]).in_bulk()
+    delta = Delta(since=since, seq=seq, has_more=has_more)
+    for record_id, _, inserted, _ in rows:
+        record = existing.get(record_id)
+        if record is not None:
+            delta.records.append(record)
+        elif not inserted:
+            delta.deleted.append(record_id)
+    return delta
+
+
+def compact_journal(table_id: int) -> int:
+    with connection.cursor() as cursor:
+        cursor.execute(COMPACT_SQL, {"table": table_id})
+        return cursor.rowcount
+
+
+def expire_journal(cutoff: datetime, batch_size: int = EXPIRE_BATCH_SIZE) -> None:
+    with connection.cursor() as cursor:
+        while True:
+            cursor.execute(EXPIRE_SQL, {"cutoff": cutoff, "batch": batch_size})
+            if not cursor.rowcount:
+                return
+
+
+def skip_journal() -> None:
+    """Leave the rest of the current transaction's record writes out of the journal.
+
+    They don't bump ``data_version`` either, so only use this for records no
+    client will sync again, e.g. those of a table being hard-deleted. Must be
+    called inside ``transaction.atomic``.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT set_config('datastores.skip_journal', 'on', true)")
@@ -0,0 +1,246 @@
+import json
+import random
+import statistics
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from datastores.models import Field, FieldType, Record, Table
+from datastores.synthetic import ValueFactory
+
+PAGE_SIZE = 100
+BATCH_SIZE = 100
+SAMPLE_SIZE = 5000
+SCENARIOS = ("list", "page", "filter", "sort", "search", "create", "patch", "batch_create", "batch_update")
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the records API of a table in-process against the configured database and report "
+        "p50/p95/p99 latency, SQL queries and peak Python memory per request. "
+        "Write scenarios modify the table; records they create are deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("table", type=int, help="Table to benchmark, e.g. one made by generate_data.")
+        parser.add_argument("--iterations", type=int, default=50)
+        parser.add_argument("--warmup", type=int, default=5)
+        parser.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"Subset of {', '.join(SCENARIOS)}.")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--json", dest="json_path", help="Write the results to this file.")
+        parser.add_argument("--baseline", help="Compare with results previously written with --json.")
+        parser.add_argument(
+            "--max-regression",
+            type=float,
+            help="Fail when a p95 is this many percent slower than in --baseline.",
+        )
+
+    def handle(self, *args, **options):
+        table = Table.objects.select_related("database__workspace__owner").filter(pk=options["table"]).first()
+        if table is None:
+            raise CommandError(f"Table {options['table']} does not exist.")
+        names = [name for name in options["scenarios"].split(",") if name]
+        unknown = sorted(set(names) - set(SCENARIOS))
+        if unknown:
+            raise CommandError(f"Unknown scenarios: {', '.join(unknown)}.")
+        if options["iterations"] < 2:
+            raise CommandError("--iterations must be at least 2.")
+
+        self.table = table
+        self.rng = random.Random(options["seed"])
+        self.client = APIClient()
+        self.client.force_authenticate(table.database.workspace.owner)
+        self.fields = list(Field.objects.filter(table=table).select_related("table"))
+        self.factory = ValueFactory(self.fields, options["seed"])
+        self.next_index = time.time_ns() // 1000
+        self.created: List[int] = []
+        self.sample_ids = list(Record.objects.filter(table=table).order_by("id").values_list("pk", flat=True)[:SAMPLE_SIZE])
+        count = Record.objects.filter(table=table).count()
+        self.stdout.write(f"Table {table.pk}: {count} records, {len(self.fields)} fields")
+
+        results = []
+        try:
+            for name in names:
+                request = getattr(self, f"scenario_{name}")()
+                if request is None:
+                    self.stdout.write(f"{name}: skipped, the table has no suitable field")
+                    continue
+                results.append(self.measure(name, request, options["iterations"], options["warmup"]))
+        finally:
+            Record.objects.filter(pk__in=self.created).delete()
+
+        self.report(results)
+        if options["json_path"]:
+            with open(options["json_path"], "w") as handle:
+                json.dump({"table": table.pk, "records": count, "results": results}, handle, indent=2)
+        if options["baseline"]:
+            self.compare(results, options["baseline"], options["max_regression"])
+
+    def measure(self, name: str, request: Callable[[], Any], iterations: int, warmup: int) -> Dict[str, Any]:
+        for _ in range(warmup):
+            request()
+        timings = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            request()
+            timings.append((time.perf_counter() - started) * 1000)
+        # Queries and memory come from one extra run, so tracing doesn't skew the timings.
+        tracemalloc.start()
+        try:
+            with CaptureQueriesContext(connection) as queries:
+                request()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        cuts = statistics.quantiles(timings, n=100, method="inclusive")
+        return {
+            "scenario": name,
+            "iterations": iterations,
+            "p50_ms": round(cuts[49], 2),
+            "p95_ms": round(cuts[94], 2),
+            "p99_ms": round(cuts[98], 2),
+            "queries": len(queries),
+            "peak_kib": round(peak / 1024, 1),
+        }
+
+    def report(self, results: List[Dict[str, Any]]) -> None:
+        columns = ("scenario", "iterations", "p50_ms", "p95_ms", "p99_ms", "queries", "peak_kib")
+        self.stdout.write("".join(f"{column:>14}" for column in columns))
+        for result in results:
+            self.stdout.write("".join(f"{result[column]:>14}" for column in columns))
+
+    def compare(self, results: List[Dict[str, Any]], path: str, max_regression: Optional[float]) -> None:
+        with open(path) as handle:
+            baseline = {result["scenario"]: result for result in json.load(handle)["results"]}
+        regressions = []
+        for result in results:
+            before = baseline.get(result["scenario"])
+            if before is None:
+                continue
+            changes = {
+                key: (result[key] - before[key]) / before[key] * 100 if before[key] else 0.0
+                for key in ("p50_ms", "p95_ms", "p99_ms")
+            }
+            self.stdout.write(
+                f"{result['scenario']:>14}: "
+                + ", ".join(f"{key[:3]} {change:+.1f}%" for key, change in changes.items())
+                + f", queries {result['queries'] - before['queries']:+d}"
+            )
+            if max_regression is not None and changes["p95_ms"] > max_regression:
+                regressions.append(result["scenario"])
+        if regressions:
+            raise CommandError(f"p95 regressed by more than {max_regression}%: {', '.join(regressions)}")
+
+    # Each scenario returns a callable issuing one request, or None when the
+    # table lacks the fields it needs.
+
+    def get(self, params: Dict[str, Any]) -> Callable[[], Any]:
+        url = reverse("record-list", kwargs={"table_id": self.table.pk})
+        return lambda: self.expect(self.client.get(url, {"page_size": PAGE_SIZE, **params}), 200)
+
+    def expect(self, response, expected: int):
+        if response.status_code != expected:
+            raise CommandError(f"{response.request['REQUEST_METHOD']} {response.request['PATH_INFO']} "
+                               f"answered {response.status_code}: {response.content[:500]!r}")
+        return response
+
+    def field(self, *types: str) -> Optional[Field]:
+        return next((field for field in self.fields if field.type in types and not field.unique), None)
+
+    def index(self) -> int:
+        self.next_index += 1
+        return self.next_index
+
+    def scenario_list(self):
+        return self.get({})
+
+    def scenario_page(self):
+        # A page deep into the table; cursors make its cost independent of depth.
+        response = self.expect(self.client.get(
+            reverse("record-list", kwargs={"table_id": self.table.pk}), {"page_size": PAGE_SIZE}
+        ), 200)
+        for _ in range(9):
+            next_url = response.json()["next"]
+            if next_url is None:
+                break
+            response = self.expect(self.client.get(next_url), 200)
+        url = response.wsgi_request.get_full_path()
+        return lambda: self.expect(self.client.get(url), 200)
+
+    def scenario_filter(self):
+        number = self.field(FieldType.NUMBER, FieldType.DECIMAL)
+        select = self.field(FieldType.SINGLE_SELECT)
+        filters = []
+        if number is not None:
+            filters.append(f"{number.name}:gt:{self.median(number)}")
+        if select is not None and select.options.get("choices"):
+            filters.append(f"{select.name}:eq:{select.options['choices'][0]}")
+        return self.get({"filter": ",".join(filters)}) if filters else None
+
+    def scenario_sort(self):
+        number = self.field(FieldType.NUMBER, FieldType.DECIMAL, FieldType.DATE)
+        return self.get({"sort": f"{number.name}:desc"}) if number is not None else None
+
+    def scenario_search(self):
+        text = self.field(FieldType.TEXT, FieldType.LONG_TEXT)
+        if text is None:
+            return None
+        values = Record.objects.filter(pk__in=self.sample_ids[:100]).values_list(f"data__{text.data_key}", flat=True)
+        words = [value.split()[0] for value in values if isinstance(value, str) and value]
+        return self.get({"search": words[0]}) if words else None
+
+    def scenario_create(self):
+        url = reverse("record-list", kwargs={"table_id": self.table.pk})
+
+        def request():
+            response = self.expect(self.client.post(url, {"data": self.factory.api_data(self.index())}, format="json"), 201)
+            self.created.append(response.json()["id"])
+
+        return request
+
+    def scenario_patch(self):
+        field = self.field(*FieldType.values)
+        if field is None or not self.sample_ids:
+            return None
+
+        def request():
+            pk = self.rng.choice(self.sample_ids)
+            url = reverse("record-detail", kwargs={"table_id": self.table.pk, "pk": pk})
+            data = {"data": {field.name: self.factory.value(field, self.index())}}
+            self.expect(self.client.patch(url, data, format="json"), 200)
+
+        return request
+
+    def scenario_batch_create(self):
+        url = reverse("record-batch", kwargs={"table_id": self.table.pk})
+
+        def request():
+            items = [{"data": self.factory.api_data(self.index())} for _ in range(BATCH_SIZE)]
+            response = self.expect(self.client.post(url, {"items": items}, format="json"), 201)
+            self.created.extend(item["id"] for item in response.json()["items"])
+
+        return request
+
+    def scenario_batch_update(self):
+        if len(self.sample_ids) < BATCH_SIZE:
+            return None
+        url = reverse("record-batch", kwargs={"table_id": self.table.pk})
+
+        def request():
+            # Batch updates replace the whole record.
+            ids = self.rng.sample(self.sample_ids, BATCH_SIZE)
+            items = [{"id": pk, "data": self.factory.api_data(self.index())} for pk in ids]
+            self.expect(self.client.patch(url, {"items": items}, format="json"), 200)
+
+        return request
+
+    def median(self, field: Field) -> Any:
+        values = Record.objects.filter(pk__in=self.sample_ids).values_list(f"data__{field.data_key}", flat=True)
+        numbers = sorted(value for value in values if isinstance(value, (int, float)) and not isinstance(value, bool))
+        return numbers[len(numbers) // 2] if numbers else 0
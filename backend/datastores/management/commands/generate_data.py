@@ -0,0 +1,67 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from datastores.models import Database
+from datastores.synthetic import (
+    DEFAULT_FIELD_SPEC,
+    DISTRIBUTIONS,
+    create_workspace,
+    generate_table,
+    get_or_create_user,
+    parse_field_spec,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate synthetic workspaces, tables and records for load tests. "
+        "Every table gets a unique Name field plus the --fields mix, and records are bulk inserted."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workspaces", type=int, default=1)
+        parser.add_argument("--tables", type=int, default=1, help="Tables per workspace.")
+        parser.add_argument("--records", type=int, default=10000, help="Records per table.")
+        parser.add_argument(
+            "--fields",
+            default=DEFAULT_FIELD_SPEC,
+            help="Field types with optional counts, e.g. text:3,number:2,single_select (default: one of each type).",
+        )
+        parser.add_argument("--distribution", choices=DISTRIBUTIONS, default="uniform")
+        parser.add_argument("--null-rate", type=float, default=0.1, help="Share of empty optional values.")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--username", default="bench", help="Owner of the generated workspaces.")
+        parser.add_argument("--password", default="bench1234", help="Password if the user is created.")
+
+    def handle(self, *args, **options):
+        try:
+            spec = parse_field_spec(options["fields"])
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        if not 0 <= options["null_rate"] <= 1:
+            raise CommandError("--null-rate must be between 0 and 1.")
+        user = get_or_create_user(options["username"], options["password"])
+        seed = options["seed"]
+        for workspace_number in range(1, options["workspaces"] + 1):
+            workspace = create_workspace(user, f"Synthetic workspace {workspace_number}")
+            database = Database.objects.create(workspace=workspace, name="Synthetic data")
+            for table_number in range(1, options["tables"] + 1):
+                started = time.perf_counter()
+                table = generate_table(
+                    database,
+                    f"Synthetic table {table_number}",
+                    user,
+                    records=options["records"],
+                    spec=spec,
+                    seed=seed,
+                    distribution=options["distribution"],
+                    null_rate=options["null_rate"],
+                    batch_size=options["batch_size"],
+                )
+                seed += 1
+                self.stdout.write(
+                    f"Table {table.pk}: {options['records']} records in {time.perf_counter() - started:.1f}s"
+                )
+        self.stdout.write(f"Owner: {user.username}")
@@ -0,0 +1,71 @@
+import base64
+import binascii
+import re
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from datastores.attachments import get_blob_store
+from datastores.models import Attachment, DataLayout, Field, FieldType, Record
+
+CHUNK_SIZE = 500
+_DATA_URL_RE = re.compile(r"^data:(?P<type>[^;,]*)(;[^,]*)?,")
+
+
+class Command(BaseCommand):
+    help = "Move inline base64 attachment values out of Record.data into the blob store."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--table", type=int, help="Only migrate fields of this table id.")
+
+    def handle(self, *args, **options):
+        store = get_blob_store()
+        fields = Field.objects.filter(type=FieldType.ATTACHMENT).select_related("table")
+        if options["table"]:
+            fields = fields.filter(table_id=options["table"])
+        for field in fields:
+            moved = skipped = 0
+            write_keys = {field.data_key}
+            if field.table.data_layout == DataLayout.MIGRATING:
+                write_keys.add(field.id_key)
+            last_id = 0
+            while True:
+                # Keyset over ids so every chunk is its own short transaction
+                # and an interrupted run simply resumes.
+                records = list(
+                    Record.objects.filter(table_id=field.table_id, id__gt=last_id, **{f"data__{field.data_key}__isnull": False})
+                    .order_by("id")[:CHUNK_SIZE]
+                )
+                if not records:
+                    break
+                last_id = records[-1].id
+                changed = []
+                with transaction.atomic():
+                    for record in records:
+                        value = record.data.get(field.data_key)
+                        if not isinstance(value, str):
+                            continue
+                        content_type = "application/octet-stream"
+                        match = _DATA_URL_RE.match(value)
+                        if match:
+                            content_type = match.group("type") or content_type
+                            value = value[match.end():]
+                        try:
+                            content = base64.b64decode(value, validate=True)
+                        except (binascii.Error, ValueError):
+                            skipped += 1
+                            continue
+                        sha256, size = store.save([content])
+                        attachment = Attachment.objects.create(
+                            table_id=field.table_id,
+                            sha256=sha256,
+                            size=size,
+                            name=f"{field.name}-{record.id}",
+                            content_type=content_type,
+                        )
+                        for key in write_keys:
+                            record.data[key] = attachment.as_reference()
+                        changed.append(record)
+                    Record.objects.bulk_update(changed, ["data"])
+                moved += len(changed)
+            self.stdout.write(f"{field.table_id}:{field.name}: moved {moved}, skipped {skipped} undecodable values")
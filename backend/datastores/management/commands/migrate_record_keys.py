@@ -0,0 +1,112 @@
+import re
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import F
+
+from datastores.indexes import sync_table_indexes
+from datastores.models import DataLayout, Field, Record, Table
+
+# Adds ``f<id>`` keys next to the name keys they mirror; re-running is harmless.
+COPY_SQL = """
+UPDATE datastores_record r SET data = r.data || (
+    SELECT coalesce(jsonb_object_agg(m.id_key, r.data -> m.name), '{}'::jsonb)
+    FROM unnest(%(names)s::text[], %(id_keys)s::text[]) AS m(name, id_key)
+    WHERE r.data ? m.name
+)
+WHERE r.table_id = %(table)s AND r.id >= %(start)s AND r.id < %(end)s
+"""
+
+# Drops the name keys that were copied, touching only rows that still have
+# them. Id keys are never named here, so fields created or converted while
+# the strip runs keep their values.
+STRIP_SQL = """
+UPDATE datastores_record SET data = data - %(names)s::text[]
+WHERE table_id = %(table)s AND id >= %(start)s AND id < %(end)s AND data ?| %(names)s::text[]
+"""
+
+ID_KEY = re.compile(r"f\d+(v\d+)?")
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-key Record.data from field names to field ids, so renames never rewrite records. "
+        "Runs in id-range batches while the API stays online and can be re-run to resume."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--table", type=int, help="Only convert this table id.")
+        parser.add_argument("--batch-size", type=int, default=2000)
+        parser.add_argument(
+            "--grace",
+            type=float,
+            default=10.0,
+            help="Seconds to wait after switching a table to dual writes, so in-flight requests finish.",
+        )
+
+    def handle(self, *args, **options):
+        tables = Table.objects.all() if options["table"] else Table.objects.exclude(data_layout=DataLayout.IDS)
+        if options["table"]:
+            tables = tables.filter(pk=options["table"])
+        skipped = []
+        for table in tables.order_by("id"):
+            try:
+                self.convert(table, options["batch_size"], options["grace"])
+            except CommandError as exc:
+                self.stderr.write(str(exc))
+                skipped.append(str(table.pk))
+        if skipped:
+            raise CommandError(f"Tables not converted: {', '.join(skipped)}")
+
+    def convert(self, table: Table, batch_size: int, grace: float):
+        fields = list(Field.objects.filter(table=table))
+        clashes = sorted(field.name for field in fields if ID_KEY.fullmatch(field.name))
+        if clashes and table.data_layout != DataLayout.IDS:
+            raise CommandError(f"Table {table.pk}: rename fields {', '.join(clashes)} first; they look like id keys.")
+
+        if table.data_layout == DataLayout.NAMES:
+            # From here on the API writes both keys; reads stay on names.
+            Table.objects.filter(pk=table.pk).update(
+                data_layout=DataLayout.MIGRATING, schema_version=F("schema_version") + 1
+            )
+            table.data_layout = DataLayout.MIGRATING
+            time.sleep(grace)
+
+        if table.data_layout == DataLayout.MIGRATING:
+            # Renames are rejected while migrating, so the names are stable.
+            fields = list(Field.objects.filter(table=table))
+            names = [field.name for field in fields]
+            id_keys = [field.id_key for field in fields]
+            copied = self.run_batches(table, batch_size, COPY_SQL, {"names": names, "id_keys": id_keys})
+            # The copied names are recorded with the switch, so an interrupted
+            # strip resumes with them after renames.
+            Table.objects.filter(pk=table.pk, data_layout=DataLayout.MIGRATING).update(
+                data_layout=DataLayout.IDS, schema_version=F("schema_version") + 1, stale_keys=names
+            )
+            table.data_layout = DataLayout.IDS
+            self.stdout.write(f"Table {table.pk}: copied values of {copied} records to id keys")
+            if getattr(settings, "DATASTORES_MANAGE_INDEXES", True):
+                # Index expressions follow the key, so rebuild them now.
+                sync_table_indexes(table.pk)
+
+        names = Table.objects.values_list("stale_keys", flat=True).get(pk=table.pk)
+        if names:
+            stripped = self.run_batches(table, batch_size, STRIP_SQL, {"names": names})
+            Table.objects.filter(pk=table.pk).update(stale_keys=[])
+            self.stdout.write(f"Table {table.pk}: removed name keys from {stripped} records")
+
+    def run_batches(self, table: Table, batch_size: int, sql: str, params: dict) -> int:
+        bounds = Record.objects.filter(table=table).order_by("id").values_list("id", flat=True)
+        first, last = bounds.first(), bounds.last()
+        if first is None:
+            return 0
+        changed = 0
+        # Each statement is its own short transaction, so an interrupted run
+        # keeps its progress and writers only wait for one batch at a time.
+        with connection.cursor() as cursor:
+            for start in range(first, last + 1, batch_size):
+                cursor.execute(sql, {**params, "table": table.pk, "start": start, "end": start + batch_size})
+                changed += cursor.rowcount
+        return changed
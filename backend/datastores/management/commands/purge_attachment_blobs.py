@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from datastores.attachments import get_blob_store
+from datastores.models import Attachment
+
+
+class Command(BaseCommand):
+    help = "Delete stored blobs no attachment refers to any more (e.g. after tables were hard-deleted)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--min-age",
+            type=int,
+            default=3600,
+            help="Only delete blobs older than this many seconds, so in-flight uploads are kept.",
+        )
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **options):
+        store = get_blob_store()
+        cutoff = time.time() - options["min_age"]
+        candidates = [sha256 for sha256, mtime in store.iter_blobs() if mtime < cutoff]
+        referenced = set()
+        for start in range(0, len(candidates), 1000):
+            chunk = candidates[start:start + 1000]
+            referenced.update(Attachment.objects.filter(sha256__in=chunk).values_list("sha256", flat=True))
+        orphans = [sha256 for sha256 in candidates if sha256 not in referenced]
+        if options["dry_run"]:
+            self.stdout.write(f"Would delete {len(orphans)} of {len(candidates)} blobs")
+            return
+        deleted = 0
+        for sha256 in orphans:
+            # The blob may have been uploaded again since it was listed, so
+            # re-check right before deleting it. Uploads touch the blob
+            # before creating its row, so one of the two checks sees them.
+            if Attachment.objects.filter(sha256=sha256).exists():
+                continue
+            mtime = store.mtime(sha256)
+            if mtime is None or mtime >= cutoff:
+                continue
+            store.delete(sha256)
+            deleted += 1
+        self.stdout.write(f"Deleted {deleted} of {len(candidates)} blobs")
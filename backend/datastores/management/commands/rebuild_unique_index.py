@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+
+from datastores.models import Field
+from datastores.uniqueness import rebuild_field_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the unique value index for unique fields (e.g. after loaddata or admin edits)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--table", type=int, help="Only rebuild fields of this table id.")
+
+    def handle(self, *args, **options):
+        fields = Field.objects.filter(unique=True).select_related("table")
+        if options["table"]:
+            fields = fields.filter(table_id=options["table"])
+        failed = []
+        for field in fields:
+            try:
+                rebuild_field_index(field)
+            except IntegrityError:
+                failed.append(f"{field.table_id}:{field.name}")
+                continue
+            self.stdout.write(f"Indexed {field.table_id}:{field.name}")
+        if failed:
+            raise CommandError(f"Duplicate values prevent indexing: {', '.join(failed)}")
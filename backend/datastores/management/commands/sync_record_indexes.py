@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from datastores.indexes import sync_table_indexes
+from datastores.models import Table
+
+
+class Command(BaseCommand):
+    help = "Create or drop per-field record indexes so they match fields and saved views."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--table", type=int, help="Only sync this table id.")
+
+    def handle(self, *args, **options):
+        tables = Table.objects.all()
+        if options["table"]:
+            tables = tables.filter(pk=options["table"])
+        for table_id in tables.values_list("pk", flat=True):
+            sync_table_indexes(table_id)
+            self.stdout.write(f"Synced indexes for table {table_id}")
@@ -0,0 +1,76 @@
+import hashlib
+import json
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_unique_values(apps, schema_editor):
+    Field = apps.get_model("datastores", "Field")
+    Record = apps.get_model("datastores", "Record")
+    RecordUniqueValue = apps.get_model("datastores", "RecordUniqueValue")
+    for field in Field.objects.filter(unique=True).iterator():
+        entries = []
+        rows = Record.objects.filter(table_id=field.table_id).values_list("id", "data")
+        for record_id, data in rows.iterator(chunk_size=2000):
+            value = (data or {}).get(field.name)
+            if value in (None, ""):
+                continue
+            encoded = json.dumps(value, sort_keys=True, separators=(",", ":"))
+            entries.append(RecordUniqueValue(
+                field_id=field.id,
+                record_id=record_id,
+                value_hash=hashlib.sha256(encoded.encode()).hexdigest(),
+            ))
+        # Pre-existing duplicates keep their first occurrence indexed.
+        RecordUniqueValue.objects.bulk_create(entries, batch_size=2000, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("datastores", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RecordUniqueValue",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("value_hash", models.CharField(max_length=64)),
+                (
+                    "field",
+                    models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="unique_values", to="datastores.field"),
+                ),
+                (
+                    "record",
+                    models.ForeignKey(
+                        db_constraint=False,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        related_name="+",
+                        to="datastores.record",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(fields=("field", "value_hash"), name="datastores_unique_value"),
+                    models.UniqueConstraint(fields=("field", "record"), name="datastores_unique_value_record"),
+                ],
+            },
+        ),
+        # Cascade in the database instead of Django's collector so deleting a
+        # table or a batch of records stays a single DELETE statement.
+        migrations.RunSQL(
+            sql=(
+                "ALTER TABLE datastores_recorduniquevalue "
+                "ADD CONSTRAINT datastores_recorduniquevalue_record_fk "
+                "FOREIGN KEY (record_id) REFERENCES datastores_record (id) "
+                "ON DELETE CASCADE"
+            ),
+            reverse_sql=(
+                "ALTER TABLE datastores_recorduniquevalue "
+                "DROP CONSTRAINT datastores_recorduniquevalue_record_fk"
+            ),
+        ),
+        migrations.RunPython(backfill_unique_values, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Build the indexes without blocking writes on an existing records table.
+    atomic = False
+
+    dependencies = [
+        ("datastores", "0002_record_unique_value"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="record",
+            index=GinIndex(fields=["data"], name="datastores_record_data_gin"),
+        ),
+        AddIndexConcurrently(
+            model_name="record",
+            index=models.Index(fields=["table", "id"], name="datastores_record_table_id"),
+        ),
+    ]
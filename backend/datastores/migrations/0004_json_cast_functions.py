@@ -0,0 +1,44 @@
+from django.db import migrations
+
+# IMMUTABLE wrappers so typed expressions over Record.data can be indexed.
+# Values that don't have the expected JSON type evaluate to NULL instead of
+# failing the whole query.
+CREATE_FUNCTIONS = """
+CREATE OR REPLACE FUNCTION datastores_json_number(value jsonb) RETURNS double precision
+LANGUAGE sql IMMUTABLE PARALLEL SAFE
+AS $$ SELECT CASE WHEN jsonb_typeof(value) = 'number' THEN value::double precision END $$;
+
+CREATE OR REPLACE FUNCTION datastores_json_boolean(value jsonb) RETURNS boolean
+LANGUAGE sql IMMUTABLE PARALLEL SAFE
+AS $$ SELECT CASE WHEN jsonb_typeof(value) = 'boolean' THEN value::boolean END $$;
+
+CREATE OR REPLACE FUNCTION datastores_json_timestamp(value jsonb) RETURNS timestamptz
+LANGUAGE plpgsql IMMUTABLE PARALLEL SAFE
+SET "TimeZone" = 'UTC' SET "DateStyle" = 'ISO'
+AS $$
+BEGIN
+    IF jsonb_typeof(value) IS DISTINCT FROM 'string' THEN
+        RETURN NULL;
+    END IF;
+    RETURN (value #>> '{}')::timestamptz;
+EXCEPTION WHEN others THEN
+    RETURN NULL;
+END
+$$;
+"""
+
+DROP_FUNCTIONS = """
+DROP FUNCTION IF EXISTS datastores_json_number(jsonb);
+DROP FUNCTION IF EXISTS datastores_json_boolean(jsonb);
+DROP FUNCTION IF EXISTS datastores_json_timestamp(jsonb);
+"""
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("datastores", "0003_record_indexes"),
+    ]
+
+    operations = [
+        migrations.RunSQL(sql=CREATE_FUNCTIONS, reverse_sql=DROP_FUNCTIONS),
+    ]
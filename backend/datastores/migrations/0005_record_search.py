@@ -0,0 +1,62 @@
+import django.contrib.postgres.search
+from django.db import migrations, models
+
+# ``search_text`` joins the values of the table's text and long_text fields.
+# A BEFORE trigger keeps it current for every write path (API, bulk, admin,
+# fixtures); ``search_vector`` is generated from it.
+CREATE_TRIGGER = r"""
+CREATE OR REPLACE FUNCTION datastores_record_search_text(p_table_id bigint, p_data jsonb) RETURNS text
+LANGUAGE sql STABLE PARALLEL SAFE
+AS $$
+    SELECT string_agg(p_data ->> f.name, E'\n' ORDER BY f."order", f.id)
+    FROM datastores_field f
+    WHERE f.table_id = p_table_id AND f.type IN ('text', 'long_text') AND p_data ? f.name
+$$;
+
+CREATE OR REPLACE FUNCTION datastores_record_search_trigger() RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    NEW.search_text := datastores_record_search_text(NEW.table_id, NEW.data);
+    RETURN NEW;
+END
+$$;
+
+CREATE TRIGGER datastores_record_search
+BEFORE INSERT OR UPDATE OF data ON datastores_record
+FOR EACH ROW EXECUTE FUNCTION datastores_record_search_trigger();
+"""
+
+DROP_TRIGGER = """
+DROP TRIGGER IF EXISTS datastores_record_search ON datastores_record;
+DROP FUNCTION IF EXISTS datastores_record_search_trigger();
+DROP FUNCTION IF EXISTS datastores_record_search_text(bigint, jsonb);
+"""
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("datastores", "0004_json_cast_functions"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="record",
+            name="search_text",
+            field=models.TextField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="record",
+            name="search_vector",
+            field=models.GeneratedField(
+                db_persist=True,
+                expression=django.contrib.postgres.search.SearchVector("search_text", config="simple"),
+                output_field=django.contrib.postgres.search.SearchVectorField(),
+            ),
+        ),
+        migrations.RunSQL(sql=CREATE_TRIGGER, reverse_sql=DROP_TRIGGER),
+        migrations.RunSQL(
+            sql="UPDATE datastores_record SET search_text = datastores_record_search_text(table_id, data)",
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,39 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import DatabaseError, migrations, transaction
+
+TRIGRAM_INDEX = "datastores_record_search_trgm"
+
+
+def create_trigram_index(apps, schema_editor):
+    # pg_trgm is optional: it accelerates ``search_mode=contains`` but search
+    # still works (as a scan) when the extension can't be installed.
+    try:
+        with transaction.atomic():
+            schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    except DatabaseError:
+        return
+    schema_editor.execute(
+        f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {TRIGRAM_INDEX} "
+        "ON datastores_record USING gin (search_text gin_trgm_ops)"
+    )
+
+
+def drop_trigram_index(apps, schema_editor):
+    schema_editor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {TRIGRAM_INDEX}")
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("datastores", "0005_record_search"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="record",
+            index=GinIndex(fields=["search_vector"], name="datastores_record_search"),
+        ),
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
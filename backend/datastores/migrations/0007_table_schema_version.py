@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("datastores", "0006_record_search_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="table",
+            name="schema_version",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
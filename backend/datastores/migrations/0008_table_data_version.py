@@ -0,0 +1,57 @@
+from django.db import migrations, models
+
+# Statement-level triggers bump ``Table.data_version`` once per statement
+# for every table whose records it touched, covering bulk writes, the admin
+# and raw SQL alike. Transition tables can only serve one event per trigger,
+# so each event gets its own trigger around a shared function.
+#
+# Throughput trade-off: the bump row-locks the table's ``datastores_table``
+# row until the writing transaction ends, so concurrent record writes to the
+# same table run one after another (other tables are unaffected). In return
+# the counter has no gaps or reorderings; the change journal's sequence
+# numbers (0013) and the schema fence (0015) rely on that.
+CREATE_TRIGGERS = """
+CREATE OR REPLACE FUNCTION datastores_record_bump_data_version() RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    UPDATE datastores_table SET data_version = data_version + 1
+    WHERE id IN (SELECT DISTINCT table_id FROM changed_records);
+    RETURN NULL;
+END
+$$;
+
+CREATE TRIGGER datastores_record_data_version_insert
+AFTER INSERT ON datastores_record REFERENCING NEW TABLE AS changed_records
+FOR EACH STATEMENT EXECUTE FUNCTION datastores_record_bump_data_version();
+
+CREATE TRIGGER datastores_record_data_version_update
+AFTER UPDATE ON datastores_record REFERENCING NEW TABLE AS changed_records
+FOR EACH STATEMENT EXECUTE FUNCTION datastores_record_bump_data_version();
+
+CREATE TRIGGER datastores_record_data_version_delete
+AFTER DELETE ON datastores_record REFERENCING OLD TABLE AS changed_records
+FOR EACH STATEMENT EXECUTE FUNCTION datastores_record_bump_data_version();
+"""
+
+DROP_TRIGGERS = """
+DROP TRIGGER IF EXISTS datastores_record_data_version_insert ON datastores_record;
+DROP TRIGGER IF EXISTS datastores_record_data_version_update ON datastores_record;
+DROP TRIGGER IF EXISTS datastores_record_data_version_delete ON datastores_record;
+DROP FUNCTION IF EXISTS datastores_record_bump_data_version();
+"""
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("datastores", "0007_table_schema_version"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="table",
+            name="data_version",
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.RunSQL(sql=CREATE_TRIGGERS, reverse_sql=DROP_TRIGGERS),
+    ]
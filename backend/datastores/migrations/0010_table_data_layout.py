@@ -0,0 +1,59 @@
+from django.db import migrations, models
+
+# ``datastores_record_search_text`` now reads values by field id for tables
+# in the ``ids`` layout and by name otherwise.
+SEARCH_TEXT_BY_LAYOUT = r"""
+CREATE OR REPLACE FUNCTION datastores_record_search_text(p_table_id bigint, p_data jsonb) RETURNS text
+LANGUAGE sql STABLE PARALLEL SAFE
+AS $$
+    SELECT string_agg(p_data ->> k.key, E'\n' ORDER BY f."order", f.id)
+    FROM datastores_field f
+    JOIN datastores_table t ON t.id = f.table_id
+    CROSS JOIN LATERAL (
+        SELECT CASE WHEN t.data_layout = 'ids' THEN 'f' || f.id ELSE f.name END AS key
+    ) k
+    WHERE f.table_id = p_table_id AND f.type IN ('text', 'long_text') AND p_data ? k.key
+$$;
+"""
+
+SEARCH_TEXT_BY_NAME = r"""
+CREATE OR REPLACE FUNCTION datastores_record_search_text(p_table_id bigint, p_data jsonb) RETURNS text
+LANGUAGE sql STABLE PARALLEL SAFE
+AS $$
+    SELECT string_agg(p_data ->> f.name, E'\n' ORDER BY f."order", f.id)
+    FROM datastores_field f
+    WHERE f.table_id = p_table_id AND f.type IN ('text', 'long_text') AND p_data ? f.name
+$$;
+"""
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("datastores", "0009_attachment"),
+    ]
+
+    operations = [
+        # Existing tables keep their name-keyed data until
+        # ``manage.py migrate_record_keys`` converts them; new tables use ids.
+        migrations.AddField(
+            model_name="table",
+            name="data_layout",
+            field=models.CharField(
+                choices=[("names", "Field names"), ("migrating", "Migrating"), ("ids", "Field ids")],
+                default="names",
+                editable=False,
+                max_length=16,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="table",
+            name="data_layout",
+            field=models.CharField(
+                choices=[("names", "Field names"), ("migrating", "Migrating"), ("ids", "Field ids")],
+                default="ids",
+                editable=False,
+                max_length=16,
+            ),
+        ),
+        migrations.RunSQL(sql=SEARCH_TEXT_BY_LAYOUT, reverse_sql=SEARCH_TEXT_BY_NAME),
+    ]
@@ -0,0 +1,116 @@
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+FIELD_TYPES = [
+    ("text", "Text"),
+    ("long_text", "Long text"),
+    ("number", "Number"),
+    ("decimal", "Decimal"),
+    ("boolean", "Boolean"),
+    ("date", "Date"),
+    ("single_select", "Single select"),
+    ("multi_select", "Multi select"),
+    ("attachment", "Attachment"),
+]
+
+# Id keys gain a ``v<n>`` suffix once a type conversion has moved a field's
+# values to a fresh key.
+SEARCH_TEXT_BY_KEY_VERSION = r"""
+CREATE OR REPLACE FUNCTION datastores_record_search_text(p_table_id bigint, p_data jsonb) RETURNS text
+LANGUAGE sql STABLE PARALLEL SAFE
+AS $$
+    SELECT string_agg(p_data ->> k.key, E'\n' ORDER BY f."order", f.id)
+    FROM datastores_field f
+    JOIN datastores_table t ON t.id = f.table_id
+    CROSS JOIN LATERAL (
+        SELECT CASE
+            WHEN t.data_layout <> 'ids' THEN f.name
+            WHEN f.key_version > 0 THEN 'f' || f.id || 'v' || f.key_version
+            ELSE 'f' || f.id
+        END AS key
+    ) k
+    WHERE f.table_id = p_table_id AND f.type IN ('text', 'long_text') AND p_data ? k.key
+$$;
+"""
+
+SEARCH_TEXT_BY_LAYOUT = r"""
+CREATE OR REPLACE FUNCTION datastores_record_search_text(p_table_id bigint, p_data jsonb) RETURNS text
+LANGUAGE sql STABLE PARALLEL SAFE
+AS $$
+    SELECT string_agg(p_data ->> k.key, E'\n' ORDER BY f."order", f.id)
+    FROM datastores_field f
+    JOIN datastores_table t ON t.id = f.table_id
+    CROSS JOIN LATERAL (
+        SELECT CASE WHEN t.data_layout = 'ids' THEN 'f' || f.id ELSE f.name END AS key
+    ) k
+    WHERE f.table_id = p_table_id AND f.type IN ('text', 'long_text') AND p_data ? k.key
+$$;
+"""
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("datastores", "0010_table_data_layout"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="field",
+            name="key_version",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.CreateModel(
+            name="FieldConversion",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("source_type", models.CharField(choices=FIELD_TYPES, max_length=32)),
+                ("target_type", models.CharField(choices=FIELD_TYPES, max_length=32)),
+                ("target_options", models.JSONField(blank=True, default=dict)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[("pending", "Pending"), ("running", "Running"), ("finished", "Finished"), ("failed", "Failed")],
+                        default="pending",
+                        max_length=16,
+                    ),
+                ),
+                ("total", models.PositiveIntegerField(default=0)),
+                ("processed", models.PositiveIntegerField(default=0)),
+                ("invalid", models.PositiveIntegerField(default=0)),
+                ("last_record_id", models.BigIntegerField(default=0)),
+                ("error", models.TextField(blank=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("swapped_at", models.DateTimeField(blank=True, null=True)),
+                ("finished_at", models.DateTimeField(blank=True, null=True)),
+                (
+                    "created_by",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "field",
+                    models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="conversions", to="datastores.field"),
+                ),
+            ],
+            options={
+                "ordering": ("-id",),
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="fieldconversion",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("status__in", ["pending", "running"])),
+                fields=("field",),
+                name="datastores_one_active_conversion",
+            ),
+        ),
+        migrations.RunSQL(sql=SEARCH_TEXT_BY_KEY_VERSION, reverse_sql=SEARCH_TEXT_BY_LAYOUT),
+    ]
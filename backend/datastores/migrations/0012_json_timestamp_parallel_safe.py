@@ -0,0 +1,46 @@
+from django.db import migrations
+
+# The EXCEPTION block in datastores_json_timestamp opens a subtransaction,
+# which Postgres refuses inside parallel workers, so large sorts and range
+# filters on date fields failed once the planner chose a parallel plan.
+# pg_input_is_valid (Postgres 16) validates without one; results are the same,
+# so existing indexes stay valid.
+TIMESTAMP_WITHOUT_SUBTRANSACTION = """
+CREATE OR REPLACE FUNCTION datastores_json_timestamp(value jsonb) RETURNS timestamptz
+LANGUAGE plpgsql IMMUTABLE PARALLEL SAFE
+SET "TimeZone" = 'UTC' SET "DateStyle" = 'ISO'
+AS $$
+BEGIN
+    IF jsonb_typeof(value) IS DISTINCT FROM 'string' OR NOT pg_input_is_valid(value #>> '{}', 'timestamptz') THEN
+        RETURN NULL;
+    END IF;
+    RETURN (value #>> '{}')::timestamptz;
+END
+$$;
+"""
+
+TIMESTAMP_WITH_EXCEPTION = """
+CREATE OR REPLACE FUNCTION datastores_json_timestamp(value jsonb) RETURNS timestamptz
+LANGUAGE plpgsql IMMUTABLE PARALLEL SAFE
+SET "TimeZone" = 'UTC' SET "DateStyle" = 'ISO'
+AS $$
+BEGIN
+    IF jsonb_typeof(value) IS DISTINCT FROM 'string' THEN
+        RETURN NULL;
+    END IF;
+    RETURN (value #>> '{}')::timestamptz;
+EXCEPTION WHEN others THEN
+    RETURN NULL;
+END
+$$;
+"""
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("datastores", "0011_field_conversion"),
+    ]
+
+    operations = [
+        migrations.RunSQL(sql=TIMESTAMP_WITHOUT_SUBTRANSACTION, reverse_sql=TIMESTAMP_WITH_EXCEPTION),
+    ]
@@ -0,0 +1,107 @@
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+# The data_version triggers now also append one journal row per written
+# record, stamped with the table's new data_version. Updates that leave
+# ``data`` unchanged (e.g. search text refreshes) are not journaled.
+CREATE_TRIGGERS = """
+CREATE OR REPLACE FUNCTION datastores_record_bump_data_version() RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' THEN
+        WITH bumped AS (
+            UPDATE datastores_table SET data_version = data_version + 1
+            WHERE id IN (SELECT DISTINCT table_id FROM changed_records)
+            RETURNING id, data_version
+        )
+        INSERT INTO datastores_recordchange (table_id, seq, record_id, op, created_at)
+        SELECT n.table_id, b.data_version, n.id, 'update', now()
+        FROM changed_records n
+        JOIN bumped b ON b.id = n.table_id
+        JOIN old_records o ON o.id = n.id
+        WHERE o.data IS DISTINCT FROM n.data;
+    ELSE
+        WITH bumped AS (
+            UPDATE datastores_table SET data_version = data_version + 1
+            WHERE id IN (SELECT DISTINCT table_id FROM changed_records)
+            RETURNING id, data_version
+        )
+        INSERT INTO datastores_recordchange (table_id, seq, record_id, op, created_at)
+        SELECT c.table_id, b.data_version, c.id, lower(TG_OP), now()
+        FROM changed_records c
+        JOIN bumped b ON b.id = c.table_id;
+    END IF;
+    RETURN NULL;
+END
+$$;
+
+DROP TRIGGER IF EXISTS datastores_record_data_version_update ON datastores_record;
+CREATE TRIGGER datastores_record_data_version_update
+AFTER UPDATE ON datastores_record REFERENCING OLD TABLE AS old_records NEW TABLE AS changed_records
+FOR EACH STATEMENT EXECUTE FUNCTION datastores_record_bump_data_version();
+"""
+
+RESTORE_TRIGGERS = """
+CREATE OR REPLACE FUNCTION datastores_record_bump_data_version() RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    UPDATE datastores_table SET data_version = data_version + 1
+    WHERE id IN (SELECT DISTINCT table_id FROM changed_records);
+    RETURN NULL;
+END
+$$;
+
+DROP TRIGGER IF EXISTS datastores_record_data_version_update ON datastores_record;
+CREATE TRIGGER datastores_record_data_version_update
+AFTER UPDATE ON datastores_record REFERENCING NEW TABLE AS changed_records
+FOR EACH STATEMENT EXECUTE FUNCTION datastores_record_bump_data_version();
+"""
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("datastores", "0012_json_timestamp_parallel_safe"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="table",
+            name="journal_floor",
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        # Writes made before the journal existed can't be replayed.
+        migrations.RunSQL(
+            sql="UPDATE datastores_table SET journal_floor = data_version",
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.CreateModel(
+            name="RecordChange",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("seq", models.BigIntegerField()),
+                ("record_id", models.BigIntegerField()),
+                (
+                    "op",
+                    models.CharField(
+                        choices=[("insert", "Insert"), ("update", "Update"), ("delete", "Delete")], max_length=8
+                    ),
+                ),
+                ("created_at", models.DateTimeField(default=django.utils.timezone.now)),
+                (
+                    "table",
+                    models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="changes", to="datastores.table"),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(fields=["table", "seq"], name="datastores_change_table_seq"),
+                    models.Index(fields=["table", "record_id", "seq"], name="datastores_change_record"),
+                    models.Index(fields=["created_at"], name="datastores_change_created"),
+                ],
+            },
+        ),
+        migrations.RunSQL(sql=CREATE_TRIGGERS, reverse_sql=RESTORE_TRIGGERS),
+    ]
@@ -0,0 +1,39 @@
+from django.db import migrations, models
+
+# Row-level so every write path (API, batch, conversions, admin) bumps it;
+# writes that leave ``data`` unchanged keep the version.
+CREATE_TRIGGER = """
+CREATE OR REPLACE FUNCTION datastores_record_bump_version() RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    NEW.version := OLD.version + 1;
+    RETURN NEW;
+END
+$$;
+
+CREATE TRIGGER datastores_record_version
+BEFORE UPDATE OF data ON datastores_record
+FOR EACH ROW WHEN (OLD.data IS DISTINCT FROM NEW.data)
+EXECUTE FUNCTION datastores_record_bump_version();
+"""
+
+DROP_TRIGGER = """
+DROP TRIGGER IF EXISTS datastores_record_version ON datastores_record;
+DROP FUNCTION IF EXISTS datastores_record_bump_version();
+"""
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("datastores", "0013_record_change_journal"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="record",
+            name="version",
+            field=models.BigIntegerField(default=1, editable=False),
+        ),
+        migrations.RunSQL(sql=CREATE_TRIGGER, reverse_sql=DROP_TRIGGER),
+    ]
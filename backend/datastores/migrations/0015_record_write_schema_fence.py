@@ -0,0 +1,74 @@
+from django.db import migrations
+
+# Writes that declare the table schema they were validated against (the
+# transaction-local ``datastores.schema_version`` setting, see
+# ``schema.fenced_writes``) fail once the table's ``schema_version`` moved
+# on. The check runs after the ``data_version`` bump has locked the table
+# row, so a field conversion swapping keys under that lock either sees the
+# write or the write sees the new version.
+BUMP_DATA_VERSION = """
+    IF TG_OP = 'UPDATE' THEN
+        WITH bumped AS (
+            UPDATE datastores_table SET data_version = data_version + 1
+            WHERE id IN (SELECT DISTINCT table_id FROM changed_records)
+            RETURNING id, data_version
+        )
+        INSERT INTO datastores_recordchange (table_id, seq, record_id, op, created_at)
+        SELECT n.table_id, b.data_version, n.id, 'update', now()
+        FROM changed_records n
+        JOIN bumped b ON b.id = n.table_id
+        JOIN old_records o ON o.id = n.id
+        WHERE o.data IS DISTINCT FROM n.data;
+    ELSE
+        WITH bumped AS (
+            UPDATE datastores_table SET data_version = data_version + 1
+            WHERE id IN (SELECT DISTINCT table_id FROM changed_records)
+            RETURNING id, data_version
+        )
+        INSERT INTO datastores_recordchange (table_id, seq, record_id, op, created_at)
+        SELECT c.table_id, b.data_version, c.id, lower(TG_OP), now()
+        FROM changed_records c
+        JOIN bumped b ON b.id = c.table_id;
+    END IF;
+"""
+
+CREATE_FUNCTION = f"""
+CREATE OR REPLACE FUNCTION datastores_record_bump_data_version() RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    expected text := nullif(current_setting('datastores.schema_version', true), '');
+BEGIN
+{BUMP_DATA_VERSION}
+    IF TG_OP <> 'DELETE' AND expected IS NOT NULL THEN
+        PERFORM 1 FROM datastores_table
+        WHERE id IN (SELECT DISTINCT table_id FROM changed_records) AND schema_version <> expected::integer;
+        IF FOUND THEN
+            RAISE EXCEPTION 'The fields of the table changed while writing its records.' USING ERRCODE = 'DS409';
+        END IF;
+    END IF;
+    RETURN NULL;
+END
+$$;
+"""
+
+RESTORE_FUNCTION = f"""
+CREATE OR REPLACE FUNCTION datastores_record_bump_data_version() RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+{BUMP_DATA_VERSION}
+    RETURN NULL;
+END
+$$;
+"""
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("datastores", "0014_record_version"),
+    ]
+
+    operations = [
+        migrations.RunSQL(sql=CREATE_FUNCTION, reverse_sql=RESTORE_FUNCTION),
+    ]
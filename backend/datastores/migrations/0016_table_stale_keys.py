@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("datastores", "0015_record_write_schema_fence"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="table",
+            name="stale_keys",
+            field=models.JSONField(default=list, editable=False),
+        ),
+    ]
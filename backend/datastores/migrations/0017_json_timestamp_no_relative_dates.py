@@ -0,0 +1,62 @@
+from django.db import migrations
+
+# ``now``, ``today``, ``tomorrow`` and ``yesterday`` (also with a time, e.g.
+# ``tomorrow 10:00``) cast to a different timestamp every day, so
+# datastores_json_timestamp, which is IMMUTABLE and backs the per-field date
+# indexes, returns NULL for them. The API rejects such values now; rows that
+# already hold one get fresh entries from the reindex below.
+TIMESTAMP_WITHOUT_RELATIVE_DATES = r"""
+CREATE OR REPLACE FUNCTION datastores_json_timestamp(value jsonb) RETURNS timestamptz
+LANGUAGE plpgsql IMMUTABLE PARALLEL SAFE
+SET "TimeZone" = 'UTC' SET "DateStyle" = 'ISO'
+AS $$
+BEGIN
+    IF jsonb_typeof(value) IS DISTINCT FROM 'string'
+        OR value #>> '{}' ~* '(now|today|tomorrow|yesterday)'
+        OR NOT pg_input_is_valid(value #>> '{}', 'timestamptz') THEN
+        RETURN NULL;
+    END IF;
+    RETURN (value #>> '{}')::timestamptz;
+END
+$$;
+"""
+
+TIMESTAMP_WITH_RELATIVE_DATES = """
+CREATE OR REPLACE FUNCTION datastores_json_timestamp(value jsonb) RETURNS timestamptz
+LANGUAGE plpgsql IMMUTABLE PARALLEL SAFE
+SET "TimeZone" = 'UTC' SET "DateStyle" = 'ISO'
+AS $$
+BEGIN
+    IF jsonb_typeof(value) IS DISTINCT FROM 'string' OR NOT pg_input_is_valid(value #>> '{}', 'timestamptz') THEN
+        RETURN NULL;
+    END IF;
+    RETURN (value #>> '{}')::timestamptz;
+END
+$$;
+"""
+
+
+def reindex_date_indexes(apps, schema_editor):
+    # Managed date indexes are named ``datastores_rec_f<field>_t<table>_...ts``
+    # (see ``indexes.field_index_name``).
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT indexname FROM pg_indexes WHERE tablename = 'datastores_record' AND indexname ~ %s",
+            [r"^datastores_rec_f\d+_t\d+_k?ts(v\d+)?$"],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    for name in names:
+        schema_editor.execute(f"REINDEX INDEX CONCURRENTLY {schema_editor.quote_name(name)}")
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("datastores", "0016_table_stale_keys"),
+    ]
+
+    operations = [
+        migrations.RunSQL(sql=TIMESTAMP_WITHOUT_RELATIVE_DATES, reverse_sql=TIMESTAMP_WITH_RELATIVE_DATES),
+        migrations.RunPython(reindex_date_indexes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,85 @@
+from django.db import migrations
+
+# Transactions that set ``datastores.skip_journal`` (see
+# ``journal.skip_journal``) neither bump ``data_version`` nor journal their
+# record writes. Hard-deleting a table uses it, so purging millions of
+# records doesn't write a journal row for each one right before the table
+# and its journal go away.
+BUMP_DATA_VERSION = """
+    IF TG_OP = 'UPDATE' THEN
+        WITH bumped AS (
+            UPDATE datastores_table SET data_version = data_version + 1
+            WHERE id IN (SELECT DISTINCT table_id FROM changed_records)
+            RETURNING id, data_version
+        )
+        INSERT INTO datastores_recordchange (table_id, seq, record_id, op, created_at)
+        SELECT n.table_id, b.data_version, n.id, 'update', now()
+        FROM changed_records n
+        JOIN bumped b ON b.id = n.table_id
+        JOIN old_records o ON o.id = n.id
+        WHERE o.data IS DISTINCT FROM n.data;
+    ELSE
+        WITH bumped AS (
+            UPDATE datastores_table SET data_version = data_version + 1
+            WHERE id IN (SELECT DISTINCT table_id FROM changed_records)
+            RETURNING id, data_version
+        )
+        INSERT INTO datastores_recordchange (table_id, seq, record_id, op, created_at)
+        SELECT c.table_id, b.data_version, c.id, lower(TG_OP), now()
+        FROM changed_records c
+        JOIN bumped b ON b.id = c.table_id;
+    END IF;
+"""
+
+CREATE_FUNCTION = f"""
+CREATE OR REPLACE FUNCTION datastores_record_bump_data_version() RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    expected text := nullif(current_setting('datastores.schema_version', true), '');
+BEGIN
+    IF current_setting('datastores.skip_journal', true) = 'on' THEN
+        RETURN NULL;
+    END IF;
+{BUMP_DATA_VERSION}
+    IF TG_OP <> 'DELETE' AND expected IS NOT NULL THEN
+        PERFORM 1 FROM datastores_table
+        WHERE id IN (SELECT DISTINCT table_id FROM changed_records) AND schema_version <> expected::integer;
+        IF FOUND THEN
+            RAISE EXCEPTION 'The fields of the table changed while writing its records.' USING ERRCODE = 'DS409';
+        END IF;
+    END IF;
+    RETURN NULL;
+END
+$$;
+"""
+
+RESTORE_FUNCTION = f"""
+CREATE OR REPLACE FUNCTION datastores_record_bump_data_version() RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    expected text := nullif(current_setting('datastores.schema_version', true), '');
+BEGIN
+{BUMP_DATA_VERSION}
+    IF TG_OP <> 'DELETE' AND expected IS NOT NULL THEN
+        PERFORM 1 FROM datastores_table
+        WHERE id IN (SELECT DISTINCT table_id FROM changed_records) AND schema_version <> expected::integer;
+        IF FOUND THEN
+            RAISE EXCEPTION 'The fields of the table changed while writing its records.' USING ERRCODE = 'DS409';
+        END IF;
+    END IF;
+    RETURN NULL;
+END
+$$;
+"""
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("datastores", "0017_json_timestamp_no_relative_dates"),
+    ]
+
+    operations = [
+        migrations.RunSQL(sql=CREATE_FUNCTION, reverse_sql=RESTORE_FUNCTION),
+    ]
@@ -1,4 +1,6 @@
 from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.db import models
 from django.utils import timezone
 
@@ -15,12 +17,58 @@ class Database(models.Model):
         return self.name
 
 
+class DataLayout(models.TextChoices):
+    """How ``Record.data`` of a table is keyed.
+
+    ``ids`` keys values by ``f<field id>`` so renames never touch records;
+    ``names`` is the legacy layout keyed by field name. ``migrating`` reads by
+    name but writes both keys while ``migrate_record_keys`` converts a table.
+    """
+
+    NAMES = "names", "Field names"
+    MIGRATING = "migrating", "Migrating"
+    IDS = "ids", "Field ids"
+
+
 class Table(models.Model):
     database = models.ForeignKey(Database, related_name="tables", on_delete=models.CASCADE)
     name = models.CharField(max_length=255)
     deleted_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Bumped on every field change; keys the cached ``TableSchema``.
+    schema_version = models.PositiveIntegerField(default=0, editable=False)
+    # Bumped by a database trigger whenever records of the table are written;
+    # keys cached view results. The bump locks this row until the write
+    # commits, which serializes record writes per table (see migration 0008).
+    data_version = models.BigIntegerField(default=0, editable=False)
+    data_layout = models.CharField(max_length=16, choices=DataLayout.choices, default=DataLayout.IDS, editable=False)
+    # Changes at or below this ``data_version`` are no longer in the journal
+    # (``RecordChange``); clients that synced before it must start over.
+    journal_floor = models.BigIntegerField(default=0, editable=False)
+    # Field names ``migrate_record_keys`` copied to id keys and has yet to
+    # strip from the records.
+    stale_keys = models.JSONField(default=list, editable=False)
+
+    MANAGED_FIELDS = ("schema_version", "data_version", "data_layout", "journal_floor", "stale_keys")
+
+    def save(self, *args, **kwargs):
+        # Version counters and the layout only move through atomic UPDATEs
+        # (signals, migration 0008, ``migrate_record_keys``); saving a stale
+        # instance must not roll them back.
+        if not self._state.adding and kwargs.get("update_fields") is None:
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.MANAGED_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
+    def __getstate__(self):
+        state = super().__getstate__()
+        # The ``TableSchema`` memo of ``schema.get_table_schema`` stays in this process.
+        state.pop("_table_schema", None)
+        return state
 
     def soft_delete(self):
         self.deleted_at = timezone.now()
@@ -56,15 +104,36 @@ class Field(models.Model):
     options = models.JSONField(default=dict, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Bumped when a type conversion moves the values to a fresh key.
+    key_version = models.PositiveIntegerField(default=0, editable=False)
 
     class Meta:
         unique_together = ("table", "name")
         ordering = ("order", "id")
 
+    @property
+    def id_key(self) -> str:
+        # Prefixed because Django treats all-digit JSON keys as array indexes.
+        return self.versioned_key(self.key_version)
+
+    def versioned_key(self, version: int) -> str:
+        return f"f{self.pk}v{version}" if version else f"f{self.pk}"
+
+    @property
+    def data_key(self) -> str:
+        """Key of this field's value in ``Record.data`` under the table's current layout."""
+        return self.id_key if self.table.data_layout == DataLayout.IDS else self.name
+
     def __str__(self) -> str:
         return f"{self.name} ({self.type})"
 
 
+class RecordManager(models.Manager):
+    def get_queryset(self):
+        # The search columns are only read inside SQL; don't ship them to Python.
+        return super().get_queryset().defer("search_text", "search_vector")
+
+
 class Record(models.Model):
     table = models.ForeignKey(Table, related_name="records", on_delete=models.CASCADE)
     data = models.JSONField(default=dict)
@@ -84,14 +153,142 @@ class Record(models.Model):
     )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Bumped by a database trigger whenever ``data`` changes; clients send it
+    # back in ``If-Match`` to detect concurrent edits (see migration 0014).
+    version = models.BigIntegerField(default=1, editable=False)
+    # Text of the table's text/long_text fields, maintained by a database
+    # trigger on every write (see migration 0005 and ``search.py``).
+    search_text = models.TextField(null=True, blank=True, editable=False)
+    search_vector = models.GeneratedField(
+        expression=SearchVector("search_text", config="simple"),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
+
+    objects = RecordManager()
 
     class Meta:
         ordering = ("-id",)
+        indexes = [
+            GinIndex(fields=["data"], name="datastores_record_data_gin"),
+            models.Index(fields=["table", "id"], name="datastores_record_table_id"),
+            GinIndex(fields=["search_vector"], name="datastores_record_search"),
+        ]
 
     def __str__(self) -> str:
         return f"Record {self.id}"
 
 
+class RecordUniqueValue(models.Model):
+    """Index entry enforcing ``Field.unique`` with a database constraint.
+
+    One row per (unique field, record) holding a hash of the record's value,
+    so uniqueness checks are index lookups and concurrent writers cannot race
+    past each other. ``record`` cascades at the database level (see migration
+    0002) so deleting records stays a single bulk statement.
+    """
+
+    field = models.ForeignKey(Field, related_name="unique_values", on_delete=models.CASCADE)
+    record = models.ForeignKey(Record, related_name="+", on_delete=models.DO_NOTHING, db_constraint=False)
+    value_hash = models.CharField(max_length=64)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["field", "value_hash"], name="datastores_unique_value"),
+            models.UniqueConstraint(fields=["field", "record"], name="datastores_unique_value_record"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.field_id}:{self.record_id}"
+
+
+class ChangeOp(models.TextChoices):
+    INSERT = "insert", "Insert"
+    UPDATE = "update", "Update"
+    DELETE = "delete", "Delete"
+
+
+class RecordChange(models.Model):
+    """Journal entry for one record write, appended by a database trigger.
+
+    ``seq`` is the table's ``data_version`` after the writing statement. The
+    trigger bumps it while holding the table row lock until commit, so
+    entries of a table become visible in ``seq`` order. Records are not
+    referenced by foreign key since deleted ones stay in the journal.
+    """
+
+    table = models.ForeignKey(Table, related_name="changes", on_delete=models.CASCADE)
+    seq = models.BigIntegerField()
+    record_id = models.BigIntegerField()
+    op = models.CharField(max_length=8, choices=ChangeOp.choices)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["table", "seq"], name="datastores_change_table_seq"),
+            models.Index(fields=["table", "record_id", "seq"], name="datastores_change_record"),
+            models.Index(fields=["created_at"], name="datastores_change_created"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.op} {self.record_id} @{self.seq}"
+
+
+class ConversionStatus(models.TextChoices):
+    PENDING = "pending", "Pending"
+    RUNNING = "running", "Running"
+    FINISHED = "finished", "Finished"
+    FAILED = "failed", "Failed"
+
+
+class FieldConversion(models.Model):
+    """A background change of a field's type (see ``datastores.conversions``).
+
+    Converted values are written next to the current ones under the field's
+    next key, in chunks, while the field keeps serving its old type. The field
+    then switches type and key in one short transaction and the old values are
+    removed. ``last_record_id`` makes an interrupted run resumable.
+    """
+
+    field = models.ForeignKey(Field, related_name="conversions", on_delete=models.CASCADE)
+    source_type = models.CharField(max_length=32, choices=FieldType.choices)
+    target_type = models.CharField(max_length=32, choices=FieldType.choices)
+    target_options = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=16, choices=ConversionStatus.choices, default=ConversionStatus.PENDING)
+    total = models.PositiveIntegerField(default=0)
+    processed = models.PositiveIntegerField(default=0)
+    # Values the target type rejected; they are stored as null.
+    invalid = models.PositiveIntegerField(default=0)
+    last_record_id = models.BigIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        related_name="+",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    swapped_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    ACTIVE_STATUSES = (ConversionStatus.PENDING, ConversionStatus.RUNNING)
+
+    class Meta:
+        ordering = ("-id",)
+        constraints = [
+            models.UniqueConstraint(
+                fields=["field"],
+                condition=models.Q(status__in=["pending", "running"]),
+                name="datastores_one_active_conversion",
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.field_id}: {self.source_type} -> {self.target_type} ({self.status})"
+
+
 class View(models.Model):
     table = models.ForeignKey(Table, related_name="views", on_delete=models.CASCADE)
     name = models.CharField(max_length=255)
@@ -101,3 +298,39 @@ class View(models.Model):
 
     def __str__(self) -> str:
         return self.name
+
+
+class Attachment(models.Model):
+    """An uploaded file that records of ``table`` can reference.
+
+    The content lives in the blob store under its SHA-256 (see
+    ``datastores.attachments``), so identical uploads share one blob; this row
+    carries the per-upload name and type. Records store a small reference
+    ``{"id", "name", "size", "content_type", "sha256"}`` instead of the bytes.
+    """
+
+    table = models.ForeignKey(Table, related_name="attachments", on_delete=models.CASCADE)
+    sha256 = models.CharField(max_length=64, db_index=True)
+    size = models.BigIntegerField()
+    name = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=255)
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        related_name="+",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def as_reference(self):
+        return {
+            "id": self.pk,
+            "name": self.name,
+            "size": self.size,
+            "content_type": self.content_type,
+            "sha256": self.sha256,
+        }
+
+    def __str__(self) -> str:
+        return self.name
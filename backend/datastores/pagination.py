@@ -0,0 +1,203 @@
+from __future__ import annotations
+
+import base64
+import binascii
+import json
+from functools import partial
+from typing import Any, List, Optional, Tuple
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, JSONField, Q, Value
+from django.db.models.expressions import OrderBy
+from django.db.models.functions import Cast
+from django.db.models.lookups import Exact, GreaterThan, IsNull, LessThan
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from core.profiling import note_queryset
+
+
+class RecordCursorPagination(BasePagination):
+    """Keyset pagination over arbitrary (including JSON key) orderings.
+
+    The cursor stores the sort keys of the last row of a page, so fetching
+    page N costs the same as fetching page one. ``id`` is always appended as
+    a tie-breaker to keep the ordering total. Pagination is opt-in: requests
+    without ``cursor`` or ``page_size`` receive the plain list as before.
+    """
+
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+    page_size = 100
+    max_page_size = 1000
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self.page_queryset(queryset, request)
+        if queryset is None:
+            return None
+        return self.set_page(list(queryset))
+
+    def page_queryset(self, queryset, request):
+        """The unevaluated query for the requested page, or ``None`` when not paginating.
+
+        Split from ``paginate_queryset`` so async views can fetch the rows
+        themselves and hand them to ``set_page``.
+        """
+        params = request.query_params
+        if self.cursor_query_param not in params and self.page_size_query_param not in params:
+            return None
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        terms = self.get_ordering_terms(queryset)
+        queryset = queryset.order_by(*terms)
+        for index, term in enumerate(terms):
+            queryset = queryset.annotate(**{
+                f"_cursor_{index}": term.expression,
+                f"_cursor_{index}_null": IsNull(term.expression, True),
+            })
+
+        position = self.decode_cursor(request, len(terms))
+        if position is not None:
+            output_fields = [queryset.query.annotations[f"_cursor_{i}"].output_field for i in range(len(terms))]
+            queryset = queryset.filter(self.build_keyset_filter(terms, output_fields, position))
+
+        self.terms_count = len(terms)
+        page = queryset[: self.page_size + 1]
+        note_queryset("records page", page)
+        return page
+
+    def set_page(self, rows: List[Any]) -> List[Any]:
+        self.has_next = len(rows) > self.page_size
+        self.page = rows[: self.page_size]
+        self.next_position = self.get_position(self.page[-1], self.terms_count) if self.has_next else None
+        return self.page
+
+    def get_paginated_response(self, data):
+        return Response({"next": self.get_next_link(), "results": data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                "name": self.cursor_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Opaque cursor returned in `next` by the previous page.",
+                "schema": {"type": "string"},
+            },
+            {
+                "name": self.page_size_query_param,
+                "required": False,
+                "in": "query",
+                "description": f"Number of records per page (max {self.max_page_size}).",
+                "schema": {"type": "integer"},
+            },
+        ]
+
+    def get_page_size(self, request) -> int:
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if size <= 0:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+    def get_next_link(self) -> Optional[str]:
+        if self.next_position is None:
+            return None
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.page_size_query_param, self.page_size)
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.next_position))
+
+    def get_ordering_terms(self, queryset) -> List[OrderBy]:
+        ordering = queryset.query.order_by or queryset.model._meta.ordering
+        terms = []
+        has_tie_breaker = False
+        for item in ordering:
+            if isinstance(item, str):
+                descending = item.startswith("-")
+                name = item.lstrip("-")
+                if name in {"id", "pk"}:
+                    has_tie_breaker = True
+                    name = "id"
+                term = OrderBy(F(name), descending=descending)
+            elif isinstance(item, OrderBy):
+                term = item
+            else:
+                term = item.asc()
+            terms.append(term)
+        if not has_tie_breaker:
+            terms.append(OrderBy(F("id"), descending=True))
+        return terms
+
+    def get_position(self, row, length: int) -> List[Any]:
+        # Rows are model instances, or dicts from ``values()``.
+        get = row.get if isinstance(row, dict) else partial(getattr, row)
+        position = []
+        for index in range(length):
+            if get(f"_cursor_{index}_null"):
+                position.append(None)
+            else:
+                value = get(f"_cursor_{index}")
+                position.append([json.loads(json.dumps(value, cls=DjangoJSONEncoder))])
+        return position
+
+    def encode_cursor(self, position: List[Any]) -> str:
+        raw = json.dumps(position, separators=(",", ":")).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+    def decode_cursor(self, request, length: int) -> Optional[List[Any]]:
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            raw = base64.urlsafe_b64decode(encoded + "=" * (-len(encoded) % 4))
+            position = json.loads(raw)
+        except (binascii.Error, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != length:
+            raise NotFound(self.invalid_cursor_message)
+        for item in position:
+            if item is not None and not (isinstance(item, list) and len(item) == 1):
+                raise NotFound(self.invalid_cursor_message)
+        return position
+
+    def build_keyset_filter(self, terms: List[OrderBy], output_fields, position: List[Any]) -> Q:
+        condition = Q(pk__in=[])
+        equal_so_far = Q()
+        for term, output_field, item in zip(terms, output_fields, position):
+            after, equal = self.compare_term(term, output_field, item)
+            if after is not None:
+                condition |= equal_so_far & after
+            equal_so_far &= equal
+        return condition
+
+    def compare_term(self, term: OrderBy, output_field, item) -> Tuple[Optional[Q], Q]:
+        expression = term.expression
+        nulls_last = term.nulls_last or (not term.nulls_first and not term.descending)
+        if item is None:
+            after = None if nulls_last else Q(IsNull(expression, False))
+            return after, Q(IsNull(expression, True))
+        value = item[0]
+        if isinstance(output_field, JSONField):
+            rhs = Cast(Value(json.dumps(value)), JSONField())
+        else:
+            rhs = Cast(Value(str(value)), output_field)
+        lookup = LessThan if term.descending else GreaterThan
+        after = Q(lookup(expression, rhs))
+        if nulls_last:
+            after |= Q(IsNull(expression, True))
+        return after, Q(Exact(expression, rhs))
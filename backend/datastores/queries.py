@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+from datetime import datetime, time, timezone as dt_timezone
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+from django.db.models import Q
+from django.db.models.lookups import (
+    Exact,
+    GreaterThan,
+    GreaterThanOrEqual,
+    In,
+    IsNull,
+    LessThan,
+    LessThanOrEqual,
+)
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .expressions import field_expression, is_typed
+from .models import Table, Field, Record, View, FieldType
+from .schema import get_table_schema
+from .search import SEARCH_MODE_FULLTEXT, apply_search, uses_rank
+
+
+def get_field(table: Table, name: str) -> Optional[Field]:
+    return get_table_schema(table).get(name)
+
+
+def get_ordering(table: Table, params: Mapping[str, Any]) -> Tuple[Any, ...]:
+    sort_param = params.get("sort")
+    if not sort_param:
+        # Full-text searches rank best matches first unless a sort is given.
+        return ("-search_rank", "-id") if uses_rank(params) else ("-id",)
+    ordering = []
+    tie_breaker = "-id"
+    for spec in sort_param.split(","):
+        if not spec:
+            continue
+        try:
+            field_name, direction = spec.split(":")
+        except ValueError:
+            continue
+        field = get_field(table, field_name)
+        if field is None:
+            continue
+        expression = field_expression(field)
+        if direction == "asc":
+            ordering.append(expression.asc())
+            tie_breaker = "id"
+        else:
+            ordering.append(expression.desc())
+            tie_breaker = "-id"
+    # ``id`` breaks ties so the order is total, which cursor pagination relies
+    # on. It follows the direction of the last sort so a (field, id) index can
+    # serve the whole ORDER BY.
+    ordering.append(tie_breaker)
+    return tuple(ordering)
+
+
+def apply_filters(queryset, table: Table, params: Mapping[str, Any]):
+    search = params.get("search")
+    if search:
+        queryset = apply_search(queryset, search, params.get("search_mode", SEARCH_MODE_FULLTEXT))
+    filter_param = params.get("filter")
+    if filter_param:
+        for clause in filter_param.split(","):
+            parts = clause.split(":")
+            if len(parts) < 3:
+                continue
+            field_name, operator, value = parts[0], parts[1], ":".join(parts[2:])
+            queryset = apply_filter_clause(queryset, table, field_name, operator, value)
+    return queryset
+
+
+def parse_filter_value(field: Field, value: str):
+    """Parse a filter value for a typed field; raises ``ValueError`` if it can't be."""
+    if field.type in {FieldType.NUMBER, FieldType.DECIMAL}:
+        return float(value)
+    if field.type == FieldType.BOOLEAN:
+        return value.lower() in {"true", "1", "yes"}
+    if field.type == FieldType.DATE:
+        parsed = parse_datetime(value)
+        if parsed is None:
+            day = parse_date(value)
+            if day is None:
+                raise ValueError(value)
+            parsed = datetime.combine(day, time.min)
+        if timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed, dt_timezone.utc)
+        return parsed
+    return value
+
+
+def apply_filter_clause(queryset, table: Table, field_name: str, operator: str, value: str):
+    field = get_field(table, field_name)
+    if field is None:
+        return queryset
+    if is_typed(field) and operator in TYPED_OPERATORS:
+        return apply_typed_filter_clause(queryset, field, operator, value)
+    lookup_base = f"data__{field.data_key}"
+    if operator == "eq":
+        return queryset.filter(**{lookup_base: value})
+    if operator == "ne":
+        return queryset.exclude(**{lookup_base: value})
+    if operator == "contains":
+        return queryset.filter(**{f"{lookup_base}__icontains": value})
+    if operator == "gt":
+        return queryset.filter(**{f"{lookup_base}__gt": value})
+    if operator == "lt":
+        return queryset.filter(**{f"{lookup_base}__lt": value})
+    if operator == "between":
+        start, _, end = value.partition("|")
+        return queryset.filter(**{f"{lookup_base}__gte": start, f"{lookup_base}__lte": end})
+    if operator == "in":
+        return queryset.filter(**{f"{lookup_base}__in": value.split("|")})
+    return queryset
+
+
+TYPED_OPERATORS = {"eq", "ne", "gt", "lt", "between", "in"}
+
+
+def apply_typed_filter_clause(queryset, field: Field, operator: str, value: str):
+    # Compare the cast expression so number/date/boolean fields order by value
+    # rather than JSON text, and the matching typed index can be used.
+    expression = field_expression(field)
+    try:
+        if operator == "between":
+            start, _, end = value.partition("|")
+            bounds = parse_filter_value(field, start), parse_filter_value(field, end)
+        elif operator == "in":
+            values = [parse_filter_value(field, item) for item in value.split("|")]
+        else:
+            parsed = parse_filter_value(field, value)
+    except ValueError:
+        return queryset.none()
+    if operator == "eq":
+        return queryset.filter(Exact(expression, parsed))
+    if operator == "ne":
+        return queryset.filter(~Q(Exact(expression, parsed)) | Q(IsNull(expression, True)))
+    if operator == "gt":
+        return queryset.filter(GreaterThan(expression, parsed))
+    if operator == "lt":
+        return queryset.filter(LessThan(expression, parsed))
+    if operator == "between":
+        return queryset.filter(GreaterThanOrEqual(expression, bounds[0]), LessThanOrEqual(expression, bounds[1]))
+    return queryset.filter(In(expression, values))
+
+
+def get_view_params(view: View, params: Mapping[str, Any] | None = None) -> Dict[str, Any]:
+    """Translate a saved view config into the ``sort``/``filter`` query syntax.
+
+    ``search``/``search_mode`` are taken from ``params`` so callers can still narrow a view.
+    """
+    config = view.config or {}
+    merged: Dict[str, Any] = {}
+    for key in ("search", "search_mode"):
+        if params and params.get(key):
+            merged[key] = params.get(key)
+    if config.get("sort"):
+        merged["sort"] = ",".join(config["sort"])
+    if config.get("filter"):
+        merged["filter"] = ",".join(config["filter"])
+    return merged
+
+
+def build_record_queryset(table: Table, params: Mapping[str, Any]):
+    queryset = Record.objects.filter(table=table)
+    queryset = apply_filters(queryset, table, params)
+    return queryset.order_by(*get_ordering(table, params))
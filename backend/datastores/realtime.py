@@ -0,0 +1,250 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import select
+import threading
+import time
+from functools import lru_cache
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Set
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, connections, transaction
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+SUBSCRIBER_QUEUE_SIZE = 1000
+KEEPALIVE_SECONDS = 15
+# Streams end after this long so clients reconnect and re-authenticate.
+STREAM_MAX_SECONDS = 60 * 60
+NOTIFY_CHANNEL = "datastores_changes"
+# Postgres caps NOTIFY payloads at 8000 bytes.
+NOTIFY_PAYLOAD_LIMIT = 7900
+
+
+def table_channel(table_id: int) -> str:
+    return f"table:{table_id}"
+
+
+class Subscription:
+    """One listener's queue, fed from any thread and drained on its event loop.
+
+    A listener that falls more than ``SUBSCRIBER_QUEUE_SIZE`` messages behind
+    gets a single ``table.changed`` message instead, telling it to refetch.
+    """
+
+    def __init__(self, channel: str):
+        self.channel = channel
+        self.loop = asyncio.get_running_loop()
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+
+    def put(self, message: Dict[str, Any]) -> None:
+        try:
+            self.loop.call_soon_threadsafe(self._put, message)
+        except RuntimeError:
+            # The loop has shut down; the subscriber is going away.
+            pass
+
+    def _put(self, message: Dict[str, Any]) -> None:
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({"type": "table.changed", "reason": "overflow", "table": message.get("table")})
+
+    async def get(self, timeout: float) -> Optional[Dict[str, Any]]:
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class InMemoryBroadcast:
+    """Fan messages out to subscribers of the current process.
+
+    Enough for a single server process. Extension point: backends for several
+    processes subclass this and deliver ``publish`` calls to every process's
+    local fan-out (see ``PostgresBroadcast``).
+    """
+
+    def __init__(self):
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+        self._lock = threading.Lock()
+
+    def has_subscribers(self, channel: str) -> bool:
+        return bool(self._subscribers.get(channel))
+
+    def publish(self, channel: str, message: Dict[str, Any]) -> None:
+        self.deliver(channel, message)
+
+    def deliver(self, channel: str, message: Dict[str, Any]) -> None:
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscription in subscribers:
+            subscription.put(message)
+
+    def subscribe(self, channel: str) -> Subscription:
+        """Register a listener; must be called from the event loop that drains it."""
+        subscription = Subscription(channel)
+        with self._lock:
+            self._subscribers.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.channel]
+
+
+class PostgresBroadcast(InMemoryBroadcast):
+    """Share messages between processes with ``NOTIFY``/``LISTEN``.
+
+    ``publish`` sends a notification on the default connection. Each process
+    runs one listener thread on its own connection and feeds what it
+    receives, including its own messages, into the local fan-out. Messages
+    over the payload limit are split, and records too large for one
+    notification are sent as ids to refetch.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._listener: Optional[threading.Thread] = None
+
+    def has_subscribers(self, channel: str) -> bool:
+        # Subscribers may live in any process.
+        return True
+
+    def publish(self, channel: str, message: Dict[str, Any]) -> None:
+        with connection.cursor() as cursor:
+            for payload in self.payloads(channel, message):
+                cursor.execute("SELECT pg_notify(%s, %s)", [NOTIFY_CHANNEL, payload])
+
+    def payloads(self, channel: str, message: Dict[str, Any]) -> Iterable[str]:
+        payload = _dumps({"channel": channel, "message": message})
+        if len(payload) <= NOTIFY_PAYLOAD_LIMIT or "records" not in message:
+            yield payload
+            return
+        header = {key: value for key, value in message.items() if key != "records"}
+        batch: List[Any] = []
+        size = 0
+        for record in message["records"]:
+            encoded = len(_dumps(record))
+            if encoded > NOTIFY_PAYLOAD_LIMIT - 200:
+                yield _dumps({"channel": channel, "message": {**header, "type": "records.changed", "ids": [record["id"]]}})
+                continue
+            if batch and size + encoded > NOTIFY_PAYLOAD_LIMIT - 200:
+                yield _dumps({"channel": channel, "message": {**header, "records": batch}})
+                batch, size = [], 0
+            batch.append(record)
+            size += encoded + 1
+        if batch:
+            yield _dumps({"channel": channel, "message": {**header, "records": batch}})
+
+    def subscribe(self, channel: str) -> Subscription:
+        if self._listener is None or not self._listener.is_alive():
+            with self._lock:
+                if self._listener is None or not self._listener.is_alive():
+                    self._listener = threading.Thread(target=self.listen, name="datastores-listen", daemon=True)
+                    self._listener.start()
+        return super().subscribe(channel)
+
+    def listen(self) -> None:
+        while True:
+            try:
+                self._listen_once()
+            except Exception:
+                logger.exception("Change listener lost its database connection; reconnecting")
+                time.sleep(1)
+
+    def _listen_once(self) -> None:
+        wrapper = connections["default"]
+        raw = wrapper.get_new_connection(wrapper.get_connection_params())
+        raw.autocommit = True
+        try:
+            with raw.cursor() as cursor:
+                cursor.execute(f"LISTEN {NOTIFY_CHANNEL}")
+            while True:
+                if select.select([raw], [], [], KEEPALIVE_SECONDS) == ([], [], []):
+                    continue
+                raw.poll()
+                while raw.notifies:
+                    notify = raw.notifies.pop(0)
+                    try:
+                        envelope = json.loads(notify.payload)
+                    except ValueError:
+                        continue
+                    self.deliver(envelope["channel"], envelope["message"])
+        finally:
+            raw.close()
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, cls=DjangoJSONEncoder, separators=(",", ":"))
+
+
+@lru_cache(maxsize=None)
+def _broadcast(path: str) -> InMemoryBroadcast:
+    return import_string(path)()
+
+
+def get_broadcast() -> InMemoryBroadcast:
+    return _broadcast(getattr(settings, "DATASTORES_BROADCAST", "datastores.realtime.InMemoryBroadcast"))
+
+
+def publish_table_event(table_id: int, message: Dict[str, Any]) -> None:
+    """Publish ``message`` to the table's channel once the current transaction commits."""
+    broadcast = get_broadcast()
+    channel = table_channel(table_id)
+    if not broadcast.has_subscribers(channel):
+        return
+    message = {**message, "table": table_id}
+
+    def send():
+        try:
+            broadcast.publish(channel, message)
+        except Exception:
+            # Pushing is best effort; the write itself already committed.
+            logger.exception("Could not publish change for table %s", table_id)
+
+    transaction.on_commit(send)
+
+
+def publish_records(table_id: int, event: str, records: List[Dict[str, Any]]) -> None:
+    """Publish serialized API records as ``records.created`` or ``records.updated``."""
+    if records:
+        publish_table_event(table_id, {"type": f"records.{event}", "records": records})
+
+
+def publish_deleted(table_id: int, ids: List[int]) -> None:
+    if ids:
+        publish_table_event(table_id, {"type": "records.deleted", "ids": ids})
+
+
+def _event(message: Dict[str, Any]) -> bytes:
+    return f"event: {message['type']}\ndata: {_dumps(message)}\n\n".encode()
+
+
+async def stream_table_events(table_id: int, data_version: int) -> AsyncIterator[bytes]:
+    """Server-sent events for one table, with keep-alive comments.
+
+    The first event, ``ready``, carries the table's ``data_version`` so a
+    client can tell whether its cached copy predates the subscription.
+    """
+    broadcast = get_broadcast()
+    subscription = broadcast.subscribe(table_channel(table_id))
+    deadline = time.monotonic() + STREAM_MAX_SECONDS
+    try:
+        yield b"retry: 3000\n\n"
+        yield _event({"type": "ready", "table": table_id, "data_version": data_version})
+        while time.monotonic() < deadline:
+            message = await subscription.get(KEEPALIVE_SECONDS)
+            yield b": keep-alive\n\n" if message is None else _event(message)
+    finally:
+        broadcast.unsubscribe(subscription)
@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import cached_property
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DatabaseError, connection
+from rest_framework import exceptions, status
+
+from core.metrics import timer
+from .models import DataLayout, Field, Table
+from .validation import RecordValidator
+
+SCHEMA_CACHE_SIZE = 512
+SHARED_CACHE_TIMEOUT = 24 * 60 * 60
+# Raised by the data_version trigger (migration 0015) for fenced writes.
+SCHEMA_CHANGED_SQLSTATE = "DS409"
+
+
+class SchemaChanged(exceptions.APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "The table's fields changed while saving; reload them and try again."
+    default_code = "schema_changed"
+
+
+class TableSchema:
+    """Field metadata of one table at one ``schema_version``.
+
+    Instances are immutable snapshots shared between requests and threads;
+    anything derived from the fields (lookups, the record validator, the
+    name <-> storage key map) is built once per version. The layout changes
+    only together with ``schema_version``.
+    """
+
+    def __init__(self, table_id: int, version: int, fields: Iterable[Field]):
+        self.table_id = table_id
+        self.version = version
+        self.fields: Tuple[Field, ...] = tuple(fields)
+        self.by_name: Dict[str, Field] = {field.name: field for field in self.fields}
+        self.by_id: Dict[int, Field] = {field.pk: field for field in self.fields}
+        self.layout = self.fields[0].table.data_layout if self.fields else DataLayout.IDS
+        self.keys: Tuple[Tuple[str, str], ...] = tuple((field.name, field.data_key) for field in self.fields)
+        write_keys = {DataLayout.NAMES: ("name",), DataLayout.MIGRATING: ("name", "id_key")}.get(self.layout, ("id_key",))
+        self.write_keys: Dict[str, Tuple[str, ...]] = {
+            field.name: tuple(getattr(field, attr) for attr in write_keys) for field in self.fields
+        }
+
+    def get(self, name: str) -> Optional[Field]:
+        return self.by_name.get(name)
+
+    def to_storage(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Re-key API ``data`` (by field name) for ``Record.data``; unknown names are dropped."""
+        stored = {}
+        for name, value in data.items():
+            for key in self.write_keys.get(name, ()):
+                stored[key] = value
+        return stored
+
+    def to_api(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Re-key stored ``Record.data`` by field name, skipping values of deleted fields."""
+        return {name: data[key] for name, key in self.keys if key in data}
+
+    @cached_property
+    def validator(self) -> RecordValidator:
+        return RecordValidator(self.fields)
+
+
+class SchemaCache:
+    """Thread-safe LRU of ``TableSchema`` holding the latest version per table."""
+
+    def __init__(self, maxsize: int = SCHEMA_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[int, TableSchema]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, table_id: int, version: int) -> Optional[TableSchema]:
+        with self._lock:
+            schema = self._entries.get(table_id)
+            if schema is None or schema.version != version:
+                return None
+            self._entries.move_to_end(table_id)
+            return schema
+
+    def put(self, schema: TableSchema) -> None:
+        with self._lock:
+            current = self._entries.get(schema.table_id)
+            if current is not None and current.version > schema.version:
+                return
+            self._entries[schema.table_id] = schema
+            self._entries.move_to_end(schema.table_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+schema_cache = SchemaCache()
+
+
+def _shared_cache():
+    alias = getattr(settings, "DATASTORES_SCHEMA_CACHE", None)
+    return caches[alias] if alias else None
+
+
+def _shared_key(table_id: int, version: int) -> str:
+    return f"datastores:schema:{table_id}:{version}"
+
+
+def load_table_schema(table_id: int, version: int) -> TableSchema:
+    shared = _shared_cache()
+    fields = shared.get(_shared_key(table_id, version)) if shared is not None else None
+    if fields is None:
+        fields = list(Field.objects.filter(table_id=table_id).select_related("table"))
+        if shared is not None:
+            # Keys carry the version, so entries never need invalidating.
+            shared.set(_shared_key(table_id, version), fields, SHARED_CACHE_TIMEOUT)
+    return TableSchema(table_id, version, fields)
+
+
+def _memoized_schema(table: Table) -> Optional[TableSchema]:
+    schema = getattr(table, "_table_schema", None)
+    return schema if schema is not None and schema.version == table.schema_version else None
+
+
+def get_table_schema(table: Table) -> TableSchema:
+    """Return the cached schema of ``table``.
+
+    ``Table.schema_version`` is bumped with every field change (see signals)
+    and every process reads it with the table row, so a hit needs no query.
+    The schema is also memoized on the ``table`` instance, so later lookups
+    through it (e.g. by async views, where a query would fail) can't miss
+    after an LRU eviction.
+    """
+    with timer("schema"):
+        schema = _memoized_schema(table) or schema_cache.get(table.pk, table.schema_version)
+        if schema is None:
+            schema = load_table_schema(table.pk, table.schema_version)
+            schema_cache.put(schema)
+    table._table_schema = schema
+    return schema
+
+
+async def aget_table_schema(table: Table) -> TableSchema:
+    """Async ``get_table_schema``; only a cache miss leaves the event loop."""
+    with timer("schema"):
+        schema = _memoized_schema(table) or schema_cache.get(table.pk, table.schema_version)
+    if schema is None:
+        return await sync_to_async(get_table_schema)(table)
+    table._table_schema = schema
+    return schema
+
+
+def get_record_validator(table: Table) -> RecordValidator:
+    return get_table_schema(table).validator
+
+
+@contextmanager
+def fenced_writes(table: Table):
+    """Reject the record writes in the block if the table's schema changed since ``table`` was loaded.
+
+    Data validated and keyed with an older schema (e.g. one from before a
+    field conversion switched storage keys) would land under keys nothing
+    reads any more. The database compares the declared ``schema_version``
+    once the write holds the table row; use inside ``transaction.atomic``.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT set_config('datastores.schema_version', %s, true)", [str(table.schema_version)])
+    try:
+        yield
+    except DatabaseError as exc:
+        if getattr(exc.__cause__, "pgcode", None) != SCHEMA_CHANGED_SQLSTATE:
+            raise
+        raise SchemaChanged() from exc
@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import re
+from typing import Callable, Optional
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection
+from django.db.models import F, FloatField, Lookup, Value
+from django.db.models.functions import Cast
+
+from .models import Record
+
+SEARCH_CONFIG = "simple"
+SEARCH_MODE_FULLTEXT = "fulltext"
+SEARCH_MODE_CONTAINS = "contains"
+REFRESH_CHUNK_SIZE = 5000
+
+_TERM_RE = re.compile(r"\w+", re.UNICODE)
+
+
+class ILike(Lookup):
+    """``lhs ILIKE rhs``; the pg_trgm index on ``search_text`` serves it.
+
+    ``icontains`` compiles to ``UPPER(lhs) LIKE UPPER(rhs)``, which that index
+    can't, so every ``contains`` search scanned the table.
+    """
+
+    lookup_name = "ilike"
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f"{lhs} ILIKE {rhs}", [*lhs_params, *rhs_params]
+
+
+def build_search_query(term: str):
+    """Prefix query matching every word of ``term`` (``foo bar`` -> ``foo:* & bar:*``)."""
+    words = _TERM_RE.findall(term.lower())
+    if not words:
+        return None
+    return SearchQuery(" & ".join(f"{word}:*" for word in words), search_type="raw", config=SEARCH_CONFIG)
+
+
+def apply_search(queryset, term: str, mode: str = SEARCH_MODE_FULLTEXT):
+    """Filter records by ``term`` through the maintained search columns.
+
+    ``fulltext`` matches word prefixes against the GIN-indexed ``search_vector``
+    and annotates ``search_rank``; ``contains`` keeps substring semantics on
+    ``search_text``, which the optional pg_trgm index accelerates.
+    """
+    if mode == SEARCH_MODE_CONTAINS:
+        pattern = f"%{connection.ops.prep_for_like_query(term)}%"
+        return queryset.filter(ILike(F("search_text"), Value(pattern)))
+    query = build_search_query(term)
+    if query is None:
+        return queryset
+    # Cast to double precision so the rank survives a round trip through a
+    # pagination cursor unchanged.
+    rank = Cast(SearchRank(F("search_vector"), query), FloatField())
+    return queryset.filter(search_vector=query).annotate(search_rank=rank)
+
+
+def uses_rank(params) -> bool:
+    return bool(params.get("search")) and params.get("search_mode", SEARCH_MODE_FULLTEXT) != SEARCH_MODE_CONTAINS
+
+
+def refresh_search_text(table_id: int, progress: Optional[Callable[[int, int], None]] = None) -> None:
+    """Recompute ``search_text`` for a table after its text fields changed.
+
+    Runs in id-range chunks so each statement only locks a slice of rows;
+    ``progress`` is called with the chunks done and their total after each.
+    """
+    table = connection.ops.quote_name(Record._meta.db_table)
+    bounds = Record.objects.filter(table_id=table_id).order_by("id").values_list("id", flat=True)
+    first, last = bounds.first(), bounds.last()
+    if first is None:
+        return
+    starts = range(first, last + 1, REFRESH_CHUNK_SIZE)
+    with connection.cursor() as cursor:
+        for done, start in enumerate(starts, start=1):
+            cursor.execute(
+                f"UPDATE {table} SET search_text = datastores_record_search_text(table_id, data) "
+                "WHERE table_id = %s AND id >= %s AND id < %s",
+                [table_id, start, start + REFRESH_CHUNK_SIZE],
+            )
+            if progress is not None:
+                progress(done, len(starts))
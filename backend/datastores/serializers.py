@@ -1,13 +1,56 @@
 from __future__ import annotations
 
-from __future__ import annotations
+import json
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+from rest_framework import exceptions, serializers
+
+from core.metrics import timer
+from .models import DataLayout, Database, Table, Field, FieldConversion, Record, View
+from .attachments import resolve_references
+from .conversions import SELECT_TYPES, UNCONVERTIBLE_TYPES, start_conversion
+from .etags import PreconditionFailed
+from .schema import fenced_writes, get_record_validator, get_table_schema
+from .uniqueness import index_records, is_unique_violation, rebuild_field_index
+from .validation import UNIQUE_ERROR, find_unique_conflicts
+
+BATCH_MAX_SIZE = 5000
+
+# PATCH merges the sent keys into the stored object in one statement, so
+# concurrent edits of different fields don't overwrite each other. ``drop``
+# clears keys that must not outlive the new values (a running conversion's
+# target key, which the conversion then fills again).
+MERGE_SQL = """
+UPDATE datastores_record
+SET data = (data - %(drop)s::text[]) || %(data)s::jsonb, updated_by_id = %(user)s, updated_at = %(now)s
+WHERE id = %(id)s AND (%(expected)s::bigint IS NULL OR version = %(expected)s)
+RETURNING data, version
+"""
 
-from typing import Any, Dict
+REPLACE_SQL = """
+UPDATE datastores_record
+SET data = %(data)s::jsonb, updated_by_id = %(user)s, updated_at = %(now)s
+WHERE id = %(id)s AND (%(expected)s::bigint IS NULL OR version = %(expected)s)
+RETURNING data, version
+"""
 
-from django.db.models import Q
-from rest_framework import serializers
 
-from .models import Database, Table, Field, Record, View, FieldType
+@contextmanager
+def unique_violation_as_error(detail: Callable[[], Any]):
+    """Turn a race lost on the unique index into a validation error.
+
+    ``detail`` is evaluated after the failed savepoint has rolled back, so it
+    can re-run the conflict lookup to name the offending fields.
+    """
+    try:
+        yield
+    except IntegrityError as exc:
+        if not is_unique_violation(exc):
+            raise
+        raise serializers.ValidationError(detail())
 
 
 class DatabaseSerializer(serializers.ModelSerializer):
@@ -49,10 +92,95 @@ class FieldSerializer(serializers.ModelSerializer):
     def validate(self, attrs):
         field = self.instance
         if field and "type" in attrs and attrs["type"] != field.type:
-            # Prevent destructive type changes. In production we would add migrations.
-            raise serializers.ValidationError("Field type changes are not yet supported.")
+            # Records have to be rewritten, which runs as a background job.
+            raise serializers.ValidationError({"type": f"Convert the type with POST /api/fields/{field.pk}/convert/."})
+        if field and attrs.get("unique", field.unique) != field.unique and field.conversions.filter(status__in=FieldConversion.ACTIVE_STATUSES).exists():
+            raise serializers.ValidationError({"unique": "Wait for the running type conversion to finish."})
+        if field and attrs.get("name", field.name) != field.name and field.table.data_layout == DataLayout.MIGRATING:
+            # Migrating tables still read values by name.
+            raise serializers.ValidationError({"name": "Fields can't be renamed while the table's records are being migrated."})
         return super().validate(attrs)
 
+    def create(self, validated_data):
+        with unique_violation_as_error(self.duplicate_values_error):
+            with transaction.atomic():
+                field = super().create(validated_data)
+                if field.unique:
+                    rebuild_field_index(field)
+        return field
+
+    def update(self, instance, validated_data):
+        # The index has to be rebuilt when uniqueness is toggled, or when a
+        # unique field of a name-keyed table is renamed (id-keyed tables keep
+        # their values under the same key).
+        renamed = validated_data.get("name", instance.name) != instance.name
+        rebuild = validated_data.get("unique", instance.unique) != instance.unique or (
+            instance.unique and renamed and instance.table.data_layout != DataLayout.IDS
+        )
+        with unique_violation_as_error(self.duplicate_values_error):
+            with transaction.atomic():
+                field = super().update(instance, validated_data)
+                if rebuild:
+                    rebuild_field_index(field)
+        return field
+
+    def duplicate_values_error(self):
+        return {"unique": "Existing records contain duplicate values for this field."}
+
+
+class FieldConversionSerializer(serializers.ModelSerializer):
+    """Starts a background type conversion of the field in the context and reports its progress."""
+
+    class Meta:
+        model = FieldConversion
+        fields = [
+            "id",
+            "field",
+            "source_type",
+            "target_type",
+            "target_options",
+            "status",
+            "total",
+            "processed",
+            "invalid",
+            "error",
+            "created_at",
+            "updated_at",
+            "swapped_at",
+            "finished_at",
+        ]
+        read_only_fields = [name for name in fields if name not in ("target_type", "target_options")]
+
+    def validate(self, attrs):
+        field: Field = self.context["field"]
+        target_type = attrs["target_type"]
+        options = attrs.get("target_options", {})
+        if target_type == field.type:
+            raise serializers.ValidationError({"target_type": "The field already has this type."})
+        if target_type in UNCONVERTIBLE_TYPES or field.type in UNCONVERTIBLE_TYPES:
+            raise serializers.ValidationError({"target_type": "Attachment fields can't be converted."})
+        if target_type in SELECT_TYPES and not (isinstance(options.get("choices"), list) and options["choices"]):
+            raise serializers.ValidationError({"target_options": "Provide the choices existing values are matched against."})
+        if field.unique:
+            # Converted values could collide; the unique index can't follow a
+            # type change while records keep being written.
+            raise serializers.ValidationError({"target_type": "Turn off unique before changing the type."})
+        if field.table.data_layout != DataLayout.IDS:
+            raise serializers.ValidationError({"target_type": "Run manage.py migrate_record_keys for this table first."})
+        return attrs
+
+    def create(self, validated_data):
+        try:
+            with transaction.atomic():
+                return start_conversion(
+                    self.context["field"],
+                    validated_data["target_type"],
+                    validated_data.get("target_options", {}),
+                    self.context["request"].user,
+                )
+        except IntegrityError:
+            raise serializers.ValidationError({"target_type": "A conversion of this field is already running."})
+
 
 class ViewSerializer(serializers.ModelSerializer):
     class Meta:
@@ -61,86 +189,231 @@ class ViewSerializer(serializers.ModelSerializer):
         read_only_fields = ["id", "created_at", "updated_at"]
 
 
+class RecordListSerializer(serializers.ListSerializer):
+    @property
+    def data(self):
+        with timer("serialize"):
+            return super().data
+
+
 class RecordSerializer(serializers.ModelSerializer):
     table = serializers.PrimaryKeyRelatedField(queryset=Table.objects.all(), required=False)
 
     class Meta:
         model = Record
-        fields = ["id", "table", "data", "created_by", "updated_by", "created_at", "updated_at"]
-        read_only_fields = ["id", "created_by", "updated_by", "created_at", "updated_at"]
+        fields = ["id", "table", "data", "version", "created_by", "updated_by", "created_at", "updated_at"]
+        read_only_fields = ["id", "version", "created_by", "updated_by", "created_at", "updated_at"]
+        list_serializer_class = RecordListSerializer
+
+    @property
+    def data(self):
+        with timer("serialize"):
+            return super().data
+
+    @property
+    def merging(self) -> bool:
+        return self.partial and self.instance is not None
 
     def validate(self, attrs: Dict[str, Any]):
         table: Table = self.context["table"]
         attrs["table"] = table
         data = attrs.get("data", {})
-        fields = list(table.fields.all())
-        errors = {}
-        for field in fields:
-            value = data.get(field.name)
-            if field.required and value in (None, ""):
-                errors[field.name] = "This field is required."
-                continue
-            if value in (None, ""):
-                continue
-            if field.type in {FieldType.NUMBER, FieldType.DECIMAL}:
-                if not isinstance(value, (int, float, str)):
-                    errors[field.name] = "Must be a number."
-                    continue
-                try:
-                    numeric = float(value)
-                    data[field.name] = numeric if field.type == FieldType.DECIMAL else int(numeric)
-                except (TypeError, ValueError):
-                    errors[field.name] = "Invalid number."
-            elif field.type == FieldType.BOOLEAN:
-                if not isinstance(value, (bool, int, str)):
-                    errors[field.name] = "Must be boolean."
-                else:
-                    if isinstance(value, str):
-                        data[field.name] = value.lower() in {"true", "1", "yes"}
-                    else:
-                        data[field.name] = bool(value)
-            elif field.type == FieldType.DATE:
-                # Accept ISO strings.
-                if not isinstance(value, str):
-                    errors[field.name] = "Must be ISO date string."
-            elif field.type == FieldType.SINGLE_SELECT:
-                choices = field.options.get("choices", [])
-                if value not in choices:
-                    errors[field.name] = "Invalid choice."
-            elif field.type == FieldType.MULTI_SELECT:
-                choices = field.options.get("choices", [])
-                if not isinstance(value, list) or not set(value).issubset(set(choices)):
-                    errors[field.name] = "Invalid choices."
-            elif field.type == FieldType.ATTACHMENT:
-                if not isinstance(value, str):
-                    errors[field.name] = "Attachment must be a base64 string."
-                # Future extension point: replace inline base64 strings with external storage references (e.g. S3 object keys).
+        if not isinstance(data, dict):
+            raise serializers.ValidationError({"data": "Expected an object."})
+        validator = get_record_validator(table)
+        data, errors = validator.clean(data, partial=self.merging)
         if errors:
             raise serializers.ValidationError({"data": errors})
 
-        # Unique constraint check
-        instance = self.instance
-        for field in fields:
-            if not field.unique:
-                continue
-            value = data.get(field.name)
-            if value in (None, ""):
-                continue
-            query = Q(data__contains={field.name: value})
-            qs = Record.objects.filter(table=table).filter(query)
-            if instance:
-                qs = qs.exclude(pk=instance.pk)
-            if qs.exists():
-                raise serializers.ValidationError({"data": {field.name: "Value must be unique."}})
-        attrs["data"] = data
+        missing = resolve_references(table, validator.attachment_fields, [(None, data)])
+        if missing:
+            raise serializers.ValidationError({"data": missing[None]})
+
+        conflicts = self.find_conflicts(data)
+        if conflicts:
+            raise serializers.ValidationError({"data": conflicts})
+        schema = get_table_schema(table)
+        self.touched_fields = [schema.get(name) for name in data if schema.get(name) is not None]
+        attrs["data"] = schema.to_storage(data)
         return attrs
 
+    def to_representation(self, instance):
+        representation = super().to_representation(instance)
+        table = self.context.get("table") or instance.table
+        representation["data"] = get_table_schema(table).to_api(instance.data)
+        return representation
+
+    def find_conflicts(self, data: Dict[str, Any]) -> Dict[str, str]:
+        table: Table = self.context["table"]
+        exclude_ids = [self.instance.pk] if self.instance else []
+        unique_fields = get_record_validator(table).unique_fields
+        return find_unique_conflicts(table, unique_fields, [(None, data)], exclude_ids).get(None, {})
+
+    def unique_error(self, data: Dict[str, Any]):
+        data = get_table_schema(self.context["table"]).to_api(data)
+        return {"data": self.find_conflicts(data) or UNIQUE_ERROR}
+
     def create(self, validated_data):
         user = self.context["request"].user
         validated_data.setdefault("created_by", user)
         validated_data.setdefault("updated_by", user)
-        return super().create(validated_data)
+        unique_fields = get_record_validator(validated_data["table"]).unique_fields
+        with unique_violation_as_error(lambda: self.unique_error(validated_data["data"])):
+            with transaction.atomic(), fenced_writes(validated_data["table"]):
+                record = super().create(validated_data)
+                index_records(unique_fields, [record])
+        return record
+
+    def update(self, instance, validated_data):
+        """Write ``data`` with one UPDATE, merged into the stored object for PATCH.
+
+        ``expected_version`` (from ``If-Match``) makes the write conditional
+        on the record's current version.
+        """
+        expected_version = validated_data.pop("expected_version", None)
+        user = self.context["request"].user
+        schema = get_table_schema(instance.table)
+        data = validated_data.get("data", {})
+        unique_fields = get_record_validator(instance.table).unique_fields
+        drop = []
+        if self.merging:
+            touched = self.touched_fields
+            unique_fields = [field for field in unique_fields if field in touched]
+            if schema.layout == DataLayout.IDS:
+                drop = [field.versioned_key(field.key_version + 1) for field in touched]
+        with unique_violation_as_error(lambda: self.unique_error(data)):
+            with transaction.atomic(), fenced_writes(instance.table):
+                self.write(instance, data, drop, user, expected_version)
+                index_records(unique_fields, [instance])
+        return instance
+
+    def write(self, instance: Record, data: Dict[str, Any], drop: List[str], user, expected_version: Optional[int]):
+        now = timezone.now()
+        params = {
+            "id": instance.pk,
+            "data": json.dumps(data),
+            "drop": drop,
+            "user": user.pk,
+            "now": now,
+            "expected": expected_version,
+        }
+        with connection.cursor() as cursor:
+            cursor.execute(MERGE_SQL if self.merging else REPLACE_SQL, params)
+            row = cursor.fetchone()
+        if row is None:
+            if Record.objects.filter(pk=instance.pk).exists():
+                raise PreconditionFailed()
+            raise exceptions.NotFound()
+        stored, instance.version = row
+        instance.data = json.loads(stored) if isinstance(stored, str) else stored
+        instance.updated_by = user
+        instance.updated_at = now
+
+
+class RecordBatchSerializer(serializers.Serializer):
+    """Validates and writes many records at once.
+
+    Without an ``instance`` items are ``{"data": {...}}`` and get created; with
+    ``instance`` set to the table's record queryset items are
+    ``{"id": ..., "data": {...}}`` and update the matching records. Field
+    metadata comes from the cached validator and all unique fields are checked
+    with one indexed query.
+    Errors are reported per item index and nothing is written if any item fails.
+    """
+
+    items = serializers.ListField(child=serializers.DictField(), allow_empty=False, max_length=BATCH_MAX_SIZE)
+
+    def validate_items(self, items: List[Dict[str, Any]]):
+        table: Table = self.context["table"]
+        validator = get_record_validator(table)
+        errors: Dict[int, Any] = {}
+        rows = []
+        instances = {}
+        if self.instance is not None:
+            ids = [item.get("id") for item in items]
+            instances = self.instance.in_bulk([pk for pk in ids if isinstance(pk, int)])
+        seen = set()
+        for index, item in enumerate(items):
+            if self.instance is not None:
+                if item.get("id") not in instances:
+                    errors[index] = {"id": "Record not found."}
+                    continue
+                # ``bulk_update`` would apply only the last item for a record.
+                if item["id"] in seen:
+                    errors[index] = {"id": "Record appears more than once in this batch."}
+                    continue
+                seen.add(item["id"])
+            data = item.get("data", {})
+            if not isinstance(data, dict):
+                errors[index] = {"data": "Expected an object."}
+                continue
+            data, row_errors = validator.clean(dict(data))
+            if row_errors:
+                errors[index] = {"data": row_errors}
+                continue
+            rows.append((index, data))
+        missing = resolve_references(table, validator.attachment_fields, rows)
+        conflicts = find_unique_conflicts(table, validator.unique_fields, rows, exclude_ids=instances.keys())
+        for index, row_errors in conflicts.items():
+            errors[index] = {"data": {**missing.pop(index, {}), **row_errors}}
+        for index, row_errors in missing.items():
+            errors[index] = {"data": row_errors}
+        if errors:
+            raise serializers.ValidationError(dict(sorted(errors.items())))
+        self.rows = rows
+        self.exclude_ids = list(instances.keys())
+        to_storage = get_table_schema(table).to_storage
+        if self.instance is not None:
+            return [(instances[items[index]["id"]], to_storage(data)) for index, data in rows]
+        return [to_storage(data) for _, data in rows]
+
+    def unique_error(self):
+        table: Table = self.context["table"]
+        unique_fields = get_record_validator(table).unique_fields
+        conflicts = find_unique_conflicts(table, unique_fields, self.rows, self.exclude_ids)
+        if not conflicts:
+            return {"items": UNIQUE_ERROR}
+        return {"items": {index: {"data": row_errors} for index, row_errors in sorted(conflicts.items())}}
+
+    def create(self, validated_data):
+        table: Table = self.context["table"]
+        user = self.context["request"].user
+        records = [
+            Record(table=table, data=data, created_by=user, updated_by=user)
+            for data in validated_data["items"]
+        ]
+        with unique_violation_as_error(self.unique_error):
+            with transaction.atomic(), fenced_writes(table):
+                records = Record.objects.bulk_create(records)
+                index_records(get_record_validator(table).unique_fields, records)
+        return records
 
     def update(self, instance, validated_data):
-        validated_data["updated_by"] = self.context["request"].user
-        return super().update(instance, validated_data)
+        user = self.context["request"].user
+        now = timezone.now()
+        records = []
+        for record, data in validated_data["items"]:
+            record.data = data
+            record.updated_by = user
+            record.updated_at = now
+            records.append(record)
+        with unique_violation_as_error(self.unique_error):
+            with transaction.atomic(), fenced_writes(self.context["table"]):
+                Record.objects.bulk_update(records, ["data", "updated_by", "updated_at"], batch_size=1000)
+                index_records(get_record_validator(self.context["table"]).unique_fields, records)
+        versions = dict(Record.objects.filter(pk__in=[record.pk for record in records]).values_list("pk", "version"))
+        for record in records:
+            record.version = versions.get(record.pk, record.version)
+        return records
+
+
+class RecordBatchDeleteSerializer(serializers.Serializer):
+    items = serializers.ListField(child=serializers.IntegerField(), allow_empty=False, max_length=BATCH_MAX_SIZE)
+
+    def validate_items(self, items: List[int]):
+        table: Table = self.context["table"]
+        existing = set(Record.objects.filter(table=table, pk__in=items).values_list("pk", flat=True))
+        errors = {index: "Record not found." for index, pk in enumerate(items) if pk not in existing}
+        if errors:
+            raise serializers.ValidationError(errors)
+        return items
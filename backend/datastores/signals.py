@@ -0,0 +1,71 @@
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import DataLayout, Field, FieldType, Table, View
+from .realtime import publish_table_event
+from .tasks import queue_index_sync, queue_search_refresh
+
+SEARCHABLE_TYPES = {FieldType.TEXT, FieldType.LONG_TEXT}
+
+
+@receiver(post_save, sender=Field)
+@receiver(post_delete, sender=Field)
+@receiver(post_save, sender=View)
+@receiver(post_delete, sender=View)
+def touch_table_schema(sender, instance, **kwargs):
+    """Bump ``Table.schema_version`` so cached schemas and ETags of the table go stale."""
+    now = timezone.now()
+    Table.objects.filter(pk=instance.table_id).update(updated_at=now, schema_version=F("schema_version") + 1)
+    if sender.table.is_cached(instance):
+        # Keep the in-memory table current for the rest of the request.
+        instance.table.updated_at = now
+        instance.table.schema_version = (
+            Table.objects.filter(pk=instance.table_id).values_list("schema_version", flat=True).first()
+        )
+    publish_table_event(instance.table_id, {"type": "table.changed", "reason": "schema"})
+
+
+@receiver(post_save, sender=Field)
+@receiver(post_delete, sender=Field)
+@receiver(post_save, sender=View)
+@receiver(post_delete, sender=View)
+def sync_record_indexes(sender, instance, raw=False, **kwargs):
+    if not raw:
+        queue_index_sync(instance.table_id)
+
+
+@receiver(pre_save, sender=Field)
+def remember_search_inputs(sender, instance: Field, raw=False, **kwargs):
+    if raw or instance.pk is None:
+        instance._search_inputs = None
+        return
+    instance._search_inputs = Field.objects.filter(pk=instance.pk).values_list("name", "type").first()
+
+
+@receiver(post_save, sender=Field)
+def refresh_search_on_save(sender, instance: Field, created=False, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, "_search_inputs", None)
+    searchable = instance.type in SEARCHABLE_TYPES
+    if created or previous is None:
+        # A new field of an id-keyed table has a fresh key no record holds yet.
+        changed = searchable and instance.table.data_layout != DataLayout.IDS
+    else:
+        name, type_ = previous
+        # Id-keyed tables find values under the same key after a rename.
+        if instance.table.data_layout == DataLayout.IDS:
+            name = instance.name
+        changed = (searchable or type_ in SEARCHABLE_TYPES) and (name, type_) != (instance.name, instance.type)
+    if changed:
+        # A table-sized UPDATE; the job worker runs it outside the request.
+        queue_search_refresh(instance.table)
+
+
+@receiver(post_delete, sender=Field)
+def refresh_search_on_delete(sender, instance: Field, **kwargs):
+    # Fields of deleted tables go in the hard delete, together with the records.
+    if instance.type in SEARCHABLE_TYPES and instance.table.deleted_at is None:
+        queue_search_refresh(instance.table)
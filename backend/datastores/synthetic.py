@@ -0,0 +1,211 @@
+"""Synthetic workspaces, tables and records for load tests and benchmarks.
+
+Used by the ``generate_data`` and ``benchmark_records`` management commands.
+Values are drawn from a seeded ``random.Random``, so the same options
+produce the same data.
+"""
+
+from __future__ import annotations
+
+import datetime
+import itertools
+import random
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from workspaces.models import RoleAssignment, RoleChoices, Workspace
+
+from .attachments import get_blob_store
+from .models import Attachment, Database, Field, FieldType, Record, Table, View
+from .uniqueness import rebuild_field_index
+
+DISTRIBUTIONS = ("uniform", "skewed")
+DEFAULT_FIELD_SPEC = ",".join(FieldType.values)
+CHOICE_COUNT = 12
+ATTACHMENT_COUNT = 5
+VOCABULARY_SIZE = 2000
+SYLLABLES = (
+    "ka", "lo", "mi", "nu", "pe", "ra", "so", "ti", "va", "ze", "bra", "cor", "din", "fel", "gar", "hum",
+    "jus", "kel", "lum", "mor", "nox", "pil", "qua", "ros", "sul", "tor", "ulm", "ven", "wix", "yar",
+)
+DATE_START = datetime.date(2020, 1, 1)
+DATE_SPAN_DAYS = 5 * 365
+
+
+def parse_field_spec(spec: str) -> List[Tuple[str, int]]:
+    """Parse ``"text:2,number,single_select:3"`` into ``[(type, count), ...]``."""
+    result = []
+    for part in filter(None, (item.strip() for item in spec.split(","))):
+        type_, _, count = part.partition(":")
+        if type_ not in FieldType.values:
+            raise ValueError(f"Unknown field type {type_!r}; use one of {', '.join(FieldType.values)}.")
+        try:
+            result.append((type_, int(count or 1)))
+        except ValueError:
+            raise ValueError(f"Invalid count in {part!r}.")
+    return result
+
+
+class ValueFactory:
+    """Draws field values for generated records.
+
+    ``uniform`` picks numbers, dates, choices and words evenly; ``skewed``
+    follows a Zipf-like curve, so a few values are very common, as in real
+    tables. Optional fields are left empty at ``null_rate``.
+    """
+
+    def __init__(
+        self,
+        fields: Sequence[Field],
+        seed: int = 0,
+        distribution: str = "uniform",
+        null_rate: float = 0.1,
+        attachment_ids: Sequence[int] = (),
+    ):
+        self.fields = tuple(fields)
+        self.rng = random.Random(seed)
+        self.skewed = distribution == "skewed"
+        self.null_rate = null_rate
+        self.attachment_ids = tuple(attachment_ids)
+        words = random.Random(0)
+        self.vocabulary = [
+            "".join(words.choice(SYLLABLES) for _ in range(words.randint(2, 3))) for _ in range(VOCABULARY_SIZE)
+        ]
+        self._weights: Dict[int, List[float]] = {}
+
+    def pick(self, population: Sequence[Any]) -> Any:
+        if not self.skewed:
+            return self.rng.choice(population)
+        size = len(population)
+        if size not in self._weights:
+            self._weights[size] = list(itertools.accumulate(1 / (rank + 1) for rank in range(size)))
+        return self.rng.choices(population, cum_weights=self._weights[size])[0]
+
+    def ratio(self) -> float:
+        # Mostly small values with a long tail when skewed.
+        return min(self.rng.paretovariate(1.5) - 1, 100) / 100 if self.skewed else self.rng.random()
+
+    def words(self, low: int, high: int) -> str:
+        return " ".join(self.pick(self.vocabulary) for _ in range(self.rng.randint(low, high)))
+
+    def value(self, field: Field, index: int) -> Any:
+        if field.unique:
+            return f"{self.words(1, 2)} {index}"
+        if not field.required and self.rng.random() < self.null_rate:
+            return None
+        type_ = field.type
+        if type_ == FieldType.TEXT:
+            return self.words(1, 4)
+        if type_ == FieldType.LONG_TEXT:
+            return self.words(10, 60)
+        if type_ == FieldType.NUMBER:
+            return int(self.ratio() * 1_000_000)
+        if type_ == FieldType.DECIMAL:
+            return round(self.ratio() * 10_000, 2)
+        if type_ == FieldType.BOOLEAN:
+            return self.rng.random() < 0.5
+        if type_ == FieldType.DATE:
+            return (DATE_START + datetime.timedelta(days=int(self.ratio() * DATE_SPAN_DAYS))).isoformat()
+        choices = field.options.get("choices") or []
+        if type_ == FieldType.SINGLE_SELECT:
+            return self.pick(choices) if choices else None
+        if type_ == FieldType.MULTI_SELECT:
+            return sorted({self.pick(choices) for _ in range(self.rng.randint(0, 3))}) if choices else []
+        if type_ == FieldType.ATTACHMENT:
+            return {"id": self.rng.choice(self.attachment_ids)} if self.attachment_ids else None
+        return None
+
+    def api_data(self, index: int) -> Dict[str, Any]:
+        """Record data keyed by field name, as the API takes it."""
+        return {field.name: self.value(field, index) for field in self.fields}
+
+    def storage_data(self, index: int) -> Dict[str, Any]:
+        """Record data keyed like ``Record.data`` of the field's table."""
+        return {field.data_key: self.value(field, index) for field in self.fields}
+
+
+def create_fields(table: Table, spec: Sequence[Tuple[str, int]], rng: random.Random) -> List[Field]:
+    """A required unique ``Name`` field followed by the fields of ``spec``."""
+    fields = [Field.objects.create(table=table, name="Name", type=FieldType.TEXT, required=True, unique=True)]
+    counts: Dict[str, int] = {}
+    for type_, count in spec:
+        for _ in range(count):
+            counts[type_] = counts.get(type_, 0) + 1
+            options = {}
+            if type_ in (FieldType.SINGLE_SELECT, FieldType.MULTI_SELECT):
+                options["choices"] = [f"Option {number}" for number in range(1, CHOICE_COUNT + 1)]
+                rng.shuffle(options["choices"])
+            name = f"{FieldType(type_).label} {counts[type_]}"
+            fields.append(Field.objects.create(table=table, name=name, type=type_, order=len(fields), options=options))
+    return fields
+
+
+def create_attachments(table: Table, user, count: int = ATTACHMENT_COUNT) -> List[int]:
+    store = get_blob_store()
+    ids = []
+    for number in range(1, count + 1):
+        sha256, size = store.save([f"synthetic attachment {number}\n".encode() * 64])
+        attachment = Attachment.objects.create(
+            table=table, sha256=sha256, size=size, name=f"file-{number}.txt", content_type="text/plain", created_by=user
+        )
+        ids.append(attachment.pk)
+    return ids
+
+
+def insert_records(table: Table, factory: ValueFactory, count: int, user, batch_size: int = 5000, start: int = 0) -> int:
+    """Bulk insert ``count`` records, one transaction per batch."""
+    inserted = 0
+    while inserted < count:
+        size = min(batch_size, count - inserted)
+        batch = [
+            Record(table=table, data=factory.storage_data(start + inserted + offset), created_by=user, updated_by=user)
+            for offset in range(size)
+        ]
+        with transaction.atomic():
+            Record.objects.bulk_create(batch)
+        inserted += size
+    return inserted
+
+
+def generate_table(
+    database: Database,
+    name: str,
+    user,
+    records: int,
+    spec: Sequence[Tuple[str, int]],
+    seed: int = 0,
+    distribution: str = "uniform",
+    null_rate: float = 0.1,
+    batch_size: int = 5000,
+) -> Table:
+    """Create a table with the fields of ``spec``, a saved view and ``records`` records."""
+    rng = random.Random(seed)
+    table = Table.objects.create(database=database, name=name)
+    fields = create_fields(table, spec, rng)
+    attachment_ids = create_attachments(table, user) if any(f.type == FieldType.ATTACHMENT for f in fields) else []
+    sort_field: Optional[Field] = next((f for f in fields if f.type == FieldType.NUMBER), None)
+    if sort_field is not None:
+        # Saved views get per-field indexes, like tables people actually use.
+        View.objects.create(table=table, name="By number", config={"sort": [f"{sort_field.name}:desc"], "filter": []})
+    factory = ValueFactory(fields, seed, distribution, null_rate, attachment_ids)
+    insert_records(table, factory, records, user, batch_size)
+    for field in fields:
+        if field.unique:
+            rebuild_field_index(field)
+    return table
+
+
+def get_or_create_user(username: str, password: str):
+    user, created = get_user_model().objects.get_or_create(username=username)
+    if created:
+        user.set_password(password)
+        user.save(update_fields=["password"])
+    return user
+
+
+def create_workspace(user, name: str) -> Workspace:
+    workspace = Workspace.objects.create(name=name, owner=user)
+    RoleAssignment.objects.create(workspace=workspace, user=user, role=RoleChoices.ADMIN)
+    return workspace
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from jobs.queue import JobContext, enqueue
+from jobs.registry import register
+
+from .conversions import fail_conversion, run_conversion
+from .indexes import sync_table_indexes
+from .journal import compact_journal, expire_journal, skip_journal
+from .models import Attachment, Record, RecordChange, Table
+from .search import refresh_search_text
+
+DELETE_TABLE = "datastores.delete_table"
+PURGE_DELETED_TABLES = "datastores.purge_deleted_tables"
+CONVERT_FIELD = "datastores.convert_field"
+COMPACT_JOURNAL = "datastores.compact_journal"
+REFRESH_SEARCH_TEXT = "datastores.refresh_search_text"
+SYNC_TABLE_INDEXES = "datastores.sync_table_indexes"
+
+
+def queue_table_delete(table: Table, user=None):
+    return enqueue(
+        DELETE_TABLE,
+        {"table_id": table.pk},
+        workspace=table.database.workspace,
+        user=user,
+        dedupe_key=f"{DELETE_TABLE}:{table.pk}",
+    )
+
+
+@register(DELETE_TABLE)
+def delete_table(context: JobContext):
+    """Hard-delete a table, its records first in batches of short transactions.
+
+    Deleting everything in one statement would hold locks on millions of rows
+    for the whole run. Unique value entries go with their records (database
+    cascade); the table row and its small dependants are removed last.
+    """
+    table_id = context.payload["table_id"]
+    table = Table.objects.filter(pk=table_id).first()
+    if table is None:
+        return {"deleted_records": context.job.processed}
+    batch_size = getattr(settings, "DATASTORES_DELETE_BATCH_SIZE", 5000)
+    # Resumed runs continue counting where the previous attempt stopped.
+    deleted = context.job.processed
+    context.progress(deleted, deleted + Record.objects.filter(table_id=table_id).count())
+    while True:
+        with transaction.atomic():
+            ids = list(Record.objects.filter(table_id=table_id).order_by("id").values_list("id", flat=True)[:batch_size])
+            if not ids:
+                break
+            # Nobody reads the journal of a table that is going away.
+            skip_journal()
+            Record.objects.filter(pk__in=ids).delete()
+        deleted += len(ids)
+        context.progress(deleted)
+    Attachment.objects.filter(table_id=table_id).delete()
+    table.delete()
+    return {"deleted_records": deleted}
+
+
+@register(PURGE_DELETED_TABLES, every=timedelta(hours=1))
+def purge_deleted_tables(context: JobContext):
+    """Queue hard deletes for tables soft-deleted longer than the retention window."""
+    cutoff = timezone.now() - timedelta(days=getattr(settings, "DATASTORES_TABLE_RETENTION_DAYS", 30))
+    tables = list(Table.objects.filter(deleted_at__lt=cutoff).select_related("database__workspace"))
+    for table in tables:
+        queue_table_delete(table)
+    context.progress(len(tables), len(tables))
+    return {"queued_tables": [table.pk for table in tables]}
+
+
+def queue_search_refresh(table: Table):
+    return enqueue(
+        REFRESH_SEARCH_TEXT,
+        {"table_id": table.pk},
+        workspace=table.database.workspace,
+        dedupe_key=f"{REFRESH_SEARCH_TEXT}:{table.pk}",
+    )
+
+
+@register(REFRESH_SEARCH_TEXT)
+def refresh_table_search_text(context: JobContext):
+    """Recompute ``search_text`` after a text field was renamed, retyped or deleted."""
+    refresh_search_text(context.payload["table_id"], progress=context.progress)
+
+
+def queue_index_sync(table_id: int):
+    if not getattr(settings, "DATASTORES_MANAGE_INDEXES", True):
+        return None
+    # No workspace: the table may be going away with it, and the job then
+    # drops the table's indexes.
+    return enqueue(SYNC_TABLE_INDEXES, {"table_id": table_id}, dedupe_key=f"{SYNC_TABLE_INDEXES}:{table_id}")
+
+
+@register(SYNC_TABLE_INDEXES)
+def sync_record_indexes(context: JobContext):
+    """Create and drop a table's per-field indexes after its fields or views changed.
+
+    ``CONCURRENTLY`` scans the whole shared records table and waits out older
+    snapshots such as export cursors, so this runs on the worker rather than
+    in the request that saved the field or view.
+    """
+    sync_table_indexes(context.payload["table_id"])
+
+
+def _conversion_failed(context: JobContext, error: str) -> None:
+    fail_conversion(context.payload["conversion_id"], error)
+
+
+@register(CONVERT_FIELD, on_failure=_conversion_failed)
+def convert_field(context: JobContext):
+    # The conversion keeps its own progress; mirror it so the job heartbeats.
+    run_conversion(context.payload["conversion_id"], progress=context.progress)
+
+
+@register(COMPACT_JOURNAL, every=timedelta(hours=1))
+def compact_record_journal(context: JobContext):
+    """Drop superseded journal entries, then entries past the retention window."""
+    table_ids = list(RecordChange.objects.order_by().values_list("table_id", flat=True).distinct())
+    compacted = 0
+    for done, table_id in enumerate(table_ids, start=1):
+        compacted += compact_journal(table_id)
+        context.progress(done, len(table_ids))
+    expire_journal(timezone.now() - timedelta(days=getattr(settings, "DATASTORES_JOURNAL_RETENTION_DAYS", 7)))
+    return {"tables": len(table_ids), "compacted": compacted}
@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+import hashlib
+import json
+from typing import Any, Iterable, Sequence
+
+from django.db import IntegrityError, transaction
+
+from .models import Field, Record, RecordUniqueValue
+
+UNIQUE_CONSTRAINT_NAME = "datastores_unique_value"
+REBUILD_CHUNK_SIZE = 2000
+
+
+def hash_value(value: Any) -> str:
+    encoded = json.dumps(value, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+def is_unique_violation(exc: IntegrityError) -> bool:
+    diag = getattr(exc.__cause__, "diag", None)
+    return getattr(diag, "constraint_name", None) == UNIQUE_CONSTRAINT_NAME
+
+
+def index_records(fields: Sequence[Field], records: Iterable[Record]) -> None:
+    """Replace the unique index entries of ``records`` for ``fields``.
+
+    Raises ``IntegrityError`` when a value is already taken; callers run this
+    inside a savepoint together with the record write.
+    """
+    if not fields:
+        return
+    records = list(records)
+    entries = []
+    for record in records:
+        for field in fields:
+            value = record.data.get(field.data_key)
+            if value in (None, ""):
+                continue
+            entries.append(RecordUniqueValue(field=field, record_id=record.pk, value_hash=hash_value(value)))
+    RecordUniqueValue.objects.filter(field__in=fields, record_id__in=[record.pk for record in records]).delete()
+    RecordUniqueValue.objects.bulk_create(entries, batch_size=REBUILD_CHUNK_SIZE)
+
+
+def rebuild_field_index(field: Field) -> None:
+    """Rebuild the index of a single field from the stored records.
+
+    Raises ``IntegrityError`` when existing records hold duplicate values.
+    """
+    with transaction.atomic():
+        field.unique_values.all().delete()
+        if not field.unique:
+            return
+        rows = Record.objects.filter(table_id=field.table_id).values_list("id", "data")
+        key = field.data_key
+        entries = []
+        for record_id, data in rows.iterator(chunk_size=REBUILD_CHUNK_SIZE):
+            value = data.get(key)
+            if value in (None, ""):
+                continue
+            entries.append(RecordUniqueValue(field=field, record_id=record_id, value_hash=hash_value(value)))
+            if len(entries) >= REBUILD_CHUNK_SIZE:
+                RecordUniqueValue.objects.bulk_create(entries)
+                entries = []
+        RecordUniqueValue.objects.bulk_create(entries)
@@ -0,0 +1,191 @@
+from __future__ import annotations
+
+from collections import defaultdict
+from typing import Any, Callable, Dict, FrozenSet, Hashable, Iterable, List, Optional, Tuple
+
+from django.db.models import Q
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Field, RecordUniqueValue, Table, FieldType
+from .uniqueness import hash_value
+
+UNIQUE_ERROR = "Value must be unique."
+
+
+class InvalidValue(Exception):
+    pass
+
+
+def _coerce_number(value):
+    if not isinstance(value, (int, float, str)):
+        raise InvalidValue("Must be a number.")
+    try:
+        return int(float(value))
+    except (TypeError, ValueError, OverflowError):
+        raise InvalidValue("Invalid number.")
+
+
+def _coerce_decimal(value):
+    if not isinstance(value, (int, float, str)):
+        raise InvalidValue("Must be a number.")
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise InvalidValue("Invalid number.")
+
+
+def _coerce_boolean(value):
+    if isinstance(value, str):
+        return value.lower() in {"true", "1", "yes"}
+    if not isinstance(value, (bool, int)):
+        raise InvalidValue("Must be boolean.")
+    return bool(value)
+
+
+def _coerce_date(value):
+    # Accept ISO strings only. Postgres also casts words such as ``now`` or
+    # ``tomorrow``, whose values the date index expressions can't hold.
+    if not isinstance(value, str):
+        raise InvalidValue("Must be ISO date string.")
+    try:
+        parsed = parse_datetime(value) or parse_date(value)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise InvalidValue("Must be ISO date string.")
+    return value
+
+
+def _coerce_attachment(value):
+    # Records hold references to uploaded attachments (see
+    # ``datastores.attachments``); the id is checked and the reference
+    # expanded in one query per request by ``resolve_references``.
+    if isinstance(value, dict):
+        value = value.get("id")
+    if not isinstance(value, int) or isinstance(value, bool):
+        raise InvalidValue("Must be an attachment id or reference.")
+    return {"id": value}
+
+
+def _single_select(choices: FrozenSet):
+    def coerce(value):
+        try:
+            valid = value in choices
+        except TypeError:
+            valid = False
+        if not valid:
+            raise InvalidValue("Invalid choice.")
+        return value
+    return coerce
+
+
+def _multi_select(choices: FrozenSet):
+    def coerce(value):
+        try:
+            valid = isinstance(value, list) and choices.issuperset(value)
+        except TypeError:
+            valid = False
+        if not valid:
+            raise InvalidValue("Invalid choices.")
+        return value
+    return coerce
+
+
+_COERCERS: Dict[str, Callable[[Any], Any]] = {
+    FieldType.NUMBER: _coerce_number,
+    FieldType.DECIMAL: _coerce_decimal,
+    FieldType.BOOLEAN: _coerce_boolean,
+    FieldType.DATE: _coerce_date,
+    FieldType.ATTACHMENT: _coerce_attachment,
+}
+
+
+def compile_field(field: Field) -> Optional[Callable[[Any], Any]]:
+    if field.type == FieldType.SINGLE_SELECT:
+        return _single_select(frozenset(field.options.get("choices", [])))
+    if field.type == FieldType.MULTI_SELECT:
+        return _multi_select(frozenset(field.options.get("choices", [])))
+    return _COERCERS.get(field.type)
+
+
+class RecordValidator:
+    """Per-table validator with the field checks compiled up front.
+
+    Construction resolves every field to a coercion callable (choice sets are
+    frozen once), so ``clean`` is a tight loop that issues no queries.
+    """
+
+    def __init__(self, fields: Iterable[Field]):
+        self.fields = tuple(fields)
+        self.unique_fields = tuple(field for field in self.fields if field.unique)
+        self.attachment_fields = tuple(field for field in self.fields if field.type == FieldType.ATTACHMENT)
+        self.checks = tuple((field.name, field.required, compile_field(field)) for field in self.fields)
+
+    def clean(self, data: Dict[str, Any], partial: bool = False) -> Tuple[Dict[str, Any], Dict[str, str]]:
+        """Coerce ``data`` in place according to the field types and collect errors.
+
+        With ``partial`` only the fields present in ``data`` are checked, as
+        the others keep their stored values.
+        """
+        errors = {}
+        for name, required, coerce in self.checks:
+            if partial and name not in data:
+                continue
+            value = data.get(name)
+            if value is None or value == "":
+                if required:
+                    errors[name] = "This field is required."
+                continue
+            if coerce is None:
+                continue
+            try:
+                data[name] = coerce(value)
+            except InvalidValue as exc:
+                errors[name] = str(exc)
+        return data, errors
+
+
+def find_unique_conflicts(
+    table: Table,
+    fields: Iterable[Field],
+    rows: List[Tuple[Hashable, Dict[str, Any]]],
+    exclude_ids: Iterable[int] = (),
+) -> Dict[Hashable, Dict[str, str]]:
+    """Check unique fields for a batch of rows against ``RecordUniqueValue``.
+
+    ``rows`` holds ``(key, data)`` pairs; the returned mapping uses the same keys.
+    ``exclude_ids`` are records being overwritten, so their stored values don't count.
+    Duplicates inside the batch are reported on every row after the first. All
+    fields are resolved with a single indexed query.
+    """
+    conflicts: Dict[Hashable, Dict[str, str]] = defaultdict(dict)
+    hashes: Dict[Hashable, Dict[Field, str]] = defaultdict(dict)
+    lookup = Q()
+    for field in fields:
+        if not field.unique:
+            continue
+        seen = set()
+        for key, data in rows:
+            value = data.get(field.name)
+            if value in (None, ""):
+                continue
+            value_hash = hash_value(value)
+            hashes[key][field] = value_hash
+            if value_hash in seen:
+                conflicts[key][field.name] = UNIQUE_ERROR
+            seen.add(value_hash)
+        if seen:
+            lookup |= Q(field=field, value_hash__in=seen)
+    if not lookup:
+        return dict(conflicts)
+    qs = RecordUniqueValue.objects.filter(lookup)
+    exclude_ids = list(exclude_ids)
+    if exclude_ids:
+        qs = qs.exclude(record_id__in=exclude_ids)
+    taken = set(qs.values_list("field_id", "value_hash"))
+    if taken:
+        for key, field_hashes in hashes.items():
+            for field, value_hash in field_hashes.items():
+                if (field.pk, value_hash) in taken:
+                    conflicts[key][field.name] = UNIQUE_ERROR
+    return dict(conflicts)
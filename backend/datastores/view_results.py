@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import hashlib
+import json
+from typing import Any, List, Mapping, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework import serializers
+
+from core.profiling import note_queryset
+from .models import Record, View
+from .queries import build_record_queryset, get_view_params
+
+VIEW_PAGE_SIZE = 100
+MAX_VIEW_PAGE_SIZE = 1000
+# Larger result sets are paged straight from the database instead of cached.
+VIEW_ID_CACHE_LIMIT = 50000
+VIEW_ID_CACHE_TIMEOUT = 300
+
+
+def _cache():
+    return caches[getattr(settings, "DATASTORES_VIEW_CACHE", "default")]
+
+
+def view_cache_key(view: View, params: Mapping[str, Any]) -> str:
+    """Cache key of a view's ordered id-list.
+
+    It embeds the view's ``updated_at`` and the table's schema and data
+    versions. Any config, field or record change therefore moves readers to
+    a new key, and stale lists simply expire.
+    """
+    table = view.table
+    extra = hashlib.sha1(json.dumps(params, sort_keys=True).encode()).hexdigest()[:16]
+    return (
+        f"datastores:view_ids:{view.pk}:{view.updated_at.timestamp()}:"
+        f"{table.schema_version}:{table.data_version}:{extra}"
+    )
+
+
+def parse_window(params: Mapping[str, Any]) -> Tuple[int, int]:
+    try:
+        offset = int(params.get("offset") or 0)
+        limit = int(params.get("limit") or VIEW_PAGE_SIZE)
+    except ValueError:
+        raise serializers.ValidationError({"detail": "offset and limit must be integers."})
+    return max(offset, 0), max(1, min(limit, MAX_VIEW_PAGE_SIZE))
+
+
+def get_view_record_ids(view: View, params: Mapping[str, Any]) -> Optional[List[int]]:
+    """Ordered ids of every record matching the view, or ``None`` when too many to cache."""
+    key = view_cache_key(view, params)
+    cache = _cache()
+    ids = cache.get(key)
+    if ids is None:
+        queryset = build_record_queryset(view.table, params).values_list("id", flat=True)[: VIEW_ID_CACHE_LIMIT + 1]
+        note_queryset("view ids", queryset)
+        ids = list(queryset)
+        if len(ids) > VIEW_ID_CACHE_LIMIT:
+            return None
+        cache.set(key, ids, VIEW_ID_CACHE_TIMEOUT)
+    return ids
+
+
+def fetch_in_order(ids: List[int]) -> List[Record]:
+    records = Record.objects.in_bulk(ids)
+    # Records deleted since the list was built are skipped; the data version
+    # bump means the next request rebuilds the list anyway.
+    return [records[pk] for pk in ids if pk in records]
+
+
+def get_view_page(view: View, request_params: Mapping[str, Any]) -> Tuple[List[Record], int, bool]:
+    """Execute a saved view and return ``(records, count, has_more)`` for the requested window."""
+    params = get_view_params(view, request_params)
+    offset, limit = parse_window(request_params)
+    ids = get_view_record_ids(view, params)
+    if ids is None:
+        queryset = build_record_queryset(view.table, params)
+        page = queryset[offset : offset + limit + 1]
+        note_queryset("view page", page)
+        records = list(page)
+        return records[:limit], queryset.count(), len(records) > limit
+    records = fetch_in_order(ids[offset : offset + limit])
+    for record in records:
+        record.table = view.table
+    return records, len(ids), offset + limit < len(ids)
@@ -1,29 +1,66 @@
 from __future__ import annotations
 
-from typing import Dict, List, Tuple
+from typing import Any, Optional, Tuple
 
-from django.db.models import Q
-from __future__ import annotations
-
-from typing import Tuple
-
-from django.db.models import Q
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import connection, transaction
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
-from rest_framework import mixins, status, viewsets
+from django.utils.text import slugify
+from rest_framework import exceptions, mixins, serializers, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.renderers import BaseRenderer, JSONRenderer
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 from common.permissions import WorkspaceRolePermission
+from core.metrics import timer
+from core.profiling import note_queryset
+from jobs.serializers import JobSerializer
 from workspaces.models import Workspace
-from .models import Database, Table, Field, Record, View, FieldType
+from . import queries
+from .etags import PreconditionFailed, not_modified_response, parse_if_match, set_etag_headers, table_etag
+from .aggregations import aggregate_records
+from .attachments import BlobUploadHandler, UploadedBlob, blob_response, discard_uploads, store_upload
+from .exports import ExportFormat, stream_export
+from .journal import JournalExpired, get_delta, parse_delta_params
+from .models import Attachment, Database, Table, Field, FieldConversion, Record, View
+from .pagination import RecordCursorPagination
+from .realtime import publish_deleted, publish_records, stream_table_events
+from .rendering import render_record_list
+from .schema import get_table_schema
+from .tasks import queue_table_delete
+from .view_results import get_view_page, parse_window
 from .serializers import (
     DatabaseSerializer,
     TableSerializer,
     FieldSerializer,
+    FieldConversionSerializer,
     RecordSerializer,
+    RecordBatchSerializer,
+    RecordBatchDeleteSerializer,
     ViewSerializer,
 )
 
 
+class EventStreamRenderer(BaseRenderer):
+    """Lets clients ask for ``text/event-stream``; errors are still sent as JSON."""
+
+    media_type = "text/event-stream"
+    format = "event-stream"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return JSONRenderer().render(data)
+
+
+def get_export_format(request) -> str:
+    export_format = request.query_params.get("export_format", ExportFormat.NDJSON)
+    if export_format not in ExportFormat.content_types:
+        raise serializers.ValidationError({"export_format": f"Choose one of: {', '.join(ExportFormat.content_types)}."})
+    return export_format
+
+
 class WorkspaceContextMixin:
     workspace: Workspace | None = None
 
@@ -34,6 +71,55 @@ class WorkspaceContextMixin:
         self.workspace = database.workspace
 
 
+class TableETagMixin:
+    """Answer conditional ``list``/``retrieve`` requests from the table's version counters.
+
+    Deciding on a 304 only needs the table row, so unchanged fields, views or
+    records are neither queried nor serialized again.
+    """
+
+    etag_includes_data = False
+
+    def get_etag_table(self, instance=None) -> Optional[Table]:
+        if instance is not None:
+            return instance.table
+        table_id = self.request.query_params.get("table")
+        if not table_id or not table_id.isdigit():
+            return None
+        return Table.objects.filter(
+            pk=table_id, database__workspace__role_assignments__user=self.request.user
+        ).first()
+
+    def get_etag(self, table: Optional[Table]) -> Optional[str]:
+        if table is None:
+            return None
+        return table_etag(table, self.request, include_data=self.etag_includes_data)
+
+    def list(self, request, *args, **kwargs):
+        etag = self.get_etag(self.get_etag_table())
+        not_modified = not_modified_response(request, etag)
+        if not_modified is not None:
+            return not_modified
+        return set_etag_headers(self.list_response(request, *args, **kwargs), etag)
+
+    def list_response(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = None
+        table = self.get_etag_table()
+        if table is None:
+            instance = self.get_object()
+            table = self.get_etag_table(instance)
+        etag = self.get_etag(table)
+        not_modified = not_modified_response(request, etag)
+        if not_modified is not None:
+            return not_modified
+        if instance is None:
+            instance = self.get_object()
+        return set_etag_headers(Response(self.get_serializer(instance).data), etag)
+
+
 class DatabaseViewSet(viewsets.ModelViewSet, WorkspaceContextMixin):
     serializer_class = DatabaseSerializer
     permission_classes = [WorkspaceRolePermission]
@@ -81,12 +167,18 @@ class TableViewSet(viewsets.ModelViewSet, WorkspaceContextMixin):
     def destroy(self, request, *args, **kwargs):
         instance = self.get_object()
         if request.query_params.get("hard") == "1":
-            return super().destroy(request, *args, **kwargs)
+            # Records are deleted in batches by a worker; the table disappears
+            # from listings right away through the soft delete.
+            with transaction.atomic():
+                if instance.deleted_at is None:
+                    instance.soft_delete()
+                job = queue_table_delete(instance, request.user)
+            return Response(JobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
         instance.soft_delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class FieldViewSet(viewsets.ModelViewSet, WorkspaceContextMixin):
+class FieldViewSet(TableETagMixin, viewsets.ModelViewSet, WorkspaceContextMixin):
     serializer_class = FieldSerializer
     permission_classes = [WorkspaceRolePermission]
 
@@ -107,8 +199,22 @@ class FieldViewSet(viewsets.ModelViewSet, WorkspaceContextMixin):
         self.set_workspace_from_table(obj.table)
         return obj
 
-
-class ViewViewSet(viewsets.ModelViewSet, WorkspaceContextMixin):
+    @action(detail=True, methods=["get", "post"], url_path="convert")
+    def convert(self, request, pk=None):
+        """``POST {"target_type", "target_options"}`` starts a type conversion; ``GET`` polls the latest one."""
+        field = self.get_object()
+        if request.method == "GET":
+            conversion = FieldConversion.objects.filter(field=field).first()
+            if conversion is None:
+                return Response({"detail": "This field has no conversions."}, status=status.HTTP_404_NOT_FOUND)
+            return Response(FieldConversionSerializer(conversion).data)
+        serializer = FieldConversionSerializer(data=request.data, context={"field": field, "request": request})
+        serializer.is_valid(raise_exception=True)
+        conversion = serializer.save()
+        return Response(FieldConversionSerializer(conversion).data, status=status.HTTP_202_ACCEPTED)
+
+
+class ViewViewSet(TableETagMixin, viewsets.ModelViewSet, WorkspaceContextMixin):
     serializer_class = ViewSerializer
     permission_classes = [WorkspaceRolePermission]
 
@@ -129,22 +235,53 @@ class ViewViewSet(viewsets.ModelViewSet, WorkspaceContextMixin):
         self.set_workspace_from_table(obj.table)
         return obj
 
+    @action(detail=True, methods=["get"], url_path="records")
+    def records(self, request, pk=None):
+        view = self.get_object()
+        etag = table_etag(view.table, request)
+        not_modified = not_modified_response(request, etag)
+        if not_modified is not None:
+            return not_modified
+        records, count, has_more = get_view_page(view, request.query_params)
+        next_url = None
+        if has_more:
+            offset, limit = parse_window(request.query_params)
+            next_url = replace_query_param(request.build_absolute_uri(), "offset", offset + limit)
+        data = RecordSerializer(records, many=True, context=self.get_serializer_context()).data
+        return set_etag_headers(Response({"count": count, "next": next_url, "results": data}), etag)
+
+    @action(detail=True, methods=["get"], url_path="aggregate")
+    def aggregate(self, request, pk=None):
+        view = self.get_object()
+        table = view.table
+        params = queries.get_view_params(view, request.query_params)
+        queryset = queries.apply_filters(Record.objects.filter(table=table), table, params)
+        return Response(aggregate_records(queryset, table, request.query_params))
+
+    @action(detail=True, methods=["get"], url_path="export")
+    def export(self, request, pk=None):
+        view = self.get_object()
+        table = view.table
+        params = queries.get_view_params(view, request.query_params)
+        return stream_export(
+            request,
+            queries.build_record_queryset(table, params),
+            get_table_schema(table),
+            get_export_format(request),
+            slugify(f"{table.name}-{view.name}") or f"view-{view.id}",
+        )
+
+
+class TableRouteMixin(WorkspaceContextMixin):
+    """Resolve the ``table_id`` URL kwarg of nested ``/tables/<id>/...`` routes."""
 
-class RecordViewSet(
-    WorkspaceContextMixin,
-    viewsets.GenericViewSet,
-    mixins.ListModelMixin,
-    mixins.CreateModelMixin,
-    mixins.UpdateModelMixin,
-    mixins.DestroyModelMixin,
-    mixins.RetrieveModelMixin,
-):
-    serializer_class = RecordSerializer
-    permission_classes = [WorkspaceRolePermission]
     _table_cache: Table | None = None
 
     def get_table(self) -> Table:
         if self._table_cache is None:
+            if not self.request.user.is_authenticated:
+                # E.g. a change stream reconnecting with an expired token.
+                raise exceptions.NotAuthenticated()
             table = get_object_or_404(
                 Table.objects.select_related("database", "database__workspace").filter(
                     database__workspace__role_assignments__user=self.request.user
@@ -155,6 +292,33 @@ class RecordViewSet(
             self._table_cache = table
         return self._table_cache
 
+    def perform_authentication(self, request):
+        with timer("auth"):
+            super().perform_authentication(request)
+
+    def check_permissions(self, request):
+        with timer("permissions"):
+            # Resolve the table first so WorkspaceRolePermission sees the
+            # workspace and applies the role check (e.g. viewers cannot write).
+            self.get_table()
+            super().check_permissions(request)
+
+
+class RecordViewSet(
+    TableETagMixin,
+    TableRouteMixin,
+    viewsets.GenericViewSet,
+    mixins.ListModelMixin,
+    mixins.CreateModelMixin,
+    mixins.UpdateModelMixin,
+    mixins.DestroyModelMixin,
+    mixins.RetrieveModelMixin,
+):
+    serializer_class = RecordSerializer
+    permission_classes = [WorkspaceRolePermission]
+    pagination_class = RecordCursorPagination
+    etag_includes_data = True
+
     def get_queryset(self):
         table = self.get_table()
         qs = Record.objects.filter(table=table)
@@ -162,71 +326,175 @@ class RecordViewSet(
         qs = qs.order_by(*self.get_ordering(table))
         return qs
 
+    def get_object(self):
+        obj = get_object_or_404(self.filter_queryset(self.get_queryset()), pk=self.kwargs["pk"])
+        # Reuse the already resolved table so the object permission check and
+        # validation don't load it again through the foreign key.
+        obj.table = self.get_table()
+        self.check_object_permissions(self.request, obj)
+        return obj
+
+    def get_etag_table(self, instance=None) -> Optional[Table]:
+        return self.get_table()
+
+    def list_response(self, request, *args, **kwargs):
+        # The browsable API still renders serializer data.
+        if request.accepted_renderer.format != "json":
+            return super().list_response(request, *args, **kwargs)
+        return render_record_list(self.filter_queryset(self.get_queryset()), get_table_schema(self.get_table()), request)
+
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        if page is None:
+            note_queryset("records", queryset)
+        return page
+
     def get_serializer_context(self):
         context = super().get_serializer_context()
         context["table"] = self.get_table()
         return context
 
+    def get_renderers(self):
+        if self.action == "changes":
+            return [EventStreamRenderer(), JSONRenderer()]
+        return super().get_renderers()
+
     def perform_create(self, serializer):
         serializer.save()
+        publish_records(self.get_table().pk, "created", [serializer.data])
 
     def perform_update(self, serializer):
-        serializer.save()
-
-    def get_ordering(self, table: Table) -> Tuple[str, ...]:
-        sort_param = self.request.query_params.get("sort")
-        if not sort_param:
-            return ("-id",)
-        ordering = []
-        for spec in sort_param.split(","):
-            if not spec:
-                continue
-            try:
-                field_name, direction = spec.split(":")
-            except ValueError:
-                continue
-            if not table.fields.filter(name=field_name).exists():
-                continue
-            prefix = "" if direction == "asc" else "-"
-            ordering.append(f"{prefix}data__{field_name}")
-        return tuple(ordering or ("-id",))
+        serializer.save(expected_version=parse_if_match(self.request))
+        publish_records(self.get_table().pk, "updated", [serializer.data])
+
+    def perform_destroy(self, instance):
+        record_id = instance.pk
+        expected_version = parse_if_match(self.request)
+        if expected_version is None:
+            instance.delete()
+        elif not Record.objects.filter(pk=record_id, version=expected_version).delete()[0]:
+            raise PreconditionFailed()
+        publish_deleted(self.get_table().pk, [record_id])
+
+    def changes(self, request, *args, **kwargs):
+        """Stream the table's record and schema changes as server-sent events."""
+        if not isinstance(request._request, ASGIRequest):
+            return Response(
+                {"detail": "Change streams need the ASGI server (config.asgi)."},
+                status=status.HTTP_501_NOT_IMPLEMENTED,
+            )
+        table = self.get_table()
+        # The stream never queries, but Django only closes this thread's
+        # connection when the response finishes, up to an hour from now;
+        # don't hold a pool slot for every open grid.
+        connection.close()
+        response = StreamingHttpResponse(
+            stream_table_events(table.pk, table.data_version), content_type="text/event-stream"
+        )
+        response["Cache-Control"] = "no-cache"
+        # Stop nginx-style proxies from buffering the stream.
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+    def get_ordering(self, table: Table) -> Tuple[Any, ...]:
+        return queries.get_ordering(table, self.request.query_params)
 
     def apply_filters(self, queryset, table: Table):
-        search = self.request.query_params.get("search")
-        if search:
-            text_fields = table.fields.filter(type__in=[FieldType.TEXT, FieldType.LONG_TEXT])
-            conditions = Q()
-            for field in text_fields:
-                conditions |= Q(**{f"data__{field.name}__icontains": search})
-            if conditions:
-                queryset = queryset.filter(conditions)
-        filter_param = self.request.query_params.get("filter")
-        if filter_param:
-            for clause in filter_param.split(","):
-                parts = clause.split(":")
-                if len(parts) < 3:
-                    continue
-                field_name, operator, value = parts[0], parts[1], ":".join(parts[2:])
-                queryset = self.apply_filter_clause(queryset, table, field_name, operator, value)
-        return queryset
-
-    def apply_filter_clause(self, queryset, table: Table, field_name: str, operator: str, value: str):
-        if not table.fields.filter(name=field_name).exists():
-            return queryset
-        lookup_base = f"data__{field_name}"
-        if operator == "eq":
-            return queryset.filter(**{lookup_base: value})
-        if operator == "ne":
-            return queryset.exclude(**{lookup_base: value})
-        if operator == "contains":
-            return queryset.filter(**{f"{lookup_base}__icontains": value})
-        if operator == "gt":
-            return queryset.filter(**{f"{lookup_base}__gt": value})
-        if operator == "lt":
-            return queryset.filter(**{f"{lookup_base}__lt": value})
-        if operator == "between":
-            start, _, end = value.partition("|")
-            return queryset.filter(**{f"{lookup_base}__gte": start, f"{lookup_base}__lte": end})
-        if operator == "in":
-            return queryset.filter(**{f"{lookup_base}__in": value.split("|")})
-        return queryset
+        return queries.apply_filters(queryset, table, self.request.query_params)
+
+    def export(self, request, *args, **kwargs):
+        table = self.get_table()
+        return stream_export(
+            request,
+            self.get_queryset(),
+            get_table_schema(table),
+            get_export_format(request),
+            slugify(table.name) or f"table-{table.id}",
+        )
+
+    def aggregate(self, request, *args, **kwargs):
+        table = self.get_table()
+        queryset = self.apply_filters(Record.objects.filter(table=table), table)
+        return Response(aggregate_records(queryset, table, request.query_params))
+
+    def delta(self, request, *args, **kwargs):
+        """Records changed and ids deleted after ``?since=<seq>``; without it, just the current ``seq``."""
+        table = self.get_table()
+        since, limit = parse_delta_params(request.query_params)
+        if since is None:
+            return Response({"seq": table.data_version})
+        try:
+            delta = get_delta(table, since, limit)
+        except JournalExpired as exc:
+            return Response({"detail": str(exc), "seq": table.data_version}, status=status.HTTP_410_GONE)
+        records = RecordSerializer(delta.records, many=True, context=self.get_serializer_context()).data
+        return Response({
+            "since": delta.since,
+            "seq": delta.seq,
+            "has_more": delta.has_more,
+            "records": records,
+            "deleted": delta.deleted,
+        })
+
+    def batch_create(self, request, *args, **kwargs):
+        serializer = RecordBatchSerializer(data=request.data, context=self.get_serializer_context())
+        with transaction.atomic():
+            serializer.is_valid(raise_exception=True)
+            records = serializer.save()
+        data = RecordSerializer(records, many=True, context=self.get_serializer_context()).data
+        publish_records(self.get_table().pk, "created", data)
+        return Response({"items": data}, status=status.HTTP_201_CREATED)
+
+    def batch_update(self, request, *args, **kwargs):
+        instance = Record.objects.filter(table=self.get_table())
+        serializer = RecordBatchSerializer(instance, data=request.data, context=self.get_serializer_context())
+        with transaction.atomic():
+            serializer.is_valid(raise_exception=True)
+            records = serializer.save()
+        data = RecordSerializer(records, many=True, context=self.get_serializer_context()).data
+        publish_records(self.get_table().pk, "updated", data)
+        return Response({"items": data})
+
+    def batch_destroy(self, request, *args, **kwargs):
+        table = self.get_table()
+        serializer = RecordBatchDeleteSerializer(data=request.data, context=self.get_serializer_context())
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            deleted = Record.objects.filter(table=table, pk__in=serializer.validated_data["items"])
+            ids = list(deleted.values_list("pk", flat=True))
+            deleted.delete()
+        publish_deleted(table.pk, ids)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class AttachmentViewSet(TableRouteMixin, viewsets.GenericViewSet):
+    """Upload files to a table's blob store and stream them back."""
+
+    permission_classes = [WorkspaceRolePermission]
+
+    def get_queryset(self):
+        return Attachment.objects.filter(table=self.get_table())
+
+    def create(self, request, *args, **kwargs):
+        handler = BlobUploadHandler(request._request, max_size=settings.DATASTORES_ATTACHMENT_MAX_SIZE)
+        # Must be set before the body is parsed so file parts are streamed
+        # into the store instead of being buffered by the default handlers.
+        request._request.upload_handlers = [handler]
+        upload = request.FILES.get("file")
+        stored = None
+        try:
+            if handler.too_large:
+                raise serializers.ValidationError({"file": "File exceeds the maximum attachment size."})
+            if not isinstance(upload, UploadedBlob):
+                raise serializers.ValidationError({"file": "Send the file as multipart form data in a 'file' part."})
+            attachment = store_upload(self.get_table(), upload, request.user)
+            stored = upload
+        finally:
+            # Other parts (and repeated ``file`` parts) were written to the
+            # store's temp area too.
+            discard_uploads(request.FILES, keep=stored)
+        return Response(attachment.as_reference(), status=status.HTTP_201_CREATED)
+
+    def retrieve(self, request, *args, **kwargs):
+        attachment = get_object_or_404(self.get_queryset(), pk=kwargs["pk"])
+        return blob_response(request, attachment)
@@ -0,0 +1,47 @@
+import os
+import signal
+import socket
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from jobs.queue import claim_job, run_job, schedule_periodic_jobs
+
+
+class Command(BaseCommand):
+    help = "Process background jobs from the database queue. Run as many workers as needed."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Exit once no job is due instead of polling.")
+        parser.add_argument("--max-jobs", type=int, help="Exit after this many jobs (e.g. to recycle memory).")
+        parser.add_argument("--poll-interval", type=float, help="Seconds to sleep while the queue is empty.")
+
+    def handle(self, *args, **options):
+        worker = f"{socket.gethostname()}:{os.getpid()}"
+        interval = options["poll_interval"] or getattr(settings, "JOBS_POLL_INTERVAL", 1.0)
+        self.stopping = False
+        # Finish the current job on SIGTERM/SIGINT instead of abandoning it.
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        if not options["once"]:
+            schedule_periodic_jobs()
+        done = 0
+        while not self.stopping:
+            close_old_connections()
+            job = claim_job(worker)
+            if job is None:
+                if options["once"]:
+                    break
+                time.sleep(interval)
+                continue
+            self.stdout.write(f"Running job {job.pk} ({job.kind})")
+            run_job(job)
+            done += 1
+            if options["max_jobs"] and done >= options["max_jobs"]:
+                break
+        self.stdout.write(f"Worker {worker} ran {done} jobs")
+
+    def stop(self, signum, frame):
+        self.stopping = True
@@ -0,0 +1,66 @@
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+
+from workspaces.models import Workspace
+
+
+class JobStatus(models.TextChoices):
+    QUEUED = "queued", "Queued"
+    RUNNING = "running", "Running"
+    FINISHED = "finished", "Finished"
+    FAILED = "failed", "Failed"
+
+
+class Job(models.Model):
+    """A unit of background work, claimed by ``run_worker`` processes.
+
+    Workers lock queued rows with ``SELECT ... FOR UPDATE SKIP LOCKED``, so
+    any number of them can share the table without a broker. ``kind`` names a
+    handler registered with ``jobs.registry.register``; handlers report
+    progress through ``processed``/``total``, which also serves as the
+    heartbeat that tells live jobs from ones whose worker died.
+    """
+
+    kind = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=16, choices=JobStatus.choices, default=JobStatus.QUEUED)
+    workspace = models.ForeignKey(Workspace, related_name="jobs", on_delete=models.SET_NULL, null=True, blank=True)
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        related_name="+",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+    )
+    # At most one queued job per non-empty key, so repeated requests and
+    # periodic schedules don't pile up duplicates.
+    dedupe_key = models.CharField(max_length=200, blank=True)
+    processed = models.BigIntegerField(default=0)
+    total = models.BigIntegerField(null=True, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+    worker = models.CharField(max_length=255, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ("-id",)
+        indexes = [
+            models.Index(fields=["status", "run_after"], name="jobs_job_claim"),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["dedupe_key"],
+                condition=models.Q(status="queued") & ~models.Q(dedupe_key=""),
+                name="jobs_job_queued_dedupe_key",
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.kind} #{self.pk} ({self.status})"
@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import logging
+from datetime import timedelta
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Job, JobStatus
+from .registry import HANDLERS, get_handler
+
+logger = logging.getLogger(__name__)
+
+RETRY_BACKOFF_SECONDS = 30
+
+
+class JobGone(Exception):
+    """The job row was deleted or claimed by another worker; stop working on it."""
+
+
+class JobContext:
+    """What a handler gets: the job, its payload and a way to report progress."""
+
+    def __init__(self, job: Job):
+        self.job = job
+        self.payload: Dict[str, Any] = job.payload
+
+    def progress(self, processed: int, total: Optional[int] = None) -> None:
+        """Store progress and refresh the heartbeat; call at least once per chunk."""
+        values = {"processed": processed, "heartbeat_at": timezone.now()}
+        if total is not None:
+            values["total"] = total
+        updated = Job.objects.filter(pk=self.job.pk, status=JobStatus.RUNNING, worker=self.job.worker).update(**values)
+        if not updated:
+            raise JobGone()
+        for name, value in values.items():
+            setattr(self.job, name, value)
+
+
+def enqueue(
+    kind: str,
+    payload: Optional[Dict[str, Any]] = None,
+    *,
+    workspace=None,
+    user=None,
+    dedupe_key: str = "",
+    run_after=None,
+    max_attempts: int = 3,
+) -> Job:
+    """Queue a job; with ``dedupe_key`` an already queued job with that key is returned instead.
+
+    Call it inside the transaction that makes the work necessary: workers only
+    see the job once that commits.
+    """
+    if kind not in HANDLERS:
+        raise ValueError(f"No job handler registered for {kind!r}.")
+    for _ in range(2):
+        try:
+            with transaction.atomic():
+                return Job.objects.create(
+                    kind=kind,
+                    payload=payload or {},
+                    workspace=workspace,
+                    created_by=user if user is not None and user.is_authenticated else None,
+                    dedupe_key=dedupe_key,
+                    run_after=run_after or timezone.now(),
+                    max_attempts=max_attempts,
+                )
+        except IntegrityError:
+            if not dedupe_key:
+                raise
+            existing = Job.objects.filter(dedupe_key=dedupe_key, status=JobStatus.QUEUED).first()
+            if existing is not None:
+                return existing
+            # Claimed in between; queue a fresh one.
+    raise RuntimeError(f"Could not queue job {dedupe_key!r}.")
+
+
+def claim_job(worker: str) -> Optional[Job]:
+    """Lock and start the next due job, or take over one whose worker stopped heartbeating.
+
+    ``SKIP LOCKED`` lets concurrent workers pass over rows another worker is
+    claiming instead of queueing behind it.
+    """
+    now = timezone.now()
+    stale = now - timedelta(seconds=getattr(settings, "JOBS_STALE_AFTER", 300))
+    with transaction.atomic():
+        job = (
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(Q(status=JobStatus.QUEUED, run_after__lte=now) | Q(status=JobStatus.RUNNING, heartbeat_at__lt=stale))
+            .order_by("run_after", "id")
+            .first()
+        )
+        if job is None:
+            return None
+        job.status = JobStatus.RUNNING
+        job.attempts += 1
+        job.worker = worker
+        job.started_at = now
+        job.heartbeat_at = now
+        job.save(update_fields=["status", "attempts", "worker", "started_at", "heartbeat_at"])
+    return job
+
+
+def _finish(job: Job, **values) -> None:
+    values.setdefault("finished_at", timezone.now())
+    Job.objects.filter(pk=job.pk, worker=job.worker).update(**values)
+
+
+def _give_up(job: Job, handler, error: str) -> None:
+    _finish(job, status=JobStatus.FAILED, error=error)
+    if handler.on_failure is not None:
+        handler.on_failure(JobContext(job), error)
+
+
+def run_job(job: Job) -> None:
+    """Run a claimed job's handler and record the outcome.
+
+    Failed jobs are queued again with a growing delay until ``max_attempts``
+    is used up.
+    """
+    handler = get_handler(job.kind)
+    if handler is None:
+        _finish(job, status=JobStatus.FAILED, error=f"No handler registered for {job.kind!r}.")
+        return
+    try:
+        if job.attempts > job.max_attempts:
+            _give_up(job, handler, job.error or "The worker running this job stopped.")
+            return
+        try:
+            result = handler.function(JobContext(job))
+        except JobGone:
+            return
+        except Exception as exc:
+            logger.exception("Job %s (%s) failed", job.pk, job.kind)
+            if job.attempts < job.max_attempts:
+                delay = timedelta(seconds=RETRY_BACKOFF_SECONDS * job.attempts)
+                try:
+                    _finish(job, status=JobStatus.QUEUED, error=str(exc), run_after=timezone.now() + delay, finished_at=None)
+                    return
+                except IntegrityError:
+                    pass
+            _give_up(job, handler, str(exc))
+            return
+        _finish(job, status=JobStatus.FINISHED, result=result, error="")
+    finally:
+        if handler.every is not None:
+            enqueue(job.kind, job.payload, dedupe_key=job.kind, run_after=timezone.now() + handler.every)
+
+
+def schedule_periodic_jobs() -> None:
+    """Make sure every periodic handler has a queued job."""
+    for handler in HANDLERS.values():
+        if handler.every is not None:
+            enqueue(handler.kind, dedupe_key=handler.kind)
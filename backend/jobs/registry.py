@@ -0,0 +1,35 @@
+from __future__ import annotations
+
+from datetime import timedelta
+from typing import Any, Callable, Dict, NamedTuple, Optional
+
+
+class Handler(NamedTuple):
+    kind: str
+    function: Callable[[Any], Any]
+    # Periodic handlers are queued by every worker on start and re-queued this
+    # long after each run.
+    every: Optional[timedelta]
+    # Called with the context and error message once a job gives up.
+    on_failure: Optional[Callable[[Any, str], None]]
+
+
+HANDLERS: Dict[str, Handler] = {}
+
+
+def register(kind: str, every: Optional[timedelta] = None, on_failure: Optional[Callable[[Any, str], None]] = None):
+    """Register ``function(context)`` as the handler of jobs of ``kind``.
+
+    The return value is stored as the job's ``result``. Handlers may be
+    re-run after a worker dies, so they must be safe to resume.
+    """
+
+    def decorator(function):
+        HANDLERS[kind] = Handler(kind, function, every, on_failure)
+        return function
+
+    return decorator
+
+
+def get_handler(kind: str) -> Optional[Handler]:
+    return HANDLERS.get(kind)
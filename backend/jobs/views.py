@@ -0,0 +1,19 @@
+from rest_framework import viewsets
+
+from common.permissions import WorkspaceRolePermission
+from .models import Job
+from .serializers import JobSerializer
+
+
+class JobViewSet(viewsets.ReadOnlyModelViewSet):
+    """Poll background jobs of the workspaces the user belongs to."""
+
+    serializer_class = JobSerializer
+    permission_classes = [WorkspaceRolePermission]
+
+    def get_queryset(self):
+        qs = Job.objects.filter(workspace__role_assignments__user=self.request.user)
+        workspace_id = self.request.query_params.get("workspace")
+        if workspace_id:
+            qs = qs.filter(workspace_id=workspace_id)
+        return qs
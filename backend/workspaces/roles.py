@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from django.conf import settings
+
+from .models import RoleAssignment
+
+ROLE_CACHE_SIZE = 10000
+_MISSING = object()
+
+RoleKey = Tuple[int, int]
+
+
+class RoleCache:
+    """Thread-safe TTL/LRU of ``(workspace_id, user_id) -> role``.
+
+    ``None`` is cached too, so repeated checks by non-members stay cheap.
+    Local changes are evicted by signals; the TTL bounds how long another
+    process can keep serving a role that was changed elsewhere.
+    """
+
+    def __init__(self, maxsize: int = ROLE_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[RoleKey, Tuple[float, Optional[str]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: RoleKey):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return _MISSING
+            expires, role = entry
+            if expires <= time.monotonic():
+                del self._entries[key]
+                return _MISSING
+            self._entries.move_to_end(key)
+            return role
+
+    def set(self, key: RoleKey, role: Optional[str], ttl: float) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, role)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key: RoleKey) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def invalidate_workspace(self, workspace_id: int) -> None:
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == workspace_id]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+role_cache = RoleCache()
+
+
+def _request_memo(request) -> Dict[RoleKey, Optional[str]]:
+    memo = getattr(request, "_workspace_roles", None)
+    if memo is None:
+        memo = {}
+        request._workspace_roles = memo
+    return memo
+
+
+def get_role(request, workspace_id: int) -> Optional[str]:
+    """Role of ``request.user`` in a workspace, or ``None`` for non-members.
+
+    Resolved at most once per request and served from the process cache for
+    ``WORKSPACE_ROLE_CACHE_TTL`` seconds (0 disables it).
+    """
+    user_id = getattr(request.user, "pk", None)
+    if user_id is None:
+        return None
+    key = (workspace_id, user_id)
+    memo = _request_memo(request)
+    if key in memo:
+        return memo[key]
+    ttl = getattr(settings, "WORKSPACE_ROLE_CACHE_TTL", 0)
+    role = role_cache.get(key) if ttl > 0 else _MISSING
+    if role is _MISSING:
+        role = (
+            RoleAssignment.objects.filter(workspace_id=workspace_id, user_id=user_id)
+            .values_list("role", flat=True)
+            .first()
+        )
+        if ttl > 0:
+            role_cache.set(key, role, ttl)
+    memo[key] = role
+    return role
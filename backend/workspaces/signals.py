@@ -0,0 +1,22 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import RoleAssignment, Workspace
+from .roles import role_cache
+
+
+@receiver(post_save, sender=RoleAssignment)
+@receiver(post_delete, sender=RoleAssignment)
+def evict_cached_role(sender, instance: RoleAssignment, **kwargs):
+    key = (instance.workspace_id, instance.user_id)
+    role_cache.invalidate(key)
+    # Another request may cache the old row again until the change commits.
+    transaction.on_commit(lambda: role_cache.invalidate(key))
+
+
+@receiver(post_delete, sender=Workspace)
+def evict_workspace_roles(sender, instance: Workspace, **kwargs):
+    workspace_id = instance.pk
+    role_cache.invalidate_workspace(workspace_id)
+    transaction.on_commit(lambda: role_cache.invalidate_workspace(workspace_id))
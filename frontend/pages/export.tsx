@@ -16,10 +16,9 @@ interface ListResponse<T> {
   results?: T[]
 }
 
-const downloadFile = (filename: string, content: string) => {
-  const blob = new Blob([content], { type: 'text/plain;charset=utf-8' })
+const downloadFile = (filename: string, content: Blob) => {
   const link = document.createElement('a')
-  link.href = URL.createObjectURL(blob)
+  link.href = URL.createObjectURL(content)
   link.download = filename
   document.body.appendChild(link)
   link.click()
@@ -38,18 +37,14 @@ export default function ExportPage() {
     return Array.isArray(response.data) ? response.data : response.data.results ?? []
   }, { enabled: Boolean(tableId) })
   const [viewId, setViewId] = useState<number | ''>('')
+  const [exportFormat, setExportFormat] = useState<'ndjson' | 'csv'>('ndjson')
 
   const handleExport = async () => {
     if (!tableId) return
-    const params: Record<string, any> = {}
-    if (viewId) {
-      const view = viewsQuery.data?.find((item) => item.id === viewId)
-      if (view?.config?.sort?.length) params.sort = view.config.sort.join(',')
-      if (view?.config?.filter?.length) params.filter = view.config.filter.join(',')
-    }
-    const response = await api.get(`/tables/${tableId}/records`, { params })
-    const data = Array.isArray(response.data) ? response.data : response.data.results ?? []
-    downloadFile('export.json', JSON.stringify(data, null, 2))
+    // The backend streams rows and applies the saved view's sort/filter itself.
+    const url = viewId ? `/views/${viewId}/export/` : `/tables/${tableId}/records/export`
+    const response = await api.get<Blob>(url, { params: { export_format: exportFormat }, responseType: 'blob' })
+    downloadFile(`export.${exportFormat}`, response.data)
   }
 
   return (
@@ -85,8 +80,17 @@ export default function ExportPage() {
               </MenuItem>
             ))}
           </TextField>
+          <TextField
+            select
+            label="Format"
+            value={exportFormat}
+            onChange={(e) => setExportFormat(e.target.value as 'ndjson' | 'csv')}
+          >
+            <MenuItem value="ndjson">NDJSON</MenuItem>
+            <MenuItem value="csv">CSV</MenuItem>
+          </TextField>
           <Button variant="contained" onClick={handleExport}>
-            Download JSON
+            Download
           </Button>
         </Stack>
       </Container>
@@ -17,6 +17,8 @@ interface ListResponse<T> {
   results?: T[]
 }
 
+const IMPORT_BATCH_SIZE = 1000
+
 const parseCsv = (content: string) => {
   const [headerLine, ...rows] = content.trim().split(/\r?\n/)
   const headers = headerLine.split(',').map((h) => h.trim())
@@ -64,8 +66,17 @@ export default function ImportPage() {
       openSnackbar('Invalid JSON payload', 'error')
       return
     }
-    for (const record of records) {
-      await api.post(`/tables/${tableId}/records`, { data: record })
+    for (let start = 0; start < records.length; start += IMPORT_BATCH_SIZE) {
+      const batch = records.slice(start, start + IMPORT_BATCH_SIZE)
+      try {
+        await api.post(`/tables/${tableId}/records/batch`, { items: batch.map((record) => ({ data: record })) })
+      } catch (error: any) {
+        const rowErrors = error.response?.data?.items
+        const firstIndex = rowErrors && typeof rowErrors === 'object' ? Object.keys(rowErrors)[0] : undefined
+        const detail = firstIndex !== undefined ? ` (row ${start + Number(firstIndex) + 1}: ${JSON.stringify(rowErrors[firstIndex])})` : ''
+        openSnackbar(`Imported ${start} records, then failed${detail}`, 'error')
+        return
+      }
     }
     openSnackbar(`Imported ${records.length} records`, 'success')
     setData('')
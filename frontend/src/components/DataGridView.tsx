@@ -1,23 +1,33 @@
-import { DataGrid, GridColDef, GridRowParams } from '@mui/x-data-grid'
+import { DataGrid, GridColDef, GridPaginationModel, GridRowParams } from '@mui/x-data-grid'
 import { Box, Button, Stack, TextField } from '@mui/material'
 import { useQuery, useQueryClient } from '@tanstack/react-query'
-import { useMemo, useState } from 'react'
+import { useEffect, useMemo, useState } from 'react'
 import api from '../lib/api'
+import { subscribeToTable } from '../lib/realtime'
 import { Field, RecordData, View } from '../types'
 import { RecordForm } from './RecordForm'
 import { useSnackbar } from '../context/SnackbarContext'
 import { ViewToolbar } from './ViewToolbar'
 import { useAuth } from '../context/AuthContext'
 
+// Saved views are paged on the server; the free grid shows at most 100 rows a page.
+const VIEW_PAGE_SIZE = 100
+
 interface DataGridViewProps {
   tableId: number
   workspaceId: number
 }
 
 interface ListResponse<T> {
+  count?: number
   results?: T[]
 }
 
+interface RecordRows {
+  rows: RecordData[]
+  count: number
+}
+
 export const DataGridView: React.FC<DataGridViewProps> = ({ tableId, workspaceId }) => {
   const queryClient = useQueryClient()
   const { openSnackbar } = useSnackbar()
@@ -25,6 +35,7 @@ export const DataGridView: React.FC<DataGridViewProps> = ({ tableId, workspaceId
   const [search, setSearch] = useState('')
   const [activeView, setActiveView] = useState<View | null>(null)
   const [viewKey, setViewKey] = useState(0)
+  const [viewPage, setViewPage] = useState<GridPaginationModel>({ page: 0, pageSize: VIEW_PAGE_SIZE })
   const [isFormOpen, setIsFormOpen] = useState(false)
   const [editingRecord, setEditingRecord] = useState<RecordData | null>(null)
 
@@ -40,15 +51,55 @@ export const DataGridView: React.FC<DataGridViewProps> = ({ tableId, workspaceId
     return Array.isArray(response.data) ? response.data : response.data.results ?? []
   })
 
-  const recordsQuery = useQuery(['records', tableId, search, activeView?.id, viewKey], async () => {
+  // A new view or search starts again on its first page.
+  useEffect(() => {
+    setViewPage((model) => ({ ...model, page: 0 }))
+  }, [activeView?.id, search])
+
+  const recordsQuery = useQuery(['records', tableId, search, activeView?.id, viewKey, viewPage.page], async (): Promise<RecordRows> => {
     const params: Record<string, any> = {}
     if (search) params.search = search
-    if (activeView?.config?.sort?.length) params.sort = activeView.config.sort.join(',')
-    if (activeView?.config?.filter?.length) params.filter = activeView.config.filter.join(',')
+    if (activeView) {
+      // The server executes the saved config and caches the ordered result;
+      // the grid requests one window of it at a time.
+      const response = await api.get<ListResponse<RecordData>>(`/views/${activeView.id}/records/`, {
+        params: { ...params, offset: viewPage.page * viewPage.pageSize, limit: viewPage.pageSize },
+      })
+      const rows = response.data.results ?? []
+      return { rows, count: response.data.count ?? rows.length }
+    }
     const response = await api.get<ListResponse<RecordData>>(`/tables/${tableId}/records`, { params })
-    return Array.isArray(response.data) ? response.data : response.data.results ?? []
+    const rows = Array.isArray(response.data) ? response.data : response.data.results ?? []
+    return { rows, count: rows.length }
   })
 
+  useEffect(() => {
+    return subscribeToTable(tableId, (event) => {
+      if (event.type === 'ready') return
+      if (event.type === 'records.updated' || event.type === 'records.deleted') {
+        // Patch rows in place; a changed row may also enter or leave a
+        // filtered list, so those are refetched as well.
+        const updated = new Map((event.records ?? []).map((record: RecordData) => [record.id, record]))
+        const deleted = new Set(event.ids ?? [])
+        queryClient.setQueriesData<RecordRows>({ queryKey: ['records', tableId] }, (data) =>
+          data && {
+            ...data,
+            rows: data.rows.filter((row) => !deleted.has(row.id)).map((row) => updated.get(row.id) ?? row),
+          }
+        )
+        queryClient.invalidateQueries({
+          queryKey: ['records', tableId],
+          predicate: (query) => Boolean(query.queryKey[2] || query.queryKey[3]),
+        })
+        return
+      }
+      queryClient.invalidateQueries({ queryKey: ['records', tableId], exact: false })
+      if (event.type === 'table.changed') {
+        queryClient.invalidateQueries({ queryKey: ['fields', tableId] })
+      }
+    })
+  }, [tableId, queryClient])
+
   const columns: GridColDef[] = useMemo(() => {
     const base: GridColDef[] = [{ field: 'id', headerName: 'ID', width: 90 }]
     fieldsQuery.data?.forEach((field) => {
@@ -56,7 +107,11 @@ export const DataGridView: React.FC<DataGridViewProps> = ({ tableId, workspaceId
         field: field.name,
         headerName: field.name,
         flex: 1,
-        valueGetter: (params) => params.row.data?.[field.name] ?? '',
+        valueGetter: (params) => {
+          const value = params.row.data?.[field.name]
+          // Attachments are stored as references; show the file name.
+          return field.type === 'attachment' ? value?.name ?? '' : value ?? ''
+        },
       })
     })
     return base
@@ -70,9 +125,23 @@ export const DataGridView: React.FC<DataGridViewProps> = ({ tableId, workspaceId
 
   const handleUpdateRecord = async (values: Record<string, any>) => {
     if (!editingRecord) return
-    await api.patch(`/tables/${tableId}/records/${editingRecord.id}`, { data: values })
+    // Send only the edited cells; the server merges them into the record and
+    // rejects the write if someone else changed it since it was loaded.
+    const changed = Object.fromEntries(
+      Object.entries(values).filter(([name, value]) => JSON.stringify(value) !== JSON.stringify(editingRecord.data[name]))
+    )
+    try {
+      await api.patch(
+        `/tables/${tableId}/records/${editingRecord.id}`,
+        { data: changed },
+        { headers: { 'If-Match': `"${editingRecord.version}"` } }
+      )
+      openSnackbar('Record updated', 'success')
+    } catch (error: any) {
+      if (error.response?.status !== 412) throw error
+      openSnackbar('Someone else changed this record; reload it and try again', 'error')
+    }
     await queryClient.invalidateQueries({ queryKey: ['records', tableId], exact: false })
-    openSnackbar('Record updated', 'success')
   }
 
   const handleDeleteRecord = async (id: number) => {
@@ -121,8 +190,16 @@ export const DataGridView: React.FC<DataGridViewProps> = ({ tableId, workspaceId
       />
       <DataGrid
         autoHeight
-        rows={recordsQuery.data ?? []}
+        rows={recordsQuery.data?.rows ?? []}
         columns={columns}
+        {...(activeView && {
+          paginationMode: 'server' as const,
+          rowCount: recordsQuery.data?.count ?? 0,
+          paginationModel: viewPage,
+          onPaginationModelChange: setViewPage,
+          pageSizeOptions: [VIEW_PAGE_SIZE],
+          loading: recordsQuery.isFetching,
+        })}
         getRowId={(row) => row.id}
         onRowClick={(params) => setEditingRecord(params.row as RecordData)}
         onRowDoubleClick={handleRowDoubleClick}
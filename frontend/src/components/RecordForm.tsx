@@ -11,9 +11,11 @@ import {
   MenuItem,
   Stack,
   TextField,
+  Typography,
 } from '@mui/material'
 import { DatePicker } from '@mui/x-date-pickers'
 import { Field } from '../types'
+import api from '../lib/api'
 import { useEffect, useState } from 'react'
 import { format } from 'date-fns'
 
@@ -38,6 +40,9 @@ const buildSchema = (fields: Field[]) => {
       case 'multi_select':
         schema = z.array(z.string())
         break
+      case 'attachment':
+        schema = z.any()
+        break
       default:
         schema = z.string().or(z.null()).transform((val) => (val === null ? '' : String(val)))
     }
@@ -134,6 +139,27 @@ export const RecordForm: React.FC<RecordFormProps> = ({ open, onClose, fields, i
                       }}
                     />
                   )
+                case 'attachment':
+                  return (
+                    <Stack key={field.id} direction="row" spacing={2} alignItems="center">
+                      <Button variant="outlined" component="label">
+                        {field.name}
+                        <input
+                          hidden
+                          type="file"
+                          onChange={async (e) => {
+                            const file = e.target.files?.[0]
+                            if (!file) return
+                            const body = new FormData()
+                            body.append('file', file)
+                            const response = await api.post(`/tables/${field.table}/attachments`, body)
+                            form.setValue(field.name, response.data)
+                          }}
+                        />
+                      </Button>
+                      <Typography variant="body2">{value?.name ?? 'No file'}</Typography>
+                    </Stack>
+                  )
                 case 'boolean':
                   return (
                     <TextField
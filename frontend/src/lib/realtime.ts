@@ -0,0 +1,66 @@
+import { tokenStorage } from './api'
+
+const apiBase = process.env.NEXT_PUBLIC_API_BASE || 'http://localhost:8000/api'
+const RETRY_DELAY_MS = 3000
+
+export interface TableEvent {
+  type: 'ready' | 'records.created' | 'records.updated' | 'records.deleted' | 'records.changed' | 'table.changed'
+  table: number
+  records?: any[]
+  ids?: number[]
+  data_version?: number
+}
+
+/**
+ * Follow a table's change stream (server-sent events) until the returned
+ * function is called. Uses fetch rather than EventSource so the access token
+ * can be sent as a header; reconnects after errors and when the server ends
+ * the stream.
+ */
+export function subscribeToTable(tableId: number, onEvent: (event: TableEvent) => void): () => void {
+  const controller = new AbortController()
+
+  const connect = async () => {
+    while (!controller.signal.aborted) {
+      try {
+        const token = tokenStorage.access
+        const response = await fetch(`${apiBase}/tables/${tableId}/changes`, {
+          headers: { Accept: 'text/event-stream', ...(token ? { Authorization: `Bearer ${token}` } : {}) },
+          signal: controller.signal,
+        })
+        if (response.ok && response.body) {
+          await readEvents(response.body, onEvent)
+        }
+      } catch (error) {
+        if (controller.signal.aborted) return
+      }
+      await new Promise((resolve) => setTimeout(resolve, RETRY_DELAY_MS))
+    }
+  }
+
+  connect()
+  return () => controller.abort()
+}
+
+async function readEvents(body: ReadableStream<Uint8Array>, onEvent: (event: TableEvent) => void) {
+  const reader = body.getReader()
+  const decoder = new TextDecoder()
+  let buffer = ''
+  for (;;) {
+    const { value, done } = await reader.read()
+    if (done) return
+    buffer += decoder.decode(value, { stream: true })
+    let boundary = buffer.indexOf('\n\n')
+    while (boundary !== -1) {
+      const chunk = buffer.slice(0, boundary)
+      buffer = buffer.slice(boundary + 2)
+      const data = chunk
+        .split('\n')
+        .filter((line) => line.startsWith('data: '))
+        .map((line) => line.slice(6))
+        .join('\n')
+      if (data) onEvent(JSON.parse(data))
+      boundary = buffer.indexOf('\n\n')
+    }
+  }
+}
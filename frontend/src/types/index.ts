@@ -72,6 +72,7 @@ export interface RecordData {
   id: number
   table: number
   data: Record<string, any>
+  version: number
 }
 
 export interface PaginatedResponse<T> {